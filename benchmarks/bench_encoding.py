@@ -0,0 +1,75 @@
+"""Serialization cost of one poll's payloads, stdlib json vs. the encoding helpers.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_encoding [--stores 400] [--repeat 5]
+
+"before" encodes every discovery config with ``json.dumps`` including the constant device block
+and the raw store object with ``json.dumps``; "after" uses :mod:`toogoodtogo_ha_mqtt_bridge.encoding`
+(orjson when installed) with the pre-serialized fragments spliced in.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Any, Callable
+
+from benchmarks.fakes import api_shop
+from toogoodtogo_ha_mqtt_bridge import encoding
+from toogoodtogo_ha_mqtt_bridge.main import DEVICE_INFO, STORE_CONFIG_FRAGMENT
+
+
+def config(item_id: int) -> dict[str, Any]:
+    return {
+        "name": f"Bäckerei {item_id}",
+        "default_entity_id": f"sensor.toogoodtogo_{item_id}",
+        "icon": "mdi:food",
+        "state_topic": f"homeassistant/sensor/toogoodtogo_{item_id}/state",
+        "json_attributes_topic": f"homeassistant/sensor/toogoodtogo_{item_id}/attr",
+        "unique_id": f"toogoodtogo_{item_id}",
+    }
+
+
+def best(repeat: int, func: Callable[[], object]) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def run() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--stores", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--stdlib", action="store_true", help="measure the fallback without orjson")
+    args = parser.parse_args()
+    if args.stdlib:
+        encoding.HAS_ORJSON = False
+
+    shops = [api_shop(item_id) for item_id in range(args.stores)]
+    configs = [config(item_id) for item_id in range(args.stores)]
+    static = {"unit_of_measurement": "portions", "value_template": "{{ value_json.stock }}", "device": DEVICE_INFO}
+
+    cases = {
+        "discovery configs": (
+            lambda: [json.dumps({**body, **static}) for body in configs],
+            lambda: [encoding.dumps_with(body, STORE_CONFIG_FRAGMENT) for body in configs],
+        ),
+        "raw store payloads": (
+            lambda: [json.dumps(shop) for shop in shops],
+            lambda: [encoding.dumps(shop) for shop in shops],
+        ),
+    }
+    backend = "orjson" if encoding.HAS_ORJSON else "stdlib json"
+    print(f"{args.stores} stores, best of {args.repeat}, milliseconds per poll ({backend})")
+    for name, (before, after) in cases.items():
+        slow, fast = best(args.repeat, before) * 1e3, best(args.repeat, after) * 1e3
+        print(f"{name:<20} before {slow:7.2f}  after {fast:7.2f}  ({slow / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    run()
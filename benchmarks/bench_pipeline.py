@@ -0,0 +1,155 @@
+"""Throughput, per-store latency and peak allocation of the publish pipeline.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_pipeline [--sizes 10 100 400 2000] [--repeat 5] [--json out.json]
+    python -m benchmarks.bench_pipeline --compare out.json   # against a run of an earlier commit
+
+Synthetic ``get_items``/``get_active`` payloads drive ``publish_stores_data`` (a first poll with
+cold caches and a steady-state poll where nothing changed), ``publish_orders_data`` (one order per
+ten stores) and ``check_for_removed_stores`` (half of the favourites removed) against an in-memory
+MQTT client. Timings are the best of ``--repeat`` runs; peak allocation is measured with
+tracemalloc in a separate, untimed run.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+from benchmarks.fakes import FakeMQTTClient, api_active, api_shops
+from toogoodtogo_ha_mqtt_bridge import main
+from toogoodtogo_ha_mqtt_bridge.config import settings
+
+Scenario = tuple[Callable[[], None], Callable[[], object]]  # untimed setup, timed run
+
+
+def reset_caches() -> None:
+    main.publish_cache.clear()
+    main.discovery.clear()
+    main.store_remover.pending.clear()
+
+
+def scenarios(size: int, data_dir: Path) -> dict[str, Scenario]:
+    shops = api_shops(size)
+    active = api_active(max(1, size // 10))
+    ids = [shop["item"]["item_id"] for shop in shops]
+    known_shops = data_dir / "known_shops.json"
+
+    def warm() -> None:
+        reset_caches()
+        main.publish_stores_data(shops)
+
+    def known() -> None:
+        known_shops.write_text(json.dumps(ids))
+        # a single account whose poll just committed the remaining half (stores_warm committed all)
+        main.accounts = []
+        main.last_successful_favourite_ids = {str(item_id) for item_id in ids[: size // 2]}
+
+    return {
+        "stores_cold": (reset_caches, lambda: main.publish_stores_data(shops)),
+        "stores_warm": (warm, lambda: main.publish_stores_data(shops)),
+        "orders": (reset_caches, lambda: main.publish_orders_data(active)),
+        "removed_stores": (known, lambda: main.check_for_removed_stores(ids[: size // 2])),
+    }
+
+
+def measure(setup: Callable[[], None], run: Callable[[], object], repeat: int) -> tuple[float, int, int]:
+    """Best wall time in seconds, messages published by that run, and peak allocated bytes."""
+    best, messages = float("inf"), 0
+    for _ in range(repeat):
+        setup()
+        client = main.mqtt_client = FakeMQTTClient()
+        started = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - started
+        if elapsed < best:
+            best, messages = elapsed, client.published
+
+    setup()
+    main.mqtt_client = FakeMQTTClient()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, messages, peak
+
+
+def commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()  # noqa: S607
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_suite(sizes: list[int], repeat: int) -> dict[str, Any]:
+    results: dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as data_dir:
+        settings["data_dir"] = data_dir
+        for size in sizes:
+            for name, (setup, run) in scenarios(size, Path(data_dir)).items():
+                seconds, messages, peak = measure(setup, run, repeat)
+                results[f"{name}/{size}"] = {
+                    "stores": size,
+                    "seconds": seconds,
+                    "stores_per_second": size / seconds,
+                    "us_per_store": seconds / size * 1e6,
+                    "messages": messages,
+                    "peak_kib": peak / 1024,
+                }
+    return results
+
+
+def report(results: dict[str, Any], baseline: dict[str, Any] | None) -> None:
+    header = f"{'scenario':<22}{'stores/s':>12}{'us/store':>11}{'messages':>10}{'peak KiB':>11}"
+    print(header + ("  vs baseline" if baseline else ""))
+    for key, result in results.items():
+        line = (
+            f"{key:<22}{result['stores_per_second']:>12.0f}{result['us_per_store']:>11.1f}"
+            f"{result['messages']:>10}{result['peak_kib']:>11.1f}"
+        )
+        previous = (baseline or {}).get(key)
+        if previous:
+            change = (result["us_per_store"] / previous["us_per_store"] - 1) * 100
+            line += f"  {change:+6.1f}% time{'  <-- slower' if change > 10 else ''}"
+        print(line)
+
+
+def run() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 400, 2000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", type=Path, help="write the results to this file")
+    parser.add_argument("--compare", type=Path, help="results file of an earlier run to compare against")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)  # per-store debug logging would dominate the numbers
+    settings["timezone"] = "Europe/Berlin"
+    settings["locale"] = "en_us"
+    main.topics.invalidate()
+
+    results = run_suite(args.sizes, args.repeat)
+    baseline = None
+    if args.compare:
+        previous = json.loads(args.compare.read_text())
+        print(f"baseline: {previous['commit']} (python {previous['python']})")
+        baseline = previous["results"]
+    print(f"commit {commit()}, python {platform.python_version()}, best of {args.repeat}")
+    report(results, baseline)
+    if args.json:
+        document = {"commit": commit(), "python": platform.python_version(), "results": results}
+        args.json.write_text(json.dumps(document, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    run()
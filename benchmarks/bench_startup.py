@@ -0,0 +1,104 @@
+"""Time from launching the bridge to its MQTT connection and finished login.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_startup [--play-store-delay 2] [--repeat 3]
+
+Every run starts the bridge in a fresh interpreter against the local TGTG stand-in and the
+in-process broker used by ``load_test``, with a saved login and the Play Store lookup replaced by
+a ``--play-store-delay`` sleep. "cold" runs start without a cached app version, "warm" runs
+with a fresh one, as after a restart. Reported are the import time of the bridge module and
+the time from ``start()`` to the broker seeing the bridge connect and to the token refresh.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+METRICS = ("import", "mqtt_connected", "logged_in")
+
+
+def child(play_store_delay: float, warm: bool) -> None:
+    started = time.perf_counter()
+    from toogoodtogo_ha_mqtt_bridge import main
+
+    timings = {"import": time.perf_counter() - started}
+
+    from benchmarks.broker import Broker
+    from benchmarks.fake_tgtg import FakeTgtg
+    from benchmarks.load_test import APP_VERSION, BRIDGE_CLIENT_ID, configure
+    from toogoodtogo_ha_mqtt_bridge.app_version import CACHE_FILE
+
+    logging.disable(logging.CRITICAL)
+
+    def play_store() -> str:
+        time.sleep(play_store_delay)
+        return APP_VERSION
+
+    fake, broker = FakeTgtg(stores=10), Broker()
+    fake.start()
+    with tempfile.TemporaryDirectory() as data_dir:
+        configure(fake, broker.start(), Path(data_dir))
+        main.app_versions.fetch = play_store
+        if warm:
+            cached = {"version": APP_VERSION, "fetched_at": time.time()}
+            (Path(data_dir) / CACHE_FILE).write_text(json.dumps(cached))
+
+        def watch(launched: float) -> None:
+            conditions = {
+                "mqtt_connected": lambda: BRIDGE_CLIENT_ID in broker.clients(),
+                "logged_in": lambda: fake.calls["refresh", 200] > 0,
+            }
+            deadline = launched + 30
+            while conditions and time.perf_counter() < deadline:
+                for name, condition in list(conditions.items()):
+                    if condition():
+                        timings[name] = time.perf_counter() - launched
+                        del conditions[name]
+                time.sleep(0.002)
+            os.kill(os.getpid(), signal.SIGINT)
+
+        threading.Thread(target=watch, args=(time.perf_counter(),), daemon=True).start()
+        main.start.main(args=[], standalone_mode=False)
+        broker.stop()
+        fake.stop()
+    print(json.dumps(timings))
+
+
+def run() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--play-store-delay", type=float, default=2.0, help="seconds per Play Store lookup")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", choices=("cold", "warm"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.play_store_delay, warm=args.child == "warm")
+        return
+
+    print(f"Play Store lookup takes {args.play_store_delay:.1f}s, median of {args.repeat} run(s)")
+    print(f"{'cache':<8}" + "".join(f"{metric:>16}" for metric in METRICS))
+    for mode in ("cold", "warm"):
+        runs = []
+        for _ in range(args.repeat):
+            command = [sys.executable, "-m", "benchmarks.bench_startup", "--child", mode]
+            command += ["--play-store-delay", str(args.play_store_delay)]
+            output = subprocess.run(command, capture_output=True, text=True, check=True).stdout  # noqa: S603
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+        medians = [statistics.median(run.get(metric, float("nan")) for run in runs) for metric in METRICS]
+        print(f"{mode:<8}" + "".join(f"{median * 1000:>14.0f}ms" for median in medians))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,81 @@
+"""Per-store publish overhead with and without the cached topic table.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_topics [--stores 400] [--repeat 5]
+
+"before" drops the topic table ahead of every store, so each one resolves the topic settings
+from dynaconf and builds its topics again, as every store did on every poll before the
+registry existed; "after" is the cached steady state.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+from typing import Any
+
+from benchmarks.fakes import FakeMQTTClient
+from toogoodtogo_ha_mqtt_bridge import main
+
+
+def fake_shop(item_id: int) -> dict[str, Any]:
+    return {
+        "display_name": f"Store {item_id}",
+        "items_available": 0,
+        "item": {"item_id": str(item_id), "price": {"minor_units": 499, "decimals": 2}},
+        "store": {"logo_picture": {"current_url": "http://logo"}},
+    }
+
+
+def per_store(shops: list[dict[str, Any]], repeat: int, uncached: bool) -> float:
+    """Best-of-``repeat`` microseconds to publish one store."""
+    best = float("inf")
+    for _ in range(repeat):
+        main.publish_cache.clear()  # publish everything, as on the first poll
+        main.discovery.clear()
+        started = time.perf_counter()
+        for shop in shops:
+            if uncached:
+                main.topics.invalidate()
+            main.publish_stores_page([shop], [])
+        best = min(best, time.perf_counter() - started)
+    return best / len(shops) * 1e6
+
+
+def lookups(stores: int, repeat: int, uncached: bool) -> float:
+    """Best-of-``repeat`` microseconds to look up all topics of one store."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for item_id in range(stores):
+            if uncached:
+                main.topics.invalidate()
+            main.topics.item(item_id)
+            main.data_base(), main.discovery_prefix(), main.homeassistant_enabled(), main.raw_enabled()
+        best = min(best, time.perf_counter() - started)
+    return best / stores * 1e6
+
+
+def run() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--stores", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)  # per-store debug logging would dominate the numbers
+    main.mqtt_client = FakeMQTTClient()
+    shops = [fake_shop(item_id) for item_id in range(args.stores)]
+
+    print(f"{args.stores} stores, best of {args.repeat}, microseconds per store")
+    for name, bench in (
+        ("topic lookups", lambda uncached: lookups(args.stores, args.repeat, uncached)),
+        ("publish_stores_page", lambda uncached: per_store(shops, args.repeat, uncached)),
+    ):
+        before, after = bench(True), bench(False)
+        print(f"{name:<20} before {before:8.1f}  after {after:8.1f}  ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    run()
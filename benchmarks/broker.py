@@ -0,0 +1,190 @@
+"""A minimal in-process MQTT 3.1.1 broker for offline load tests.
+
+Supports what the bridge and its tests use: QoS 0/1/2 publishes from clients (acknowledged, and
+routed to subscribers at QoS 0), retained messages, ``+``/``#`` wildcards and keep-alive pings.
+Persistent sessions, wills and authentication are not implemented; credentials are ignored.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import struct
+import threading
+import time
+from typing import Callable
+
+CONNECT, CONNACK, PUBLISH, PUBACK, PUBREC, PUBREL, PUBCOMP = 1, 2, 3, 4, 5, 6, 7
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 10, 11, 12, 13, 14
+
+MessageHook = Callable[[str, bytes, bool, float], None]  # topic, payload, retain, received at
+
+
+def topic_matches(pattern: str, topic: str) -> bool:
+    pattern_levels = pattern.split("/")
+    topic_levels = topic.split("/")
+    for index, level in enumerate(pattern_levels):
+        if level == "#":
+            return True
+        if index >= len(topic_levels) or level not in ("+", topic_levels[index]):
+            return False
+    return len(pattern_levels) == len(topic_levels)
+
+
+def _packet(kind: int, body: bytes, flags: int = 0) -> bytes:
+    length = len(body)
+    encoded = bytearray()
+    while True:
+        byte, length = length % 128, length // 128
+        encoded.append(byte | (0x80 if length else 0))
+        if not length:
+            break
+    return bytes([kind << 4 | flags]) + bytes(encoded) + body
+
+
+def _string(value: bytes) -> bytes:
+    return struct.pack("!H", len(value)) + value
+
+
+def _read_string(body: bytes, offset: int) -> tuple[str, int]:
+    (length,) = struct.unpack_from("!H", body, offset)
+    start = offset + 2
+    return body[start : start + length].decode(), start + length
+
+
+class _Session:
+    def __init__(self, writer: asyncio.StreamWriter) -> None:
+        self.writer = writer
+        self.client_id = ""
+        self.subscriptions: set[str] = set()
+        self.pending_qos2: set[int] = set()
+
+    def send(self, data: bytes) -> None:
+        if not self.writer.is_closing():
+            self.writer.write(data)
+
+
+class Broker:
+    """An MQTT broker on its own event loop thread; :meth:`start` returns the bound port."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, on_message: MessageHook | None = None) -> None:
+        self.host = host
+        self.port = port
+        self.on_message = on_message
+        self.retained: dict[str, bytes] = {}
+        self.received = 0
+        self._sessions: set[_Session] = set()
+        self._loop = asyncio.new_event_loop()
+        self._server: asyncio.AbstractServer | None = None
+        self._thread = threading.Thread(target=self._loop.run_forever, name="mqtt-broker", daemon=True)
+
+    def start(self) -> int:
+        self._thread.start()
+        future = asyncio.run_coroutine_threadsafe(asyncio.start_server(self._serve, self.host, self.port), self._loop)
+        self._server = future.result(timeout=5)
+        self.port = int(self._server.sockets[0].getsockname()[1])
+        return self.port
+
+    def stop(self) -> None:
+        async def close() -> None:
+            if self._server is not None:
+                self._server.close()
+            for session in list(self._sessions):
+                session.writer.close()
+
+        asyncio.run_coroutine_threadsafe(close(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+    def clients(self) -> list[str]:
+        return [session.client_id for session in list(self._sessions)]
+
+    def publish(self, topic: str, payload: bytes | str, retain: bool = False) -> None:
+        """Publish as if a client had sent the message; safe to call from any thread."""
+        data = payload.encode() if isinstance(payload, str) else payload
+        self._loop.call_soon_threadsafe(self._route, topic, data, retain)
+
+    def _route(self, topic: str, payload: bytes, retain: bool) -> None:
+        self.received += 1
+        if retain:
+            if payload:
+                self.retained[topic] = payload
+            else:
+                self.retained.pop(topic, None)
+        if self.on_message is not None:
+            self.on_message(topic, payload, retain, time.monotonic())
+        packet = _packet(PUBLISH, _string(topic.encode()) + payload)
+        for session in self._sessions:
+            if any(topic_matches(pattern, topic) for pattern in session.subscriptions):
+                session.send(packet)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        session = _Session(writer)
+        self._sessions.add(session)
+        try:
+            while True:
+                header = (await reader.readexactly(1))[0]
+                length, multiplier = 0, 1
+                while True:
+                    byte = (await reader.readexactly(1))[0]
+                    length += (byte & 0x7F) * multiplier
+                    multiplier *= 128
+                    if not byte & 0x80:
+                        break
+                body = await reader.readexactly(length) if length else b""
+                if not self._handle(session, header >> 4, header & 0x0F, body):
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._sessions.discard(session)
+            writer.close()
+
+    def _handle(self, session: _Session, kind: int, flags: int, body: bytes) -> bool:  # noqa: C901
+        """Process one control packet; returns ``False`` once the connection should close."""
+        if kind == CONNECT:
+            _, offset = _read_string(body, 0)  # protocol name
+            offset += 4  # protocol level, connect flags, keep alive
+            session.client_id, _ = _read_string(body, offset)
+            session.send(_packet(CONNACK, b"\x00\x00"))
+        elif kind == PUBLISH:
+            qos, retain = (flags >> 1) & 0x03, bool(flags & 0x01)
+            topic, offset = _read_string(body, 0)
+            packet_id = None
+            if qos:
+                (packet_id,) = struct.unpack_from("!H", body, offset)
+                offset += 2
+            if qos == 2:
+                session.send(_packet(PUBREC, struct.pack("!H", packet_id)))
+                if packet_id in session.pending_qos2:  # a resend of a message already routed
+                    return True
+                session.pending_qos2.add(packet_id)
+            elif qos == 1:
+                session.send(_packet(PUBACK, struct.pack("!H", packet_id)))
+            self._route(topic, body[offset:], retain)
+        elif kind == PUBREL:
+            (packet_id,) = struct.unpack_from("!H", body)
+            session.pending_qos2.discard(packet_id)
+            session.send(_packet(PUBCOMP, body[:2]))
+        elif kind == SUBSCRIBE:
+            packet_id, offset, patterns = body[:2], 2, []
+            while offset < len(body):
+                pattern, offset = _read_string(body, offset)
+                offset += 1  # requested QoS; everything is delivered with QoS 0
+                patterns.append(pattern)
+            session.subscriptions.update(patterns)
+            session.send(_packet(SUBACK, packet_id + bytes(len(patterns))))
+            for topic, payload in list(self.retained.items()):
+                if any(topic_matches(pattern, topic) for pattern in patterns):
+                    session.send(_packet(PUBLISH, _string(topic.encode()) + payload, flags=0x01))
+        elif kind == UNSUBSCRIBE:
+            offset = 2
+            while offset < len(body):
+                pattern, offset = _read_string(body, offset)
+                session.subscriptions.discard(pattern)
+            session.send(_packet(UNSUBACK, body[:2]))
+        elif kind == PINGREQ:
+            session.send(_packet(PINGRESP, b""))
+        elif kind == DISCONNECT:
+            return False
+        return True
@@ -0,0 +1,167 @@
+"""A local stand-in for the TGTG API, for offline load tests of the whole bridge.
+
+Serves the endpoints the bridge uses (token refresh, favourites pages, single items, active
+orders) plus the DataDome SDK call the ``tgtg`` client makes, with configurable response
+latency, injected 429/5xx responses and stock changes driven by the load test.
+"""
+
+from __future__ import annotations
+
+import collections
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from benchmarks.fakes import api_active, api_shop
+
+ITEMS_PATH = "/api/item/v8/"
+
+
+class FakeTgtg:
+    """The TGTG API for ``stores`` synthetic favourites on ``http://127.0.0.1:<port>/api/``.
+
+    Every API response is delayed by ``latency`` plus up to ``jitter`` seconds; a share of
+    ``throttle_rate`` of the calls is answered with 429 (``Retry-After: 1``) and a share of
+    ``error_rate`` with 500/503. :meth:`set_stock` changes a store and records when, and when the
+    new value was first served, so a test can tell polling delay from the bridge's own latency.
+    """
+
+    def __init__(
+        self,
+        stores: int = 100,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        throttle_rate: float = 0.0,
+        error_rate: float = 0.0,
+        orders: int = 2,
+        seed: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)  # noqa: S311 # synthetic faults, not security relevant
+        self.shops = {shop["item"]["item_id"]: shop for shop in map(api_shop, range(stores))}
+        self.favourites = list(self.shops)
+        self.active = api_active(orders)
+        self.calls: collections.Counter[tuple[str, int]] = collections.Counter()  # (endpoint, status)
+        self.changes = 0
+        self.changed_at: dict[str, tuple[int, float]] = {}  # item id -> (new stock, changed at)
+        self.served_at: dict[str, float] = {}  # item id -> first time the changed stock was served
+        self._lock = threading.Lock()
+        self._server: ThreadingHTTPServer | None = None
+
+    @property
+    def url(self) -> str:
+        assert self._server is not None, "not started"  # noqa: S101
+        return f"http://127.0.0.1:{self._server.server_address[1]}/api/"
+
+    @property
+    def datadome_url(self) -> str:
+        return self.url.replace("/api/", "/datadome/")
+
+    def start(self) -> str:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                status, payload, headers = fake.respond(self.path, body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                for name, value in {"Content-Type": "application/json", **headers}.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="fake-tgtg", daemon=True).start()
+        return self.url
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def set_stock(self, item_id: str, stock: int) -> None:
+        with self._lock:
+            self.shops[item_id]["items_available"] = stock
+            self.changes += 1
+            self.changed_at[item_id] = (stock, time.monotonic())
+            self.served_at.pop(item_id, None)
+
+    def churn(self, count: int) -> list[str]:
+        """Change the stock of ``count`` random favourites; returns their item ids."""
+        with self._lock:
+            changed = self.rng.sample(self.favourites, min(count, len(self.favourites)))
+        for item_id in changed:
+            self.set_stock(item_id, (self.shops[item_id]["items_available"] + 1) % 6)
+        return changed
+
+    def remove_favourites(self, count: int) -> list[str]:
+        with self._lock:
+            removed = self.favourites[-count:] if count else []
+            self.favourites = self.favourites[: len(self.favourites) - len(removed)]
+        return removed
+
+    def respond(self, path: str, body: bytes) -> tuple[int, Any, dict[str, str]]:
+        if path.startswith("/datadome/"):  # a form-encoded SDK call, answered without faults
+            return 200, {"status": 200, "cookie": "datadome=offline; Path=/"}, {}
+
+        endpoint = self._endpoint(path)
+        time.sleep(self.latency + self.rng.uniform(0, self.jitter))
+        status, payload, headers = self._fault() or self._handle(endpoint, path, json.loads(body or b"{}"))
+        with self._lock:
+            self.calls[endpoint, status] += 1
+        return status, payload, headers
+
+    @staticmethod
+    def _endpoint(path: str) -> str:
+        if path == ITEMS_PATH:
+            return "get_items"
+        if path.startswith(ITEMS_PATH):
+            return "get_item"
+        return {"/api/token/v1/refresh": "refresh", "/api/order/v8/active": "get_active"}.get(path, path)
+
+    def _fault(self) -> tuple[int, Any, dict[str, str]] | None:
+        roll = self.rng.random()
+        if roll < self.throttle_rate:
+            return 429, {"errors": [{"code": "TOO_MANY_REQUESTS"}]}, {"Retry-After": "1"}
+        if roll < self.throttle_rate + self.error_rate:
+            return self.rng.choice((500, 503)), {"errors": [{"code": "INTERNAL_ERROR"}]}, {}
+        return None
+
+    def _handle(self, endpoint: str, path: str, body: dict[str, Any]) -> tuple[int, Any, dict[str, str]]:
+        if endpoint == "refresh":
+            tokens = {
+                "access_token": "offline-access",
+                "refresh_token": "offline-refresh",
+                "access_token_ttl_seconds": 3600,
+            }
+            return 200, tokens, {"Set-Cookie": "session=offline; Path=/"}
+        if endpoint == "get_active":
+            return 200, self.active, {}
+        if endpoint == "get_item":
+            shop = self.shops.get(path[len(ITEMS_PATH) :])
+            return (200, shop, {}) if shop else (404, {"errors": [{"code": "NOT_FOUND"}]}, {})
+        if endpoint == "get_items":
+            page, size = int(body.get("page", 1)), int(body.get("page_size", 20))
+            with self._lock:
+                page_ids = self.favourites[(page - 1) * size : page * size]
+                now = time.monotonic()
+                for item_id in page_ids:
+                    if item_id in self.changed_at:
+                        self.served_at.setdefault(item_id, now)
+                items = [self.shops[item_id] for item_id in page_ids]
+            return 200, {"items": items}, {}
+        return 404, {"errors": [{"code": "NOT_FOUND"}]}, {}
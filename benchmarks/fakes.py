@@ -0,0 +1,101 @@
+"""Synthetic TGTG payloads and an in-memory MQTT client shared by the benchmarks."""
+
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import paho.mqtt.client as mqtt
+
+
+class FakeInfo:
+    """A publish the broker acknowledged instantly."""
+
+    rc = mqtt.MQTT_ERR_SUCCESS
+
+    def __init__(self, mid: int) -> None:
+        self.mid = mid
+
+    def wait_for_publish(self, timeout: float | None = None) -> None:
+        pass
+
+    def is_published(self) -> bool:
+        return True
+
+
+class FakeMQTTClient:
+    """Accepts publishes in memory, so only the bridge's own overhead is measured."""
+
+    def __init__(self) -> None:
+        self.published = 0
+        self.payload_bytes = 0
+
+    def publish(self, topic: str, payload: Any = None, retain: bool = False, qos: int = 0) -> FakeInfo:
+        self.published += 1
+        if payload is not None:
+            self.payload_bytes += len(payload)
+        return FakeInfo(self.published % 65535 + 1)
+
+
+BASE_TIME = datetime(2022, 6, 1, 17, 0, tzinfo=timezone.utc)
+
+
+def _iso(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def api_shop(item_id: int, rng: random.Random | None = None) -> dict[str, Any]:
+    """A favourites entry shaped and sized like what ``get_items`` returns."""
+    rng = rng or random.Random(item_id)  # noqa: S311 # deterministic synthetic data
+    start = BASE_TIME + timedelta(minutes=30 * rng.randrange(8))  # pickup windows repeat across stores
+    return {
+        "item": {
+            "item_id": str(100000 + item_id),
+            "price_including_taxes": {"code": "EUR", "minor_units": rng.choice((299, 399, 450)), "decimals": 2},
+            "value_including_taxes": {"code": "EUR", "minor_units": 1200, "decimals": 2},
+            "cover_picture": {"picture_id": "1", "current_url": "https://images.tgtg.ninja/item/cover/1.jpg"},
+            "logo_picture": {"picture_id": "2", "current_url": "https://images.tgtg.ninja/store/logo/2.png"},
+            "name": "Magic Bag",
+            "description": "Rette eine Überraschungstüte mit Backwaren vom Tag. " * 3,
+            "diet_categories": [],
+            "badges": [{"badge_type": "SERVICE_RATING_SCORE", "rating_group": "LOVED", "percentage": 92}],
+        },
+        "store": {
+            "store_id": str(item_id * 7),
+            "store_name": f"Bäckerei {item_id}",
+            "branch": "Hauptbahnhof",
+            "store_location": {"address": {"address_line": "Bahnhofplatz 1, 80335 München, Deutschland"}},
+            "logo_picture": {"picture_id": "2", "current_url": "https://images.tgtg.ninja/store/logo/2.png"},
+        },
+        "display_name": f"Bäckerei {item_id} - Hauptbahnhof",
+        "pickup_interval": {"start": _iso(start), "end": _iso(start + timedelta(minutes=30))},
+        "items_available": rng.choice((0, 0, 1, 2, 5)),
+        "distance": rng.uniform(100, 5000),
+        "favorite": True,
+    }
+
+
+def api_shops(count: int) -> list[dict[str, Any]]:
+    return [api_shop(item_id) for item_id in range(count)]
+
+
+def api_active(count: int) -> dict[str, Any]:
+    """A ``get_active`` response with ``count`` reserved orders."""
+    orders = []
+    for index in range(count):
+        start = BASE_TIME + timedelta(hours=index % 5)
+        orders.append({
+            "order_id": f"order-{index}",
+            "state": "ACTIVE",
+            "store_name": f"Bäckerei {index}",
+            "store_branch": "Hauptbahnhof",
+            "pickup_location": {"address": {"address_line": "Bahnhofplatz 1, 80335 München, Deutschland"}},
+            "pickup_interval": {"start": _iso(start), "end": _iso(start + timedelta(minutes=30))},
+            "quantity": 1,
+            "total_price": {"code": "EUR", "minor_units": 399, "decimals": 2},
+            "item_name": "Magic Bag",
+            "store_logo": {"current_url": "https://images.tgtg.ninja/store/logo/2.png"},
+            "item_cover_image": {"current_url": "https://images.tgtg.ninja/item/cover/1.jpg"},
+        })
+    return {"orders": orders, "has_more": False}
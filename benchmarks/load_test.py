@@ -0,0 +1,214 @@
+"""End-to-end load test of the bridge against a local TGTG stand-in and an in-process MQTT broker.
+
+Run from the repository root::
+
+    python -m benchmarks.load_test [--stores 400] [--duration 60] [--latency 0.05 --jitter 0.05]
+                                   [--throttle-rate 0.02] [--error-rate 0.02] [--churn 20] [--drop 10]
+
+Runs the real ``start()`` (token handling, the polling scheduler, intense fetch and the cleanup
+passes) completely offline: the TGTG client talks to :class:`benchmarks.fake_tgtg.FakeTgtg` and
+MQTT goes to :class:`benchmarks.broker.Broker`; only the Play Store version lookup is replaced.
+Once connected, intense fetch is switched on over MQTT like Home Assistant would, and every
+``--churn-every`` seconds ``--churn`` stores change stock. The report shows the latency from a
+stock change to its retained state message landing on the broker, split into the time until
+the API served the change (polling delay) and the bridge's own time from there to the broker.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import signal
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+import tgtg
+
+from benchmarks.broker import Broker
+from benchmarks.fake_tgtg import FakeTgtg
+from toogoodtogo_ha_mqtt_bridge import main
+from toogoodtogo_ha_mqtt_bridge.config import settings
+from toogoodtogo_ha_mqtt_bridge.delivery import DeliveryTracker
+
+APP_VERSION = "24.11.0"
+BRIDGE_CLIENT_ID = "toogoodtogo-ha-mqtt-bridge"
+
+
+class LatencyProbe:
+    """Matches retained state messages on the broker against the stock changes of the fake API."""
+
+    def __init__(self, fake: FakeTgtg) -> None:
+        self.fake = fake
+        self.state_topics = {main.topics.item(item_id).state: item_id for item_id in fake.shops}
+        self.end_to_end: list[float] = []
+        self.bridge: list[float] = []
+        self._landed: dict[str, float] = {}  # item id -> change time already counted
+
+    def on_message(self, topic: str, payload: bytes, retain: bool, received_at: float) -> None:
+        item_id = self.state_topics.get(topic)
+        change = self.fake.changed_at.get(item_id) if item_id else None
+        if item_id is None or change is None or not payload or self._landed.get(item_id) == change[1]:
+            return
+        stock, changed_at = change
+        if json.loads(payload)["stock"] != stock:
+            return
+        self._landed[item_id] = changed_at
+        self.end_to_end.append(received_at - changed_at)
+        served_at = self.fake.served_at.get(item_id)
+        if served_at is not None:
+            self.bridge.append(received_at - served_at)
+
+
+def summary(values: list[float]) -> str:
+    if not values:
+        return "no samples"
+    ordered = sorted(values)
+    pick = lambda share: ordered[min(len(ordered) - 1, int(share * len(ordered)))] * 1000
+    return (
+        f"n={len(ordered)}  avg {sum(ordered) / len(ordered) * 1000:.0f}ms  p50 {pick(0.5):.0f}ms  "
+        f"p95 {pick(0.95):.0f}ms  max {ordered[-1] * 1000:.0f}ms"
+    )
+
+
+def configure(fake: FakeTgtg, broker_port: int, data_dir: Path, interval: int = 10, qos: int | None = None) -> None:
+    """Point the bridge at the stand-ins, with a saved login and the Play Store lookup replaced."""
+    settings["mqtt"] = {"host": "127.0.0.1", "port": broker_port, "username": "", "password": ""}
+    settings["tgtg"] = {
+        "email": "load-test@example.com",
+        "language": "en-GB",
+        "polling_schedule": "* * * * *",
+        "intense_fetch": {"interval": interval, "period_of_time": 60},
+        "base_url": fake.url,
+    }
+    settings["data_dir"] = str(data_dir)
+    settings["timezone"] = "Europe/Berlin"
+    settings["locale"] = "en_us"
+    settings["cleanup"] = True
+    main.topics.invalidate()
+    if qos is not None:
+        main.delivery = DeliveryTracker(qos=qos)
+
+    # A session as left behind by an earlier login, so no e-mail/PIN round trip is needed.
+    tokens = {
+        "access_token": "offline-access",
+        "refresh_token": "offline-refresh",
+        "cookie": "session=offline",
+        "access_token_lifetime": 3600,
+        "last_time_token_refreshed": "None",
+        "ua": f"TGTG/{APP_VERSION} Dalvik/2.1.0 (Linux; U; Android 14)",
+        "token_version": APP_VERSION,
+        "rev": main.tokens_rev,
+    }
+    (data_dir / "tokens.json").write_text(json.dumps(tokens))
+    main.app_versions.fetch = lambda: APP_VERSION
+    tgtg.DATADOME_SDK_URL = fake.datadome_url
+
+
+def wait_for(condition: Any, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def drive(args: argparse.Namespace, fake: FakeTgtg, broker: Broker, dropped: list[str]) -> None:
+    """Switch intense fetch on, change stock for ``--duration`` seconds, then stop the bridge."""
+    try:
+        ready = lambda: BRIDGE_CLIENT_ID in broker.clients() and fake.calls["refresh", 200]
+        if not wait_for(ready, 30):
+            print("bridge did not connect and log in within 30s")
+            return
+        broker.publish(f"{main.discovery_prefix()}/switch/toogoodtogo_intense_fetch/set", "ON")
+
+        started = time.monotonic()
+        next_churn = started + args.churn_every
+        while (now := time.monotonic()) < started + args.duration:
+            if now >= next_churn:
+                fake.churn(args.churn)
+                next_churn += args.churn_every
+            if args.drop and not dropped and now >= started + args.duration / 2:
+                dropped.extend(fake.remove_favourites(args.drop))
+            time.sleep(0.05)
+        time.sleep(args.interval + 5)  # let the last changes land
+    finally:
+        os.kill(os.getpid(), signal.SIGINT)  # the bridge shuts down cleanly on SIGINT
+
+
+def report(args: argparse.Namespace, fake: FakeTgtg, broker: Broker, probe: LatencyProbe, dropped: list[str]) -> None:
+    print(
+        f"{args.stores} stores, {args.duration:.0f}s, intense fetch every {args.interval}s, API latency "
+        f"{args.latency * 1000:.0f}+{args.jitter * 1000:.0f}ms, {args.throttle_rate:.0%} 429s, "
+        f"{args.error_rate:.0%} 5xx"
+    )
+    successful = main.CHECK_DURATION.count(result="success")
+    print(f"polls: {successful} successful, {main.CHECK_DURATION.count(result='failure')} failed")
+    for (endpoint, status), count in sorted(fake.calls.items()):
+        print(f"  {endpoint:<12}{status:>5}  {count:>6} call(s)")
+    print(f"broker: {broker.received} message(s) received, {len(broker.retained)} retained topic(s)")
+    print(
+        f"stock changes: {fake.changes} made, {len(probe.end_to_end)} landed "
+        "(a store changing again before the next poll supersedes its earlier change)"
+    )
+    print(f"  change -> broker:       {summary(probe.end_to_end)}")
+    print(f"  API served -> broker:   {summary(probe.bridge)}")
+    if dropped:
+        left = [
+            topic
+            for item_id in dropped
+            for topic in (main.topics.item(item_id).state, main.topics.item(item_id).attr)
+            if topic in broker.retained
+        ]
+        print(f"removed favourites: {len(dropped)}, {len(left)} retained topic(s) left behind")
+
+
+def run() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--stores", type=int, default=400)
+    parser.add_argument("--duration", type=float, default=60, help="seconds of stock churn")
+    parser.add_argument("--interval", type=int, default=10, help="intense fetch interval (min. 10s)")
+    parser.add_argument("--latency", type=float, default=0.05, help="API response time in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05, help="random extra API response time")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of calls answered with 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls answered with 500/503")
+    parser.add_argument("--churn", type=int, default=10, help="stores changing stock per step")
+    parser.add_argument("--churn-every", type=float, default=3.0, help="seconds between stock changes")
+    parser.add_argument("--drop", type=int, default=0, help="favourites removed halfway through")
+    parser.add_argument("--qos", type=int, choices=(0, 1, 2), help="publish everything with this QoS")
+    parser.add_argument("--verbose", action="store_true", help="show the bridge's log output")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.ERROR)  # failed polls are expected with injected faults; see the report
+
+    fake = FakeTgtg(
+        stores=args.stores,
+        latency=args.latency,
+        jitter=args.jitter,
+        throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate,
+    )
+    fake.start()
+    broker = Broker()
+    dropped: list[str] = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        configure(fake, broker.start(), Path(data_dir), args.interval, args.qos)
+        probe = LatencyProbe(fake)  # after configure(), it resolves the state topics
+        broker.on_message = probe.on_message
+        threading.Thread(target=drive, args=(args, fake, broker, dropped), name="load-driver", daemon=True).start()
+        try:
+            main.start.main(args=[], standalone_mode=False)
+        finally:
+            broker.stop()
+            fake.stop()
+    report(args, fake, broker, probe, dropped)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Any
+
+ACCOUNT_NAME = re.compile(r"[a-z0-9_]+")
+
+
+@dataclass(eq=False)
+class Account:
+    """One of several TGTG accounts served by one bridge.
+
+    The bridge keeps the session of the account it is working for (client, tokens, favourites)
+    in module globals; while another account is active, this account's values of them are
+    parked in ``state``. ``index`` staggers the accounts' polls.
+    """
+
+    name: str
+    email: str
+    language: str
+    index: int
+    state: dict[str, Any] = field(default_factory=dict, repr=False)
+
+
+def parse_accounts(raw: Any, default_language: str) -> list[Account]:
+    """The accounts configured in ``tgtg.accounts``; raises ``ValueError`` on a broken entry."""
+    accounts: list[Account] = []
+    for index, entry in enumerate(raw or []):
+        name = str(entry.get("name", ""))
+        if not ACCOUNT_NAME.fullmatch(name):
+            raise ValueError(f"Account name {name!r} must consist of a-z, 0-9 and _ only")  # noqa: TRY003
+        if any(account.name == name for account in accounts):
+            raise ValueError(f"Account name {name!r} is used twice")  # noqa: TRY003
+        if not entry.get("email"):
+            raise ValueError(f"Account {name!r} has no email")  # noqa: TRY003
+        accounts.append(Account(name, str(entry["email"]), str(entry.get("language", default_language)), index))
+    return accounts
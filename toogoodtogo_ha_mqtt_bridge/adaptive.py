@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import json
+import math
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable
+
+MINUTES_PER_DAY = 24 * 60
+
+
+class DropTimes:
+    """Learns when favourites restock and predicts the windows worth polling closely.
+
+    A drop is a store's ``items_available`` going from 0 to more than 0 between two polls; it is
+    recorded as minute of the (local) day, per store and weekday, keeping the newest ``history``.
+    A store's window for a weekday spans the 10th to 90th percentile of its drops that day, padded
+    by ``margin`` minutes, once it dropped at least ``min_samples`` times on that weekday (or
+    across all weekdays otherwise). Stores whose drops spread over more than ``max_spread``
+    minutes are not predictable and get no window. Drops found by slow polls are recorded late,
+    so windows tighten as the closer polling inside them records more precise times.
+    """
+
+    def __init__(
+        self,
+        clock: Callable[[], datetime],
+        margin: int = 10,
+        min_samples: int = 2,
+        max_spread: int = 180,
+        history: int = 20,
+    ) -> None:
+        self.clock = clock
+        self.margin = margin
+        self.min_samples = min_samples
+        self.max_spread = max_spread
+        self.history = history
+        self.changed = False
+        self._drops: dict[str, dict[int, list[int]]] = {}  # item id -> weekday -> minutes of the day
+        self._stock: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Number of stores with recorded drops."""
+        return len(self._drops)
+
+    def observe(self, item_id: str, stock: int) -> None:
+        previous = self._stock.get(item_id)
+        self._stock[item_id] = stock
+        if previous == 0 and stock > 0:
+            self.record(item_id, self.clock())
+
+    def record(self, item_id: str, when: datetime) -> None:
+        with self._lock:
+            minutes = self._drops.setdefault(item_id, {}).setdefault(when.weekday(), [])
+            minutes.append(when.hour * 60 + when.minute)
+            del minutes[: -self.history]
+            self.changed = True
+
+    def windows(self, weekday: int) -> list[tuple[int, int]]:
+        """Merged ``(start, end)`` minutes of the day worth polling closely on ``weekday``."""
+        spans = []
+        with self._lock:
+            for days in self._drops.values():
+                samples = days.get(weekday, [])
+                if len(samples) < self.min_samples:
+                    samples = [minute for minutes in days.values() for minute in minutes]
+                span = self._window(samples)
+                if span is not None:
+                    spans.append(span)
+        merged: list[tuple[int, int]] = []
+        for start, end in sorted(spans):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    def _window(self, samples: list[int]) -> tuple[int, int] | None:
+        if len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        low = ordered[int(0.1 * (len(ordered) - 1))]
+        high = ordered[math.ceil(0.9 * (len(ordered) - 1))]
+        if high - low > self.max_spread:
+            return None
+        return max(0, low - self.margin), min(MINUTES_PER_DAY, high + self.margin)
+
+    def next_delay(self, now: datetime, fast: float, slow: float) -> float | None:
+        """Seconds until the next poll, ``None`` while no window could be predicted yet.
+
+        ``fast`` inside a window, otherwise ``slow`` or until the next window starts if that is sooner.
+        """
+        if not any(self.windows(weekday) for weekday in range(7)):
+            return None
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        for days_ahead in (0, 1):
+            day = midnight + timedelta(days=days_ahead)
+            for start, end in self.windows((now.weekday() + days_ahead) % 7):
+                if day + timedelta(minutes=start) <= now < day + timedelta(minutes=end):
+                    return fast
+                if now < day + timedelta(minutes=start):
+                    return max(1.0, min(slow, (day + timedelta(minutes=start) - now).total_seconds()))
+        return slow
+
+    def load(self, path: Path) -> None:
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            self._drops = {
+                str(item_id): {int(weekday): [int(minute) for minute in minutes] for weekday, minutes in days.items()}
+                for item_id, days in data.items()
+            }
+
+    def save(self, path: Path, keep: set[str]) -> None:
+        """Persist the drops of the stores in ``keep`` (the current favourites) if anything changed."""
+        with self._lock:
+            removed = set(self._drops) - keep
+            for item_id in removed:
+                del self._drops[item_id]
+            if not (self.changed or removed):
+                return
+            data = json.dumps(self._drops)
+            self.changed = False
+        path.write_text(data)
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+APP_ID = "com.app.tgtg"
+CACHE_FILE = "app_version.json"
+
+
+class AppVersionUnavailable(Exception):
+    """No app version is known yet and the Play Store lookup failed (or is backing off)."""
+
+
+def fetch_play_store_version() -> str:
+    from google_play_scraper import app  # only needed when the cached version is stale
+
+    return str(app(APP_ID, lang="de", country="de")["version"])
+
+
+class AppVersionService:
+    """The current TGTG app version, shared by everything that needs it.
+
+    The Play Store lookup scrapes a web page and can take seconds, so the version is cached in
+    memory and in the file returned by ``path`` (surviving restarts). Only the very first lookup
+    blocks: once a version is known, :meth:`get` always answers from the cache and refreshes it
+    in the background when it is older than ``max_age`` (stale-while-revalidate). Failed
+    lookups are retried after ``min_backoff`` seconds, doubling up to ``max_backoff``.
+    ``listeners`` are called with the new version whenever a background refresh changed it.
+    """
+
+    def __init__(
+        self,
+        path: Callable[[], Path],
+        max_age: float = 6 * 3600,
+        min_backoff: float = 60,
+        max_backoff: float = 6 * 3600,
+        fetch: Callable[[], str] = fetch_play_store_version,
+        clock: Callable[[], float] = time.time,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        self.path = path
+        self.max_age = max_age
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.fetch = fetch
+        self.clock = clock
+        self.logger = logger or logging.getLogger(__name__)
+        self.listeners: list[Callable[[str], None]] = []
+        self._current: tuple[str, float] | None = None  # version, fetched at
+        self._failures = 0
+        self._retry_at = 0.0
+        self._refreshing: threading.Thread | None = None
+        self._lock = threading.Lock()  # guards the state above
+        self._fetch_lock = threading.Lock()  # one lookup at a time
+
+    def get(self) -> str:
+        """The current version; blocks only if none was ever looked up (or cached on disk)."""
+        with self._lock:
+            if self._current is None:
+                self._current = self._read()
+            current = self._current
+            if current is not None:
+                if self.clock() - current[1] >= self.max_age:
+                    self._start_refresh()
+                return current[0]
+            if self.clock() < self._retry_at:
+                raise AppVersionUnavailable("Play Store lookup failed recently, not retrying yet")  # noqa: TRY003
+
+        with self._fetch_lock:
+            if self._current is not None:  # another caller was faster
+                return self._current[0]
+            try:
+                version = self.fetch()
+            except Exception as error:
+                self._failed()
+                raise AppVersionUnavailable("Could not look up the TGTG app version") from error  # noqa: TRY003
+            self._store(version)
+            return version
+
+    def refresh(self) -> threading.Thread | None:
+        """Look the version up again in the background, unless that is running or backing off."""
+        with self._lock:
+            return self._start_refresh()
+
+    def _start_refresh(self) -> threading.Thread | None:
+        if self._refreshing is not None or self.clock() < self._retry_at:
+            return None
+        self._refreshing = threading.Thread(target=self._refresh, name="app-version", daemon=True)
+        self._refreshing.start()
+        return self._refreshing
+
+    def _refresh(self) -> None:
+        try:
+            with self._fetch_lock:
+                previous = self._current
+                try:
+                    version = self.fetch()
+                except Exception:
+                    self._failed()
+                    self.logger.warning(
+                        f"Play Store lookup failed, keeping app version {previous and previous[0]} "
+                        f"(next try in {self._retry_at - self.clock():.0f}s)"
+                    )
+                    return
+                self._store(version)
+            if previous is None or previous[0] != version:
+                for listener in self.listeners:
+                    listener(version)
+        except Exception:
+            self.logger.exception("Error while refreshing the app version")
+        finally:
+            self._refreshing = None
+
+    def _failed(self) -> None:
+        with self._lock:
+            self._failures += 1
+            delay = min(self.max_backoff, self.min_backoff * 2 ** (self._failures - 1))
+            self._retry_at = self.clock() + delay
+
+    def _store(self, version: str) -> None:
+        with self._lock:
+            self._current = (version, self.clock())
+            self._failures = 0
+            self._retry_at = 0.0
+        path = self.path()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps({"version": version, "fetched_at": self._current[1]}))
+        except OSError:
+            self.logger.warning(f"Could not cache the app version in {path}")
+
+    def _read(self) -> tuple[str, float] | None:
+        try:
+            data = json.loads(self.path().read_text())
+            return str(data["version"]), float(data["fetched_at"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict, deque
+from collections.abc import Iterable, Mapping
+from typing import Any, Callable
+
+import paho.mqtt.client as mqtt
+
+TOPIC_CLASSES = ("discovery", "state", "attr", "raw")
+
+
+def topic_class(topic: str) -> str:
+    """The publish class of ``topic``, judged by its last level (``.../config`` is discovery)."""
+    leaf = topic.rsplit("/", 1)[-1]
+    if leaf == "config":
+        return "discovery"
+    if leaf in ("attr", "raw"):
+        return leaf
+    return "state"
+
+
+class DeliveryTracker:
+    """Publishes with a QoS per topic class and measures how long the broker took to confirm.
+
+    ``qos`` maps the classes of :data:`TOPIC_CLASSES` to a QoS level (missing ones use QoS 0), or
+    is a single level for all of them. Every publish is timestamped when it is queued and again
+    when paho reports it done via ``on_publish`` - for QoS 1/2 that is the broker's PUBACK/PUBCOMP,
+    for QoS 0 the moment the message left the socket. ``queued`` and ``delivered`` count both
+    ends, and :meth:`latency` summarises the last ``window`` enqueue-to-ack durations.
+    """
+
+    def __init__(
+        self,
+        qos: Mapping[str, int] | int | None = None,
+        window: int = 256,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if isinstance(qos, int):
+            qos = dict.fromkeys(TOPIC_CLASSES, qos)
+        self.qos = {name: int((qos or {}).get(name, 0)) for name in TOPIC_CLASSES}
+        if not all(level in (0, 1, 2) for level in self.qos.values()):
+            raise ValueError(f"QoS must be 0, 1 or 2: {self.qos}")  # noqa: TRY003
+        self.clock = clock
+        self.queued = 0
+        self.delivered = 0
+        self._sent: OrderedDict[int, float] = OrderedDict()  # mid -> enqueue time
+        self._early: dict[int, float] = {}  # acks that beat publish() returning the mid
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    @property
+    def confirms_delivery(self) -> bool:
+        """Whether any topic class waits for the broker to acknowledge its messages."""
+        return any(self.qos.values())
+
+    def qos_for(self, topic: str) -> int:
+        return self.qos[topic_class(topic)]
+
+    def publish(
+        self, client: Any, topic: str, payload: str | bytes | None = None, retain: bool = False, qos: int | None = None
+    ) -> Any:
+        """``client.publish`` with the topic class' QoS (or an explicit ``qos``), timestamped."""
+        queued_at = self.clock()
+        result = client.publish(topic, payload, retain=retain, qos=self.qos_for(topic) if qos is None else qos)
+        if result.rc != mqtt.MQTT_ERR_SUCCESS:
+            return result
+        with self._lock:
+            self.queued += 1
+            acked_at = self._early.pop(result.mid, None)
+            if acked_at is not None and acked_at >= queued_at:  # not a stale ack of a reused mid
+                self._record(acked_at - queued_at)
+            else:
+                self._sent[result.mid] = queued_at
+                if len(self._sent) > 4096:  # lost with a dropped connection, never acknowledged
+                    self._sent.popitem(last=False)
+        return result
+
+    def on_publish(self, client: Any, userdata: Any, mid: int, reason_code: Any = None, properties: Any = None) -> None:
+        """paho ``on_publish`` callback (callback API version 2); runs on the network thread."""
+        now = self.clock()
+        with self._lock:
+            queued_at = self._sent.pop(mid, None)
+            if queued_at is None:
+                self._early[mid] = now  # or a message published around this tracker
+                if len(self._early) > 4096:
+                    self._early.clear()
+            else:
+                self._record(now - queued_at)
+
+    def _record(self, latency: float) -> None:
+        self.delivered += 1
+        self._latencies.append(latency)
+
+    def wait_delivered(self, results: Iterable[Any], timeout: float) -> bool:
+        """Wait until every publish in ``results`` was confirmed; ``False`` if one was not in time."""
+        deadline = self.clock() + timeout
+        for result in results:
+            try:
+                result.wait_for_publish(max(0.0, deadline - self.clock()))
+                if not result.is_published():
+                    return False
+            except (ValueError, RuntimeError):  # not queued / connection lost
+                return False
+        return True
+
+    def latency(self) -> dict[str, float]:
+        """Enqueue-to-ack latency in seconds over the recent window (all zero before any ack)."""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if not samples:
+            return {"count": 0, "avg": 0.0, "p95": 0.0, "max": 0.0}
+        return {
+            "count": len(samples),
+            "avg": sum(samples) / len(samples),
+            "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+            "max": samples[-1],
+        }
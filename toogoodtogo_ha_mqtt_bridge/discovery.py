@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable
+
+import paho.mqtt.client as mqtt
+
+from toogoodtogo_ha_mqtt_bridge.publish_cache import UNCHANGED
+
+
+class DiscoveryManager:
+    """Publishes Home Assistant discovery configs once per session instead of on every poll.
+
+    Every config handed to :meth:`publish` is remembered, but only sent when it is new (a new
+    store) or its payload changed (e.g. the stock icon). :meth:`republish` sends all known
+    configs again and is meant for the moments HA may have forgotten them: an MQTT reconnect
+    and HA's ``<discovery_prefix>/status`` birth message. Steady-state polls thus only carry
+    state traffic.
+    """
+
+    def __init__(self, publish: Callable[[str, str], Any]) -> None:
+        self._publish = publish
+        self._lock = threading.Lock()  # republish runs on the MQTT network thread
+        self._configs: dict[str, str] = {}  # topic -> latest config payload
+        self._sent: dict[str, str] = {}  # topic -> payload published in this session
+
+    def publish(self, topic: str, payload: str) -> Any:
+        with self._lock:
+            self._configs[topic] = payload
+            if self._sent.get(topic) == payload:
+                return UNCHANGED
+            result = self._publish(topic, payload)
+            if result.rc == mqtt.MQTT_ERR_SUCCESS:
+                self._sent[topic] = payload
+            return result
+
+    def republish(self) -> int:
+        """Send every known config again; returns the number of configs published."""
+        with self._lock:
+            self._sent.clear()
+            for topic, payload in self._configs.items():
+                if self._publish(topic, payload).rc == mqtt.MQTT_ERR_SUCCESS:
+                    self._sent[topic] = payload
+            return len(self._sent)
+
+    def forget(self, topic: str) -> None:
+        """Drop a config whose entity was removed, so it is not resurrected by a republish."""
+        with self._lock:
+            self._configs.pop(topic, None)
+            self._sent.pop(topic, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._configs.clear()
+            self._sent.clear()
+
+    def __contains__(self, topic: object) -> bool:
+        return topic in self._configs
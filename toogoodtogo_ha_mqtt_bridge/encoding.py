@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import json
+from typing import Any
+
+try:  # optional speed-up: `pip install orjson`
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+def _stdlib_dumps(obj: Any) -> str:
+    # Same output as orjson (compact, UTF-8), so payloads don't change with the backend.
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+def dumps(obj: Any) -> str:
+    """Encode ``obj`` as compact JSON, with orjson when it is installed."""
+    if HAS_ORJSON:
+        try:
+            return str(orjson.dumps(obj).decode())
+        except TypeError:  # e.g. integers beyond 64 bit, which the stdlib encoder handles
+            pass
+    return _stdlib_dumps(obj)
+
+
+def fragment(**values: Any) -> str:
+    """Pre-serialize constant ``"key":value`` pairs once, for splicing with :func:`dumps_with`."""
+    return dumps(values)[1:-1]
+
+
+def dumps_with(obj: dict[str, Any], static: str) -> str:
+    """Encode ``obj`` and splice in the pre-serialized pairs of a :func:`fragment`."""
+    body = dumps(obj)
+    if not static:
+        return body
+    if body == "{}":
+        return "{" + static + "}"
+    return body[:-1] + "," + static + "}"
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import functools
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+DAY = 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stock (
+    item_id TEXT NOT NULL,
+    at INTEGER NOT NULL,  -- unix time of the poll that saw the change
+    stock INTEGER NOT NULL,
+    price INTEGER NOT NULL,  -- in cents
+    pickup_start INTEGER,  -- unix time, NULL without a pickup window
+    pickup_end INTEGER,
+    PRIMARY KEY (item_id, at)
+) WITHOUT ROWID
+"""
+
+# Older rows are thinned out to the availability changes (sold out <-> available) plus the last
+# row of every bucket, per store.
+DOWNSAMPLE = """
+DELETE FROM stock WHERE (item_id, at) IN (
+    SELECT item_id, at FROM (
+        SELECT item_id, at, stock,
+            LAG(stock) OVER store AS previous,
+            LEAD(at) OVER store AS next_at
+        FROM stock WHERE at < :cutoff
+        WINDOW store AS (PARTITION BY item_id ORDER BY at)
+    )
+    WHERE (previous > 0) = (stock > 0) AND next_at / :bucket = at / :bucket
+)
+"""
+
+
+class Sample(NamedTuple):
+    at: int
+    stock: int
+    price: float
+    pickup_start: int | None
+    pickup_end: int | None
+
+
+@functools.lru_cache(maxsize=2048)  # pickup windows mostly repeat from one poll to the next
+def _timestamp(raw: str | None) -> int | None:
+    return int(datetime.fromisoformat(raw).timestamp()) if raw else None
+
+
+class StockHistory:
+    """Append-only history of the favourites' stock, price and pickup window in a SQLite file.
+
+    :meth:`record` is called for every store of a poll but only buffers a row when something
+    changed since the store's last row; :meth:`flush` writes the buffered rows of a cycle in one
+    transaction. Only the last row per store is kept in memory. :meth:`compact` deletes rows
+    older than ``retention_days`` and thins out rows older than ``downsample_after_days`` to one
+    per ``downsample_bucket`` seconds, keeping every change between sold out and available.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        retention_days: float = 90,
+        downsample_after_days: float = 7,
+        downsample_bucket: int = 3600,
+        clock: Callable[[], float] = time.time,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        self.retention_days = retention_days
+        self.downsample_after_days = downsample_after_days
+        self.downsample_bucket = downsample_bucket
+        self.clock = clock
+        self.logger = logger or logging.getLogger(__name__)
+        self._db = sqlite3.connect(path, check_same_thread=False)  # polls run on executor threads
+        self._db.execute(SCHEMA)
+        self._lock = threading.Lock()  # guards the connection and the state below
+        self._pending: list[tuple[str, int, int, int, int | None, int | None]] = []
+        self._last: dict[str, tuple[int, int, int | None, int | None]] = {
+            item_id: tuple(state)
+            for item_id, _, *state in self._db.execute(
+                "SELECT item_id, MAX(at), stock, price, pickup_start, pickup_end FROM stock GROUP BY item_id"
+            )
+        }
+
+    def record(self, item_id: str, stock: int, price: float, pickup_start: str | None, pickup_end: str | None) -> None:
+        """Buffer a row for the store if its stock, price or pickup window changed."""
+        state = (stock, round(price * 100), _timestamp(pickup_start), _timestamp(pickup_end))
+        with self._lock:
+            if self._last.get(item_id) == state:
+                return
+            self._last[item_id] = state
+            self._pending.append((item_id, int(self.clock()), *state))
+
+    def flush(self) -> int:
+        """Write the rows buffered since the last flush; returns their number."""
+        with self._lock:
+            rows, self._pending = self._pending, []
+            if rows:
+                with self._db:
+                    self._db.executemany("INSERT OR REPLACE INTO stock VALUES (?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def compact(self) -> int:
+        """Apply retention and downsampling; returns the number of deleted rows."""
+        now = self.clock()
+        with self._lock, self._db:
+            deleted = self._db.execute(
+                "DELETE FROM stock WHERE at < ?", (int(now - self.retention_days * DAY),)
+            ).rowcount
+            deleted += self._db.execute(
+                DOWNSAMPLE,
+                {"cutoff": int(now - self.downsample_after_days * DAY), "bucket": self.downsample_bucket},
+            ).rowcount
+        self.logger.debug(f"Compacted the stock history, deleted {deleted} row(s)")
+        return deleted
+
+    def samples(self, item_id: str, since: float = 0, until: float | None = None) -> list[Sample]:
+        """The recorded changes of one store, oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT at, stock, price, pickup_start, pickup_end FROM stock "
+                "WHERE item_id = ? AND at >= ? AND at <= ? ORDER BY at",
+                (item_id, int(since), int(self.clock() if until is None else until)),
+            ).fetchall()
+        return [Sample(at, stock, price / 100, start, end) for at, stock, price, start, end in rows]
+
+    def drops(self, since: float = 0) -> dict[str, list[int]]:
+        """Per store, when it went from sold out to available (unix times, oldest first)."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT item_id, at FROM ("
+                "SELECT item_id, at, stock, LAG(stock) OVER (PARTITION BY item_id ORDER BY at) AS previous "
+                "FROM stock WHERE at >= ?"
+                ") WHERE previous = 0 AND stock > 0 ORDER BY at",
+                (int(since),),
+            ).fetchall()
+        drops: dict[str, list[int]] = {}
+        for item_id, at in rows:
+            drops.setdefault(item_id, []).append(at)
+        return drops
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
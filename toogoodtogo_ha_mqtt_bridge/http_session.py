@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from toogoodtogo_ha_mqtt_bridge.ratelimit import RateLimiter
+
+# (endpoint, connect seconds (0 on a reused connection), seconds to the response headers, total seconds)
+Observer = Callable[[str, float, float, float], None]
+
+PUSHBACK_STATUSES = (403, 429)  # captcha (DataDome) and too many requests
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+_connect_time = threading.local()  # a request and the connect it triggers run on the same thread
+
+
+def _add_connect_time(seconds: float) -> None:
+    _connect_time.total = getattr(_connect_time, "total", 0.0) + seconds
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self) -> None:
+        started = time.perf_counter()
+        super().connect()
+        _add_connect_time(time.perf_counter() - started)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self) -> None:  # TCP and TLS handshake
+        started = time.perf_counter()
+        super().connect()
+        _add_connect_time(time.perf_counter() - started)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _TimedHTTPConnectionPool, "https": _TimedHTTPSConnectionPool}
+
+
+def connection_pool(pool_size: int = 10) -> HTTPAdapter:
+    """An adapter keeping up to ``pool_size`` connections per host alive; share it between sessions."""
+    return _TimedAdapter(pool_connections=4, pool_maxsize=pool_size)
+
+
+def endpoint_name(url: str) -> str:
+    """The path of an API URL with ids replaced, e.g. ``/api/item/v8/{id}``."""
+    return _ID_SEGMENT.sub("/{id}", urlsplit(url).path).rstrip("/") or "/"
+
+
+def retry_after(response: requests.Response) -> float | None:
+    """Seconds the ``Retry-After`` header asks to wait, if it has a valid one."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+    except (TypeError, ValueError):  # not a date, or one without a timezone
+        return None
+
+
+class PooledSession(requests.Session):
+    """A ``requests`` session meant to outlive the TGTG clients using it.
+
+    Connections (and their TLS sessions) are kept alive in a pool of ``pool_size`` per host, so
+    a rebuilt client or the next poll reuses them instead of doing a new handshake. Sessions
+    given the same ``adapter`` (from :func:`connection_pool`) share its pool but each keeps its
+    own cookie jar, so several accounts can use warm connections without mixing cookies. Every
+    request is reported to ``observer`` with its endpoint, the time spent connecting (0 when a
+    pooled connection was reused), the time until the response headers arrived, and in total.
+
+    With a ``limiter`` every request takes a slot from it first, waiting at most ``max_wait``
+    seconds (:class:`~toogoodtogo_ha_mqtt_bridge.ratelimit.RateLimited` is raised otherwise);
+    403 and 429 responses pause the limiter, honoring ``Retry-After``.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 10,
+        adapter: HTTPAdapter | None = None,
+        observer: Observer | None = None,
+        limiter: RateLimiter | None = None,
+        max_wait: float | None = None,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        super().__init__()
+        self.observer = observer
+        self.limiter = limiter
+        self.max_wait = max_wait
+        self.logger = logger or logging.getLogger(__name__)
+        adapter = adapter or connection_pool(pool_size)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        if self.limiter is not None:
+            self.limiter.acquire(max_wait=self.max_wait)
+        _connect_time.total = 0.0
+        started = time.perf_counter()
+        response = super().send(request, **kwargs)
+        total = time.perf_counter() - started
+        endpoint = endpoint_name(request.url or "")
+        if self.observer is not None:
+            self.observer(endpoint, _connect_time.total, response.elapsed.total_seconds(), total)
+        if self.limiter is not None:
+            if response.status_code in PUSHBACK_STATUSES:
+                pause = self.limiter.penalize(retry_after(response))
+                self.logger.warning(
+                    f"TGTG answered {response.status_code} on {endpoint}, pausing all calls for {pause:.0f}s "
+                    f"(at most {self.limiter.rate:.2f} calls/s from now on)"
+                )
+            elif response.status_code < 400:
+                self.limiter.succeeded()
+        return response
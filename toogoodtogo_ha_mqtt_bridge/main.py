@@ -1,32 +1,53 @@
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import functools
 import json
 import logging
 import os
-import random
-import re
+import signal
+import sqlite3
 import threading
 import time
+from collections.abc import Coroutine, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
+from http import HTTPStatus
 from pathlib import Path
 from time import sleep
-from typing import Any
+from typing import TYPE_CHECKING, Any, Callable, TypeVar
 
 import arrow
 import click
 import coloredlogs
 import paho.mqtt.client as mqtt
-import schedule
-from croniter import croniter
-from google_play_scraper import app
-from packaging import version
-from random_user_agent.params import SoftwareName
-from random_user_agent.user_agent import UserAgent
-from tgtg import TgtgClient
+from tgtg import BASE_URL, TgtgClient
+from tgtg.exceptions import TgtgAPIError
 
+from toogoodtogo_ha_mqtt_bridge.accounts import Account, parse_accounts
+from toogoodtogo_ha_mqtt_bridge.adaptive import DropTimes
+from toogoodtogo_ha_mqtt_bridge.app_version import AppVersionService, AppVersionUnavailable
 from toogoodtogo_ha_mqtt_bridge.config import settings
+from toogoodtogo_ha_mqtt_bridge.delivery import DeliveryTracker
+from toogoodtogo_ha_mqtt_bridge.discovery import DiscoveryManager
+from toogoodtogo_ha_mqtt_bridge.encoding import dumps, dumps_with, fragment
+from toogoodtogo_ha_mqtt_bridge.history import StockHistory
+from toogoodtogo_ha_mqtt_bridge.http_session import PooledSession, connection_pool
+from toogoodtogo_ha_mqtt_bridge.metrics import Registry
+from toogoodtogo_ha_mqtt_bridge.publish_cache import UNCHANGED, PublishCache
+from toogoodtogo_ha_mqtt_bridge.ratelimit import RateLimited, RateLimiter
+from toogoodtogo_ha_mqtt_bridge.removal import BulkRemover
+from toogoodtogo_ha_mqtt_bridge.scheduler import CronSchedule, Scheduler, compile_cron, cron_delay
+from toogoodtogo_ha_mqtt_bridge.store_index import StoreIndex
+from toogoodtogo_ha_mqtt_bridge.timestamps import Humanizer, local_isoformat, localize
+from toogoodtogo_ha_mqtt_bridge.token_manager import TokenManager
+from toogoodtogo_ha_mqtt_bridge.topics import TopicRegistry
 from toogoodtogo_ha_mqtt_bridge.watchdog import Watchdog
 
+if TYPE_CHECKING:
+    from toogoodtogo_ha_mqtt_bridge.profiling import CycleProfiler
+
 logger = logging.getLogger(__name__)
 coloredlogs.install(
     level="DEBUG", logger=logger, fmt="%(asctime)s [%(levelname)s] %(message)s"
@@ -34,18 +55,137 @@ coloredlogs.install(
 
 mqtt_client: mqtt.Client = None  # type: ignore[assignment]
 first_run = True
+authenticated = False  # whether login() went through for the session
+login_failures = 0  # failed login attempts in a row
 tgtg_client: TgtgClient = None  # type: ignore[no-any-unimported]
-tgtg_version: str | None = None
-intense_fetch_thread = None
+TGTG_TIMEOUT = 30  # seconds per TGTG API request
+session_ready: Future[None] | None = None  # the login started by start()
+intense_fetch_task: asyncio.Task[None] | None = None
+# Stores polled by a targeted intense fetch (item id -> monotonic end of its period); empty for a full one.
+intense_fetch_targets: dict[str, float] = {}
+intense_fetch_end = 0.0  # monotonic end of a full intense fetch
 tokens: dict[Any, Any] = {}
 tokens_rev = 2  # in case of tokens.json changes, bump this
+TOKEN_REFRESH_MARGIN = 300  # refresh the access token this many seconds before it expires
+token_manager = TokenManager(refresh_margin=TOKEN_REFRESH_MARGIN)
 watchdog: Watchdog = None  # type: ignore[assignment]
-watchdog_timeout = 0
+watchdog_timeout = 0.0
 favourite_ids: list[int] = []
 # Item ids from the last *fully successful* publish_stores_data run. The full cleanup
 # reconciles against this snapshot so it never acts on a partially-built favourites list.
-last_successful_favourite_ids: set[str] = set()
-scheduled_jobs: list[Any] = []
+last_successful_favourite_ids: set[str] | None = None  # None until the first one
+history: StockHistory | None = None  # opened by open_history() if enabled
+
+# Multi-account mode (tgtg.accounts): one session per account, sharing everything else. The
+# session lives in the globals below and is swapped to the polled account's under check_lock.
+accounts: list[Account] = []
+active_account: Account | None = None
+ACCOUNT_GLOBALS = (
+    "tgtg_client",
+    "tokens",
+    "token_manager",
+    "favourite_ids",
+    "last_successful_favourite_ids",
+    "first_run",
+    "authenticated",
+    "login_failures",
+    "http_session",
+)
+ACCOUNT_STAGGER = 30  # default seconds between the polls of two accounts
+MAX_LOGIN_FAILURES = 3  # after as many failed logins in a row, the cleanups stop waiting for an account
+
+# Everything runs as a task on one asyncio event loop; blocking TGTG/MQTT calls are offloaded to
+# a small, bounded executor. Only the loop thread touches the task globals above.
+EXECUTOR_WORKERS = 8
+executor = ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS, thread_name_prefix="toogoodtogo")
+event_loop: asyncio.AbstractEventLoop | None = None
+background_tasks: set[asyncio.Task[None]] = set()
+check_lock = threading.RLock()  # cron and intense fetch polls must never overlap
+T = TypeVar("T")
+
+# All timed work (polls, cleanup, version checks, automatic intense fetches) lives on one scheduler.
+scheduler = Scheduler(logger=logger)
+NEXT_SALES_SCHEDULE = compile_cron("0 8,11,14,17,20 * * *")
+UA_CHECK_SCHEDULE = compile_cron("0 0,12 * * *")
+HISTORY_COMPACT_SCHEDULE = compile_cron("30 3 * * *")
+CALL_JITTER = 20  # max seconds added to each poll when randomize_calls is set
+
+# Request-rate limit shared by every TGTG API call (see new_http_session below), backing off when refused.
+api_limiter = RateLimiter(
+    rate=float((settings.get("tgtg") or {}).get("requests_per_second", 5)),
+    burst=int((settings.get("tgtg") or {}).get("max_concurrent_requests", 4)),
+)
+# Always collected (it's a few dict updates); served over HTTP only when metrics.port is set.
+metrics = Registry()
+CHECK_DURATION = metrics.histogram("tgtg_bridge_check_duration_seconds", "Duration of a poll cycle", ["result"])
+API_DURATION = metrics.histogram(
+    "tgtg_bridge_api_request_duration_seconds", "Latency of TGTG API calls, incl. failed ones", ["endpoint"]
+)
+API_ERRORS = metrics.counter("tgtg_bridge_api_errors_total", "Failed TGTG API calls", ["endpoint"])
+STAGE_DURATION = metrics.histogram(
+    "tgtg_bridge_stage_duration_seconds", "Time spent per stage of a poll cycle, API calls included", ["stage"]
+)
+MESSAGES = metrics.counter("tgtg_bridge_mqtt_messages_total", "MQTT messages by outcome", ["outcome"])
+INTENSE_FETCH_RUNS = metrics.counter("tgtg_bridge_intense_fetch_runs_total", "Intense fetch sessions started")
+WATCHDOG_RESETS = metrics.counter("tgtg_bridge_watchdog_resets_total", "Watchdog resets after a poll")
+MQTT_RECONNECTS = metrics.counter("tgtg_bridge_mqtt_reconnects_total", "Reconnects after losing the broker")
+HTTP_DURATION = metrics.histogram(
+    "tgtg_bridge_http_request_duration_seconds",
+    "TGTG HTTP requests: connect (new connections only), time to the response headers, and total",
+    ["endpoint", "phase"],
+)
+HTTP_CONNECTIONS = metrics.counter(
+    "tgtg_bridge_http_connections_total", "TGTG HTTP requests by connection (new or reused)", ["endpoint", "connection"]
+)
+
+API_RATE = metrics.gauge(
+    "tgtg_bridge_api_rate", "Current TGTG API call rate limit per second", lambda: api_limiter.rate
+)
+API_PAUSED = metrics.gauge(
+    "tgtg_bridge_api_paused_seconds",
+    "Seconds until TGTG API calls resume after the API refused one",
+    lambda: api_limiter.state()["paused_for"],
+)
+
+# One connection pool for all TGTG clients, so client rebuilds and later polls reuse warm connections.
+# Every account has an HTTP session of its own on it, keeping its cookies (DataDome) to itself.
+http_pool = connection_pool(pool_size=EXECUTOR_WORKERS)
+
+
+def new_http_session() -> PooledSession:
+    return PooledSession(
+        adapter=http_pool,
+        observer=lambda *timings: observe_http(*timings),
+        limiter=api_limiter,
+        max_wait=TGTG_TIMEOUT,
+        logger=logger,
+    )
+
+
+http_session = new_http_session()
+
+profiler: CycleProfiler | None = None  # set up in start() when profiling is configured
+app_versions = AppVersionService(lambda: Path(settings.get("data_dir")) / "app_version.json", logger=logger)
+app_versions.listeners.append(lambda latest_version: on_app_version(latest_version))  # defined further down
+
+# Digest of the last successfully published payload per topic, so unchanged messages are skipped.
+publish_cache = PublishCache(refresh_every=int(settings.get("full_republish_every", 30)))
+# "in 2 hours" style pickup times, relative to one "now" per poll cycle.
+humanizer = Humanizer()
+# Store entities the broker holds, kept current by our own <base>/+/state subscription.
+store_index = StoreIndex()
+
+ADAPTIVE_FAST_INTERVAL = 60  # seconds between polls inside a predicted drop window
+ADAPTIVE_SLOW_INTERVAL = 1800  # at most this many seconds between polls outside of them
+drop_times = DropTimes(
+    clock=lambda: local_now(),  # defined further down
+    margin=int((settings.get("adaptive_polling") or {}).get("margin", 10)),
+    min_samples=int((settings.get("adaptive_polling") or {}).get("min_samples", 2)),
+)
+# QoS per topic class (discovery/state/attr/raw) and enqueue-to-PUBACK latency of our publishes.
+delivery = DeliveryTracker(qos=settings.get("mqtt", {}).get("qos"))
+# Home Assistant discovery configs, published once per session (see DiscoveryManager).
+discovery = DiscoveryManager(lambda topic, payload: send(topic, payload))
 
 DEVICE_INFO = {
     "identifiers": ["toogoodtogo_bridge"],
@@ -53,31 +193,37 @@ DEVICE_INFO = {
     "model": "TooGoodToGo favorites",
     "name": "Too Good To Go",
 }
+# Constant parts of the discovery payloads, serialized once and spliced into every payload.
+DEVICE_FRAGMENT = fragment(device=DEVICE_INFO)
+STORE_CONFIG_FRAGMENT = fragment(
+    unit_of_measurement="portions", value_template="{{ value_json.stock }}", device=DEVICE_INFO
+)
 
 
 # --- Configurable MQTT topics (see #131). All default to the historical topics, so existing
-# setups are unaffected; read lazily so settings changes/tests take effect at call time. ---
+# setups are unaffected. Settings are only read at startup, so the topic settings and every
+# store's topics are resolved once; tests changing them call ``topics.invalidate()``. ---
+topics = TopicRegistry(settings)
+
+
 def data_base() -> str:
     """Base topic for the sensor state/attribute/raw data topics."""
-    value = (settings.get("mqtt") or {}).get("base")
-    return "homeassistant/sensor" if value is None else str(value)
+    return topics.prefixes.data_base
 
 
 def discovery_prefix() -> str:
     """Home Assistant MQTT discovery prefix (where ``.../config`` topics live)."""
-    value = (settings.get("homeassistant") or {}).get("discovery_prefix")
-    return "homeassistant" if value is None else str(value)
+    return topics.prefixes.discovery_prefix
 
 
 def homeassistant_enabled() -> bool:
     """Whether to publish Home Assistant discovery configs (and the intense-fetch switch)."""
-    value = (settings.get("homeassistant") or {}).get("enabled")
-    return True if value is None else bool(value)
+    return topics.prefixes.homeassistant_enabled
 
 
 def raw_enabled() -> bool:
     """Whether to also publish the full raw store payload (for non-HA MQTT consumers)."""
-    return bool(settings.get("raw", False))
+    return topics.prefixes.raw_enabled
 
 
 def entity_naming(default_entity_id: str, name: str) -> dict[str, Any]:
@@ -98,116 +244,214 @@ def entity_naming(default_entity_id: str, name: str) -> dict[str, Any]:
     return {"name": name, "default_entity_id": default_entity_id}
 
 
+def send(topic: str, payload: str | None = None, retain: bool = False, qos: int | None = None) -> Any:
+    """Publish through the delivery tracker and count the outcome."""
+    result = delivery.publish(mqtt_client, topic, payload, retain=retain, qos=qos)
+    MESSAGES.inc(outcome="published" if result.rc == mqtt.MQTT_ERR_SUCCESS else "failed")
+    return result
+
+
+def publish_config(topic: str, payload: str) -> Any:
+    """Publish a Home Assistant discovery config (see :class:`DiscoveryManager`)."""
+    result = discovery.publish(topic, payload)
+    if result is UNCHANGED:
+        MESSAGES.inc(outcome="skipped")
+    return result
+
+
+def publish_cached(topic: str, payload: str | None = None, retain: bool = False) -> Any:
+    """Publish a message unless the very same payload was already published to ``topic``.
+
+    Skipped publishes return :data:`UNCHANGED`, which reports success like a queued message.
+    Empty payloads (retained-message deletions) are always sent and drop the cached digest.
+    """
+    if publish_cache.is_unchanged(topic, payload):
+        MESSAGES.inc(outcome="skipped")
+        return UNCHANGED
+    result = send(topic, payload, retain=retain)
+    if result.rc == mqtt.MQTT_ERR_SUCCESS:
+        publish_cache.record(topic, payload)
+    return result
+
+
 def publish_state(topic: str, payload: str | None = None) -> Any:
     """Publish a retained state/attribute message.
 
     State and attribute messages are retained so Home Assistant receives the current value
     the instant it subscribes. Without retain a freshly discovered entity shows ``unknown``
     until the next poll, because the value is published before HA has created the entity and
-    subscribed to its topic (issue #85).
+    subscribed to its topic (issue #85). As they are retained, unchanged payloads are skipped.
     """
-    return mqtt_client.publish(topic, payload, retain=True)
+    return publish_cached(topic, payload, retain=True)
 
 
-CLEANUP_SCAN_SECONDS = 5  # how long to collect retained messages from the broker
+def delete_retained(topic: str) -> Any:
+    """Delete a retained message with QoS 1, so the broker acknowledges the deletion."""
+    discovery.forget(topic)
+    publish_cache.forget(topic)
+    return send(topic, retain=True, qos=1)
 
 
-def full_cleanup(current_item_ids: set[str]) -> None:
+def store_topics(item_id: str) -> list[str]:
+    """Every retained topic of one store entity: discovery config, state and attributes."""
+    item_topics = topics.item(item_id)
+    return [item_topics.config, item_topics.state, item_topics.attr]
+
+
+# Removes stores no longer in the favourites; unacknowledged removals are retried next cycle.
+store_remover = BulkRemover(delete_retained, store_topics, logger=logger)
+
+
+FAVOURITES_PAGE_SIZE = 100  # stores per get_items page; pages are published as they arrive
+
+
+def full_cleanup(current_item_ids: set[str] | None) -> None:
     """Remove Home Assistant entities for stores that are no longer favourites.
 
     Unlike :func:`check_for_removed_stores` (which only knows stores recorded in
-    ``known_shops.json``), this reconciles against the MQTT broker itself: it discovers every
-    store entity the broker still holds via their retained state topics and clears
-    (config + state + attr) any whose item id is not in ``current_item_ids``. This makes
-    cleanup robust to a fresh add-on install or a wiped data dir, where ``known_shops.json`` is
-    gone. On by default; set ``full_cleanup: false`` to disable.
+    ``known_shops.json``), this reconciles against the MQTT broker itself: the live
+    :data:`store_index` knows every store entity the broker still holds via their retained state
+    topics, and any whose item id is not in ``current_item_ids`` is cleared (config + state +
+    attr). This makes cleanup robust to a fresh add-on install or a wiped data dir, where
+    ``known_shops.json`` is gone. Being a plain set difference, it runs after every successful
+    poll. On by default; set ``full_cleanup: false`` to disable.
     """
+    if current_item_ids is None:
+        logger.debug("Full cleanup skipped: not every account was polled yet")
+        return
     if not current_item_ids:
         # Never reconcile against an empty list - that would delete every entity.
         logger.warning("Full cleanup skipped: no current favourites to reconcile against")
         return
 
-    seen: set[str] = set()
-    store_state_topic = re.compile(rf"^{re.escape(data_base())}/toogoodtogo_(\d+)/state$")
-
-    def on_scan_message(client: Any, userdata: Any, message: Any) -> None:
-        # A numeric id means a store sensor; this structurally excludes the fixed diagnostic
-        # sensors (next_collection / upcoming_orders / last_updated) and the switch.
-        match = store_state_topic.match(message.topic)
-        if match and message.payload:  # retained and non-empty => a live store entity
-            seen.add(match.group(1))
-
-    scanner = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id="toogoodtogo-cleanup-scan")
-    if settings.mqtt.username:
-        scanner.username_pw_set(username=settings.mqtt.username, password=settings.mqtt.password)
-    scanner.on_message = on_scan_message
-    scanner.connect(host=settings.mqtt.host, port=int(settings.mqtt.port))
-    scanner.loop_start()
-    scanner.subscribe(f"{data_base()}/+/state")  # retained messages are replayed on subscribe
-    sleep(CLEANUP_SCAN_SECONDS)
-    scanner.loop_stop()
-    scanner.disconnect()
-
+    seen = store_index.ids()
     orphans = seen - current_item_ids
     for item_id in orphans:
         logger.info(f"Full cleanup: removing orphaned store {item_id}")
+    if orphans or store_remover.pending:
         # An empty retained payload deletes the retained message and removes the HA entity.
-        mqtt_client.publish(f"{discovery_prefix()}/sensor/toogoodtogo_bridge/{item_id}/config", retain=True)
-        mqtt_client.publish(f"{data_base()}/toogoodtogo_{item_id}/state", retain=True)
-        mqtt_client.publish(f"{data_base()}/toogoodtogo_{item_id}/attr", retain=True)
-    logger.info(f"Full cleanup finished: removed {len(orphans)} orphan(s), kept {len(seen & current_item_ids)}")
+        report = store_remover.remove(orphans, keep=current_item_ids)
+        logger.info(
+            f"Full cleanup finished: removed {len(report.removed)} orphan(s), "
+            f"kept {len(seen & current_item_ids)}, {len(report.failed)} retried next cycle"
+        )
 
 
-def cleanup_loop() -> None:
-    """Run :func:`full_cleanup` once the first fetch has succeeded, then daily."""
-    while not last_successful_favourite_ids:  # wait for a trusted favourites snapshot
-        sleep(30)
-    while True:
+def refresh_tokens(force: bool = False) -> None:
+    """Refresh the access token when it is about to expire and persist it if it changed."""
+    started = time.perf_counter()
+    try:
+        refreshed = token_manager.ensure_fresh(tgtg_client, force=force)
+    except Exception:
+        API_ERRORS.inc(endpoint="login")
+        raise
+    if refreshed:
+        API_DURATION.observe(time.perf_counter() - started, endpoint="login")
+        logger.debug("Access token refreshed")
+    write_token_file()
+
+
+def call_api(func: Any, *args: Any, **kwargs: Any) -> Any:
+    """Call a TGTG API method, recording its latency and errors."""
+    endpoint = getattr(func, "__name__", "unknown")
+    with API_DURATION.time(endpoint=endpoint):
         try:
-            full_cleanup(set(last_successful_favourite_ids))
+            return func(*args, **kwargs)
         except Exception:
-            # A transient broker error must not permanently stop the daily cleanup.
-            logger.exception("Full cleanup run failed; will retry on the next schedule")
-        now = datetime.now()
-        next_run = croniter("0 4 * * *", now).get_next(datetime)
-        sleep((next_run - now).seconds)
+            API_ERRORS.inc(endpoint=endpoint)
+            raise
+
+
+def call_with_token_retry(func: Any, *args: Any, account: Account | None = None, **kwargs: Any) -> Any:
+    """Call a TGTG API method, refreshing the token and retrying once if it got rejected.
+
+    ``func`` is a method of the active session's client, or of ``account``'s when called
+    outside a poll; that's the session whose token gets refreshed.
+    """
+    try:
+        return call_api(func, *args, **kwargs)
+    except TgtgAPIError as error:
+        if not error.args or error.args[0] != HTTPStatus.UNAUTHORIZED:
+            raise
+        logger.info("Access token was rejected, refreshing it and retrying")
+        with account_session(account):  # not while a poll swaps the session to another account
+            refresh_tokens(force=True)
+        return call_api(func, *args, **kwargs)
+
+
+def check(account: Account | None = None) -> bool:
+    # Cron and intense fetch polls run on different executor workers; serialize them.
+    with account_session(account):
+        if account is not None and not authenticated and not try_login():
+            return False
+        started = time.perf_counter()
+        successful = False
+        try:
+            with profiler.cycle() if profiler is not None else contextlib.nullcontext():
+                successful = run_check()
+        finally:
+            result = "success" if successful else "failure"
+            CHECK_DURATION.observe(time.perf_counter() - started, result=result)
+        return successful
+
+
+def check_all() -> bool:
+    """Poll every account, one after the other."""
+    results = [check(account) for account in sessions()]  # every account, even after a failed one
+    return all(results)
 
 
-def check() -> bool:
+def run_check() -> bool:
     global first_run
 
-    if not first_run:
-        tgtg_client.login()
-        write_token_file()
+    with STAGE_DURATION.time(stage="tokens"):
+        refresh_tokens()
+    publish_cache.start_cycle()
+    humanizer.start_cycle()
 
+    # Publish page by page, but only commit the favourites (and act on removals) once all
+    # pages went through, so a failed page never makes stores look removed.
+    item_ids: list[Any] = []
     try:
-        shops = tgtg_client.get_items(page_size=400)
-        if not publish_stores_data(shops):
-            return False
+        with STAGE_DURATION.time(stage="stores"):
+            for shops in iter_favourite_pages():
+                if not publish_stores_page(shops, item_ids):
+                    return False
     except Exception:
         logging.exception("Error fetching stores")
         return False
+    commit_favourites(item_ids)
+    save_drop_times()
+    flush_history()
 
-    if settings.get("cleanup"):
-        check_for_removed_stores(shops)
+    with STAGE_DURATION.time(stage="cleanup"):
+        warn_about_awaited_accounts()
+        if settings.get("cleanup"):
+            check_for_removed_stores(item_ids)
+        if settings.get("full_cleanup", True):  # on by default; set full_cleanup: false to disable
+            full_cleanup(all_favourite_ids())
 
     # Orders / last-updated are Home Assistant diagnostic sensors; skip them when HA is disabled.
     if homeassistant_enabled():
         try:
-            active_orders = tgtg_client.get_active()
-            if not publish_orders_data(active_orders):
-                return False
+            with STAGE_DURATION.time(stage="orders"):
+                active_orders = call_with_token_retry(tgtg_client.get_active)
+                if not publish_orders_data(active_orders):
+                    return False
         except Exception:
             logging.exception("Error fetching active orders")
             return False
 
-        if not publish_last_updated():
-            return False
+        with STAGE_DURATION.time(stage="last_updated"):
+            if not publish_last_updated():
+                return False
 
-    # Start automatic intense fetch watchdog
-    if first_run and settings.get("enable_auto_intense_fetch"):
-        thread = threading.Thread(target=next_sales_loop)
-        thread.start()
+    logger.debug(f"Skipped {publish_cache.skipped} unchanged message(s)")
+    latency = delivery.latency()
+    logger.debug(
+        f"MQTT delivery: {delivery.queued} queued, {delivery.delivered} delivered, latency "
+        f"avg {latency['avg'] * 1000:.1f}ms / p95 {latency['p95'] * 1000:.1f}ms / max {latency['max'] * 1000:.1f}ms"
+    )
 
     first_run = False
 
@@ -225,55 +469,260 @@ def extract_price(item: dict[str, Any]) -> float:
     return 0
 
 
+PICKUP_KEYS = ("pickup_start", "pickup_start_human", "pickup_end", "pickup_end_human")
+
+
+def pickup_times(pickup_interval: dict[str, str]) -> dict[str, str]:
+    """Pickup start/end in the configured timezone, as ISO timestamps and humanized."""
+    tz, locale = settings.timezone, settings.locale
+    start, end = pickup_interval["start"], pickup_interval["end"]
+    return {
+        "pickup_start": local_isoformat(start, tz),
+        "pickup_start_human": humanizer.humanize(start, tz, locale),
+        "pickup_end": local_isoformat(end, tz),
+        "pickup_end_human": humanizer.humanize(end, tz, locale),
+    }
+
+
+def iter_favourite_pages(page_size: int | None = None) -> Iterator[list[Any]]:
+    """Yield the favourite stores page by page, until a short (or already seen) page ends the list."""
+    page_size = page_size or FAVOURITES_PAGE_SIZE
+    seen: set[Any] = set()
+    page = 1
+    while True:
+        shops = call_with_token_retry(tgtg_client.get_items, page_size=page_size, page=page)
+        page_ids = {shop["item"]["item_id"] for shop in shops}
+        if page_ids <= seen:  # an API ignoring the page parameter must not loop us forever
+            return
+        seen |= page_ids
+        yield shops
+        if len(shops) < page_size:
+            return
+        page += 1
+
+
 def publish_stores_data(shops: list[Any]) -> bool:
+    """Publish a complete list of stores and commit it as the current favourites."""
+    item_ids: list[Any] = []
+    if not publish_stores_page(shops, item_ids):
+        return False
+    commit_favourites(item_ids)
+    return True
+
+
+def drop_times_path() -> Path:
+    return Path(settings.get("data_dir")) / "drop_times.json"
+
+
+def save_drop_times() -> None:
+    keep = all_favourite_ids()
+    if not (settings.get("adaptive_polling") or {}).get("enabled") or keep is None:
+        return
+    try:
+        drop_times.save(drop_times_path(), keep=keep)
+    except OSError:
+        logger.exception("Error writing the drop times file")
+
+
+def open_history() -> None:
+    """Open the stock history in the data dir, if enabled; seeds the drop times when they are empty."""
+    global history
+    history_settings = settings.get("history") or {}
+    if not history_settings.get("enabled") or history is not None:
+        return
+    history = StockHistory(
+        Path(settings.get("data_dir")) / "history.sqlite3",
+        retention_days=float(history_settings.get("retention_days", 90)),
+        downsample_after_days=float(history_settings.get("downsample_after_days", 7)),
+        logger=logger,
+    )
+    if not drop_times:
+        tz = settings.get("timezone") or "local"
+        for item_id, drops in history.drops(since=time.time() - 28 * 24 * 3600).items():
+            for at in drops:
+                drop_times.record(item_id, arrow.get(at).to(tz).datetime)
+
+
+def record_stock(shop: dict[str, Any], item_id: str, stock: int, price: float) -> None:
+    """Feed a polled store to the drop times and the stock history."""
+    drop_times.observe(item_id, stock)
+    if history is not None:
+        interval = shop.get("pickup_interval") or {}
+        history.record(item_id, stock, price, interval.get("start"), interval.get("end"))
+
+
+def flush_history() -> None:
+    if history is None:
+        return
+    try:
+        logger.debug(f"Recorded {history.flush()} stock change(s)")
+    except sqlite3.Error:
+        logger.exception("Error writing the stock history")
+
+
+async def compact_history() -> None:
+    if history is not None:
+        await offload(history.compact)
+
+
+def local_now() -> datetime:
+    return arrow.now(settings.get("timezone") or "local").datetime
+
+
+def use_account(account: Account | None) -> None:
+    """Swap the session globals to ``account``'s; callers hold check_lock. No-op with a single account."""
+    global active_account
+    if account is None or account is active_account:
+        return
+    if active_account is not None:
+        active_account.state = {name: globals()[name] for name in ACCOUNT_GLOBALS}
+    globals().update(account.state)
+    active_account = account
+
+
+@contextlib.contextmanager
+def account_session(account: Account | None) -> Iterator[None]:
+    with check_lock:
+        use_account(account)
+        yield
+
+
+def setup_accounts() -> None:
+    global accounts
+    try:
+        accounts = parse_accounts(settings.tgtg.get("accounts"), default_language=settings.tgtg.language)
+    except ValueError:
+        exit_from_thread("Invalid tgtg.accounts setting", 1)
+    for account in accounts:
+        account.state = {
+            "tgtg_client": None,
+            "tokens": {},
+            "token_manager": TokenManager(refresh_margin=TOKEN_REFRESH_MARGIN),
+            "favourite_ids": [],
+            "last_successful_favourite_ids": None,
+            "first_run": True,
+            "authenticated": False,
+            "login_failures": 0,
+            "http_session": new_http_session(),
+        }
+    if accounts:
+        logger.info(f"Serving {len(accounts)} accounts: {', '.join(account.name for account in accounts)}")
+
+
+def sessions() -> list[Account | None]:
+    """The accounts to work for; ``[None]`` stands for the single account of ``tgtg.email``."""
+    return [*accounts] or [None]
+
+
+def account_dir() -> str:
+    """Where the active account's tokens.json and known_shops.json live."""
+    data_dir = str(settings.get("data_dir"))
+    return data_dir if active_account is None else f"{data_dir}/accounts/{active_account.name}"
+
+
+def account_suffix() -> str:
+    """Appended to the ids of the per-account sensors (orders, last updated) in multi-account mode."""
+    return "" if active_account is None else f"_{active_account.name}"
+
+
+def account_label() -> str:
+    return "" if active_account is None else f" ({active_account.name})"
+
+
+def account_values(name: str) -> list[Any]:
+    """The value of a session global for every account, the active one first."""
+    values = [globals()[name]]
+    values += [account.state[name] for account in accounts if account is not active_account]
+    return values
+
+
+def account_state(account: Account | None) -> dict[str, Any]:
+    """The session globals of ``account``, wherever they are at the moment; callers hold check_lock."""
+    return globals() if account is None or account is active_account else account.state
+
+
+def awaited(account: Account | None) -> bool:
+    """Whether the cleanups wait for the account's first successful poll.
+
+    Not after it failed to log in MAX_LOGIN_FAILURES times in a row (waiting for an email
+    confirmation, a wrong address): it would hold back the cleanups of every other account.
+    """
+    state = account_state(account)
+    if state["last_successful_favourite_ids"] is not None:
+        return False
+    return account is None or state["login_failures"] < MAX_LOGIN_FAILURES
+
+
+def all_favourite_ids() -> set[str] | None:
+    """The favourites of all accounts; ``None`` while an account is :func:`awaited`."""
+    if any(awaited(account) for account in sessions()):
+        return None
+    favourites: set[str] = set()
+    for snapshot in account_values("last_successful_favourite_ids"):
+        favourites |= snapshot or set()  # an account without favourites counts as polled, too
+    return favourites
+
+
+def warn_about_awaited_accounts() -> None:
+    names = [account.name for account in accounts if awaited(account)]
+    if names:
+        logger.warning(f"Stores are not removed until {', '.join(names)} had a successful poll")
+
+
+def commit_favourites(item_ids: list[Any]) -> None:
+    """Record the favourites of a fully successful run."""
     global favourite_ids, last_successful_favourite_ids
-    favourite_ids.clear()
+    favourite_ids = item_ids
+    # The full cleanup reconciles against this trusted snapshot.
+    last_successful_favourite_ids = {str(item_id) for item_id in item_ids}
+
 
+def publish_stores_page(shops: list[Any], item_ids: list[Any]) -> bool:
+    """Publish one page of stores, collecting their item ids into ``item_ids``.
+
+    A page only counts as published once all its messages were queued and, for topic classes
+    published with QoS 1/2, acknowledged by the broker within ``mqtt.delivery_timeout``.
+    """
+    page_results: list[Any] = []
+    prefixes = topics.prefixes
     for shop in shops:
         stock = shop["items_available"]
         item_id = shop["item"]["item_id"]
-        favourite_ids.append(item_id)
+        item_ids.append(item_id)
+        item_topics = topics.item(item_id)
 
         logger.debug(f"Pushing message for {shop['display_name']} // {item_id}")
 
         result_raw = None
-        if raw_enabled():
-            result_raw = mqtt_client.publish(f"{data_base()}/toogoodtogo_{item_id}/raw", json.dumps(shop), retain=True)
+        if prefixes.raw_enabled:
+            result_raw = publish_cached(item_topics.raw, dumps(shop), retain=True)
 
         # Autodiscover (only when Home Assistant discovery is enabled)
         result_ad = None
-        if homeassistant_enabled():
-            result_ad = mqtt_client.publish(
-                f"{discovery_prefix()}/sensor/toogoodtogo_bridge/{item_id}/config",
-                json.dumps({
-                    **entity_naming(f"sensor.toogoodtogo_{item_id}", shop["display_name"]),
-                    "icon": "mdi:food" if stock > 0 else "mdi:food-off",
-                    "state_topic": f"{data_base()}/toogoodtogo_{item_id}/state",
-                    "json_attributes_topic": f"{data_base()}/toogoodtogo_{item_id}/attr",
-                    "unit_of_measurement": "portions",
-                    "value_template": "{{ value_json.stock }}",
-                    "device": DEVICE_INFO,
-                    "unique_id": f"toogoodtogo_{item_id}",
-                }),
+        if prefixes.homeassistant_enabled:
+            result_ad = publish_config(
+                item_topics.config,
+                dumps_with(
+                    {
+                        **entity_naming(f"sensor.toogoodtogo_{item_id}", shop["display_name"]),
+                        "icon": "mdi:food" if stock > 0 else "mdi:food-off",
+                        "state_topic": item_topics.state,
+                        "json_attributes_topic": item_topics.attr,
+                        "unique_id": f"toogoodtogo_{item_id}",
+                    },
+                    STORE_CONFIG_FRAGMENT,
+                ),
             )
 
         result_state = publish_state(
-            f"{data_base()}/toogoodtogo_{item_id}/state",
-            json.dumps({"stock": stock}),
+            item_topics.state,
+            dumps({"stock": stock}),
         )
 
         price = extract_price(shop["item"])
+        record_stock(shop, str(item_id), stock, price)
 
-        pickup_start_date = None if not stock else arrow.get(shop["pickup_interval"]["start"]).to(tz=settings.timezone)
-        pickup_end_date = None if not stock else arrow.get(shop["pickup_interval"]["end"]).to(tz=settings.timezone)
-        pickup_start_str = "Unknown" if stock == 0 else pickup_start_date.to(tz=settings.timezone).isoformat()  # type: ignore[union-attr]
-        pickup_end_str = "Unknown" if stock == 0 else pickup_end_date.to(tz=settings.timezone).isoformat()  # type: ignore[union-attr]
-        pickup_start_human = (
-            "Unknown" if stock == 0 else pickup_start_date.humanize(only_distance=False, locale=settings.locale)  # type: ignore[union-attr]
-        )
-        pickup_end_human = (
-            "Unknown" if stock == 0 else pickup_end_date.humanize(only_distance=False, locale=settings.locale)  # type: ignore[union-attr]
-        )
+        pickup = pickup_times(shop["pickup_interval"]) if stock else dict.fromkeys(PICKUP_KEYS, "Unknown")
 
         # get company logo
         try:
@@ -286,15 +735,12 @@ def publish_stores_data(shops: list[Any]) -> bool:
                 picture = "https://toogoodtogo.com/images/logo/econ-textless.svg"
 
         result_attrs = publish_state(
-            f"{data_base()}/toogoodtogo_{item_id}/attr",
-            json.dumps({
+            item_topics.attr,
+            dumps({
                 "price": price,
                 "stock_available": True if stock > 0 else False,
                 "url": f"https://share.toogoodtogo.com/item/{item_id}",
-                "pickup_start": pickup_start_str,
-                "pickup_start_human": pickup_start_human,
-                "pickup_end": pickup_end_str,
-                "pickup_end_human": pickup_end_human,
+                **pickup,
                 "picture": picture,
             }),
         )
@@ -311,42 +757,51 @@ def publish_stores_data(shops: list[Any]) -> bool:
         if not all(result.rc == mqtt.MQTT_ERR_SUCCESS for result in results):
             logger.warning("Seems like some message was not transferred successfully.")
             return False
+        page_results.extend(results)
 
-    # Only now, after a fully successful run, record the trusted snapshot for the full cleanup.
-    last_successful_favourite_ids = {str(item_id) for item_id in favourite_ids}
+    if delivery.confirms_delivery and not delivery.wait_delivered(
+        page_results, float(settings.get("mqtt", {}).get("delivery_timeout", 10))
+    ):
+        logger.warning("Messages were queued, but the broker did not acknowledge all of them in time.")
+        return False
     return True
 
 
 def publish_orders_data(active_orders: dict) -> bool:
+    suffix = account_suffix()
     orders = active_orders.get("orders", [])
     has_orders = len(orders) > 0
 
-    result_ad = mqtt_client.publish(
-        f"{discovery_prefix()}/sensor/toogoodtogo_next_collection/config",
-        json.dumps({
-            **entity_naming("sensor.toogoodtogo_next_collection", "Next Collection"),
-            "icon": "mdi:calendar-clock" if has_orders else "mdi:calendar-remove",
-            "device_class": "timestamp",
-            "entity_category": "diagnostic",
-            "state_topic": f"{data_base()}/toogoodtogo_next_collection/state",
-            "json_attributes_topic": f"{data_base()}/toogoodtogo_next_collection/attr",
-            "device": DEVICE_INFO,
-            "unique_id": "toogoodtogo_next_collection",
-        }),
+    result_ad = publish_config(
+        f"{discovery_prefix()}/sensor/toogoodtogo_next_collection{suffix}/config",
+        dumps_with(
+            {
+                **entity_naming(f"sensor.toogoodtogo_next_collection{suffix}", f"Next Collection{account_label()}"),
+                "icon": "mdi:calendar-clock" if has_orders else "mdi:calendar-remove",
+                "device_class": "timestamp",
+                "entity_category": "diagnostic",
+                "state_topic": f"{data_base()}/toogoodtogo_next_collection{suffix}/state",
+                "json_attributes_topic": f"{data_base()}/toogoodtogo_next_collection{suffix}/attr",
+                "unique_id": f"toogoodtogo_next_collection{suffix}",
+            },
+            DEVICE_FRAGMENT,
+        ),
     )
 
-    result_ad_count = mqtt_client.publish(
-        f"{discovery_prefix()}/sensor/toogoodtogo_upcoming_orders/config",
-        json.dumps({
-            **entity_naming("sensor.toogoodtogo_upcoming_orders", "Upcoming Orders"),
-            "icon": "mdi:cart" if has_orders else "mdi:cart-off",
-            "entity_category": "diagnostic",
-            "state_topic": f"{data_base()}/toogoodtogo_upcoming_orders/state",
-            "json_attributes_topic": f"{data_base()}/toogoodtogo_upcoming_orders/attr",
-            "unit_of_measurement": "orders",
-            "device": DEVICE_INFO,
-            "unique_id": "toogoodtogo_upcoming_orders",
-        }),
+    result_ad_count = publish_config(
+        f"{discovery_prefix()}/sensor/toogoodtogo_upcoming_orders{suffix}/config",
+        dumps_with(
+            {
+                **entity_naming(f"sensor.toogoodtogo_upcoming_orders{suffix}", f"Upcoming Orders{account_label()}"),
+                "icon": "mdi:cart" if has_orders else "mdi:cart-off",
+                "entity_category": "diagnostic",
+                "state_topic": f"{data_base()}/toogoodtogo_upcoming_orders{suffix}/state",
+                "json_attributes_topic": f"{data_base()}/toogoodtogo_upcoming_orders{suffix}/attr",
+                "unit_of_measurement": "orders",
+                "unique_id": f"toogoodtogo_upcoming_orders{suffix}",
+            },
+            DEVICE_FRAGMENT,
+        ),
     )
 
     if orders:
@@ -354,23 +809,22 @@ def publish_orders_data(active_orders: dict) -> bool:
         next_order = orders[0]
 
         pickup_date = next_order["pickup_interval"]["start"]
-        pickup_date_arrow = arrow.get(pickup_date).to(tz=settings.timezone)
 
         result_state = publish_state(
-            f"{data_base()}/toogoodtogo_next_collection/state",
-            pickup_date_arrow.isoformat(),
+            f"{data_base()}/toogoodtogo_next_collection{suffix}/state",
+            local_isoformat(pickup_date, settings.timezone),
         )
 
         result_attrs = publish_state(
-            f"{data_base()}/toogoodtogo_next_collection/attr",
-            json.dumps({
+            f"{data_base()}/toogoodtogo_next_collection{suffix}/attr",
+            dumps({
                 "order_id": next_order["order_id"],
                 "store_name": next_order["store_name"],
                 "store_branch": next_order["store_branch"],
                 "address": next_order["pickup_location"]["address"]["address_line"],
-                "pickup_start": arrow.get(next_order["pickup_interval"]["start"]).to(tz=settings.timezone).isoformat(),
-                "pickup_end": arrow.get(next_order["pickup_interval"]["end"]).to(tz=settings.timezone).isoformat(),
-                "pickup_start_human": pickup_date_arrow.humanize(only_distance=False, locale=settings.locale),
+                "pickup_start": local_isoformat(pickup_date, settings.timezone),
+                "pickup_end": local_isoformat(next_order["pickup_interval"]["end"], settings.timezone),
+                "pickup_start_human": humanizer.humanize(pickup_date, settings.timezone, settings.locale),
                 "status": next_order["state"],
                 "quantity": next_order["quantity"],
                 "price": next_order["total_price"]["minor_units"] / pow(10, next_order["total_price"]["decimals"]),
@@ -381,7 +835,7 @@ def publish_orders_data(active_orders: dict) -> bool:
         )
 
         result_state_count = publish_state(
-            f"{data_base()}/toogoodtogo_upcoming_orders/state",
+            f"{data_base()}/toogoodtogo_upcoming_orders{suffix}/state",
             str(len(orders)),
         )
 
@@ -389,8 +843,8 @@ def publish_orders_data(active_orders: dict) -> bool:
             {
                 "store_name": order["store_name"],
                 "store_branch": order["store_branch"],
-                "pickup_start": arrow.get(order["pickup_interval"]["start"]).to(tz=settings.timezone).isoformat(),
-                "pickup_end": arrow.get(order["pickup_interval"]["end"]).to(tz=settings.timezone).isoformat(),
+                "pickup_start": local_isoformat(order["pickup_interval"]["start"], settings.timezone),
+                "pickup_end": local_isoformat(order["pickup_interval"]["end"], settings.timezone),
                 "quantity": order["quantity"],
                 "item_name": order["item_name"],
             }
@@ -398,8 +852,8 @@ def publish_orders_data(active_orders: dict) -> bool:
         ]
 
         result_attrs_count = publish_state(
-            f"{data_base()}/toogoodtogo_upcoming_orders/attr",
-            json.dumps({"orders": orders_summary}),
+            f"{data_base()}/toogoodtogo_upcoming_orders{suffix}/attr",
+            dumps({"orders": orders_summary}),
         )
 
         logger.debug(
@@ -427,20 +881,20 @@ def publish_orders_data(active_orders: dict) -> bool:
 
     else:
         result_state = publish_state(
-            f"{data_base()}/toogoodtogo_next_collection/state",
+            f"{data_base()}/toogoodtogo_next_collection{suffix}/state",
             "null",
         )
         result_attrs = publish_state(
-            f"{data_base()}/toogoodtogo_next_collection/attr",
-            json.dumps({}),
+            f"{data_base()}/toogoodtogo_next_collection{suffix}/attr",
+            dumps({}),
         )
         result_state_count = publish_state(
-            f"{data_base()}/toogoodtogo_upcoming_orders/state",
+            f"{data_base()}/toogoodtogo_upcoming_orders{suffix}/state",
             "0",
         )
         result_attrs_count = publish_state(
-            f"{data_base()}/toogoodtogo_upcoming_orders/attr",
-            json.dumps({"orders": []}),
+            f"{data_base()}/toogoodtogo_upcoming_orders{suffix}/attr",
+            dumps({"orders": []}),
         )
 
         logger.debug(
@@ -470,23 +924,26 @@ def publish_orders_data(active_orders: dict) -> bool:
 
 
 def publish_last_updated() -> bool:
+    suffix = account_suffix()
     current_time = arrow.now().to(tz=settings.timezone)
 
-    result_ad = mqtt_client.publish(
-        f"{discovery_prefix()}/sensor/toogoodtogo_last_updated/config",
-        json.dumps({
-            **entity_naming("sensor.toogoodtogo_last_updated", "Last Updated"),
-            "icon": "mdi:clock-outline",
-            "device_class": "timestamp",
-            "entity_category": "diagnostic",
-            "state_topic": f"{data_base()}/toogoodtogo_last_updated/state",
-            "device": DEVICE_INFO,
-            "unique_id": "toogoodtogo_last_updated",
-        }),
+    result_ad = publish_config(
+        f"{discovery_prefix()}/sensor/toogoodtogo_last_updated{suffix}/config",
+        dumps_with(
+            {
+                **entity_naming(f"sensor.toogoodtogo_last_updated{suffix}", f"Last Updated{account_label()}"),
+                "icon": "mdi:clock-outline",
+                "device_class": "timestamp",
+                "entity_category": "diagnostic",
+                "state_topic": f"{data_base()}/toogoodtogo_last_updated{suffix}/state",
+                "unique_id": f"toogoodtogo_last_updated{suffix}",
+            },
+            DEVICE_FRAGMENT,
+        ),
     )
 
     result_state = publish_state(
-        f"{data_base()}/toogoodtogo_last_updated/state",
+        f"{data_base()}/toogoodtogo_last_updated{suffix}/state",
         current_time.isoformat(),
     )
 
@@ -498,39 +955,42 @@ def publish_last_updated() -> bool:
 
 
 def build_ua() -> Any:
-    global tgtg_version
+    # only needed for a fresh login, so not imported at startup
+    from random_user_agent.params import SoftwareName
+    from random_user_agent.user_agent import UserAgent
+
     software_names = [SoftwareName.ANDROID.value]
     user_agent_rotator = UserAgent(software_names=software_names, limit=20)
     user_agent = user_agent_rotator.get_random_user_agent()
     user_agent = user_agent.split("(")[1].split(")")[0]
 
-    app_info = app("com.app.tgtg", lang="de", country="de")
-    tgtg_version = app_info["version"]
-    user_agent = "TGTG/" + app_info["version"] + " Dalvik/2.1.0 (" + user_agent + ")"
+    user_agent = "TGTG/" + app_versions.get() + " Dalvik/2.1.0 (" + user_agent + ")"
     return user_agent
 
 
+def user_agent_version(user_agent: str) -> str:
+    """The app version a user agent claims, e.g. ``24.11.0`` for ``TGTG/24.11.0 Dalvik/2.1.0 (...)``."""
+    return user_agent.split(" Dalvik/")[0].removeprefix("TGTG/")
+
+
 def is_latest_version() -> bool:
+    from packaging import version
+
     logger.info("Checking latest tgtg appstore version")
     try:
-        app_info = app("com.app.tgtg", lang="de", country="de")
-    except Exception:
+        latest_version = app_versions.get()  # answered from the cache, refreshed in the background
+    except AppVersionUnavailable:
         logger.exception("Error getting version ID from google playstore. Skipping version check this time.")
         return True
 
-    act_version = version.parse(app_info["version"])
+    act_version = version.parse(latest_version)
     token_version = version.parse(tokens["token_version"])
 
     # Fix for users having already a tokens.json contain 'Varies with device'
     # see https://github.com/MaxWinterstein/toogoodtogo-ha-mqtt-bridge/issues/87
     minor_diff = 999 if str(token_version) == "Varies with device" else act_version.minor - token_version.minor
 
-    if minor_diff > 2 or act_version.major > token_version.major:
-        global tgtg_version
-        tgtg_version = app_info["version"]
-        return False
-    else:
-        return True
+    return not (minor_diff > 2 or act_version.major > token_version.major)
 
 
 def is_latest_token_rev() -> Any:
@@ -546,19 +1006,22 @@ def write_token_file() -> None:
         "cookie": tgtg_client.cookie,
         "last_time_token_refreshed": str(tgtg_client.last_time_token_refreshed),
         "ua": tgtg_client.user_agent,
-        "token_version": tgtg_version,
+        "token_version": user_agent_version(tgtg_client.user_agent),
         "rev": tokens_rev,
     }
     tokens = tgtg_tokens
+    if not token_manager.is_changed(tgtg_tokens):
+        return
 
-    with open(settings.get("data_dir") + "/tokens.json", "w") as json_file:
+    with open(account_dir() + "/tokens.json", "w") as json_file:
         json.dump(tgtg_tokens, json_file, indent=4)
+    token_manager.mark_persisted(tgtg_tokens)
 
     logger.info("Written tokens.json file to filesystem")
 
 
 def check_existing_token_file() -> bool:
-    if os.path.isfile(settings.get("data_dir") + "/tokens.json"):
+    if os.path.isfile(account_dir() + "/tokens.json"):
         return read_token_file()
     else:
         logger.info("Logging in with credentials")
@@ -567,12 +1030,12 @@ def check_existing_token_file() -> bool:
 
 def nuke_token_file() -> None:
     logger.info("Old tokenfile found. Please login via email again.")
-    os.remove(settings.get("data_dir") + "/tokens.json")
+    os.remove(account_dir() + "/tokens.json")
 
 
 def read_token_file() -> bool:
     global tokens
-    with open(settings.get("data_dir") + "/tokens.json") as f:
+    with open(account_dir() + "/tokens.json") as f:
         tokens = json.load(f)
 
     if tokens:
@@ -596,32 +1059,60 @@ def read_token_file() -> bool:
 
 def update_ua() -> None:
     global tokens
+    latest_version = app_versions.get()
     ua = tokens["ua"]
     updated_ua = ua.split(" ")[1:]
-    updated_ua = "TGTG/" + tgtg_version + " " + " ".join(updated_ua)  # type: ignore[operator]
+    updated_ua = "TGTG/" + latest_version + " " + " ".join(updated_ua)
     tokens["ua"] = updated_ua
-    tokens["token_version"] = tgtg_version
+    tokens["token_version"] = latest_version
 
     rebuild_tgtg_client()
     write_token_file()
 
 
+def tgtg_base_url() -> str:
+    # Only meant for pointing the bridge at a local stand-in API, see benchmarks/load_test.py.
+    return str(settings.tgtg.get("base_url") or BASE_URL)
+
+
+def new_tgtg_client(**kwargs: Any) -> Any:
+    """A TGTG client for the active account, on the account's HTTP session."""
+    client = TgtgClient(url=tgtg_base_url(), language=account_language(), timeout=TGTG_TIMEOUT, **kwargs)
+    client.session = http_session  # its headers are sent with every request, the session's are left alone
+    return client
+
+
+def observe_http(endpoint: str, connect: float, headers: float, total: float) -> None:
+    reused = connect == 0
+    HTTP_CONNECTIONS.inc(endpoint=endpoint, connection="reused" if reused else "new")
+    if not reused:
+        HTTP_DURATION.observe(connect, endpoint=endpoint, phase="connect")
+    HTTP_DURATION.observe(headers, endpoint=endpoint, phase="headers")
+    HTTP_DURATION.observe(total, endpoint=endpoint, phase="total")
+    logger.debug(
+        f"{endpoint}: {'reused connection' if reused else f'connected in {connect * 1000:.0f} ms'}, "
+        f"headers after {headers * 1000:.0f} ms, {total * 1000:.0f} ms in total"
+    )
+
+
 def rebuild_tgtg_client() -> None:
     global tgtg_client
-    tgtg_client = TgtgClient(
+    tgtg_client = new_tgtg_client(
         cookie=tokens["cookie"],
         access_token=tokens["access_token"],
         refresh_token=tokens["refresh_token"],
         user_agent=tokens["ua"],
-        language=settings.tgtg.language,
-        timeout=30,
     )
 
 
-def check_for_removed_stores(shops: list[Any]) -> None:
-    path = settings.get("data_dir") + "/known_shops.json"
-
-    checked_items = [shop["item"]["item_id"] for shop in shops]
+def check_for_removed_stores(checked_items: list[Any]) -> None:
+    shared = all_favourite_ids()  # also the favourites of the other accounts
+    if shared is None:
+        # another account may still have the stores this one dropped; known_shops.json is left
+        # as it is, so they are looked at again once every account was polled
+        logger.debug("Not looking for removed stores before every account was polled")
+        return
+    path = account_dir() + "/known_shops.json"
 
     if os.path.isfile(path):
         logger.debug(f"known_shops.json exists at {path}")
@@ -632,19 +1123,16 @@ def check_for_removed_stores(shops: list[Any]) -> None:
             logger.exception("Error happened when reading known_shops file")
             return
 
-        deprecated_items = [x for x in known_items if x not in checked_items]
+        # still a favourite of this or another account; ids compared as str, like the full cleanup does
+        keep = shared | {str(item_id) for item_id in checked_items}
+        deprecated_items = [str(x) for x in known_items if str(x) not in keep]
         for deprecated_item in deprecated_items:
             logger.info(f"Shop {deprecated_item} was not checked, will send remove message")
-            # NB: the discovery config lives under the .../toogoodtogo_bridge/<id>/config topic
-            # (with the node id); publish an empty retained payload there to remove the entity.
-            result = mqtt_client.publish(
-                f"{discovery_prefix()}/sensor/toogoodtogo_bridge/{deprecated_item}/config", retain=True
-            )
-            # Clear the now-retained state/attribute topics too, so a removed store leaves no
-            # orphan retained message on the broker (an empty retained payload deletes it).
-            publish_state(f"{data_base()}/toogoodtogo_{deprecated_item}/state")
-            publish_state(f"{data_base()}/toogoodtogo_{deprecated_item}/attr")
-            logger.debug(f"Message published: Removal: {bool(result.rc == mqtt.MQTT_ERR_SUCCESS)}")
+        if deprecated_items or store_remover.pending:
+            # Clears the discovery config (removing the entity) and the retained state/attribute
+            # topics, so a removed store leaves no orphan retained message on the broker. Earlier
+            # failures still pending are dropped too if any account has the store again.
+            store_remover.remove(deprecated_items, keep=keep)
 
     with open(path, "w") as f:
         json.dump(checked_items, f)
@@ -652,114 +1140,273 @@ def check_for_removed_stores(shops: list[Any]) -> None:
     pass
 
 
-def fetch_loop(event: Any) -> None:
-    logger.info("Starting loop")
+async def offload(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking call on the bounded executor without blocking the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(func, *args, **kwargs))
 
-    create_data_dir()
-    token_exits = check_existing_token_file()
-    tgtg_client.login()
-    if not token_exits and tgtg_client.access_token:
-        write_token_file()
 
-    event.wait(calc_next_run())
-    while True:
-        logger.debug("Loop run started")
+def spawn(coro: Coroutine[Any, Any, None], name: str) -> asyncio.Task[None]:
+    """Start a background task on the event loop and keep a reference until it is done."""
+    task = asyncio.get_running_loop().create_task(coro, name=name)
+    background_tasks.add(task)
+    task.add_done_callback(on_task_done)
+    return task
+
+
+def on_task_done(task: asyncio.Task[None]) -> None:
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Task {task.get_name()} crashed", exc_info=task.exception())
+
 
-        if not intense_fetch_thread:
-            if not check():
-                logger.error("Loop was not successfully.")
+def prepare_session() -> None:
+    create_data_dir()
+    drop_times.load(drop_times_path())
+    open_history()
+    for account in sessions():
+        with account_session(account):
+            if account is None:
+                login()  # nothing to poll without it
             else:
-                logger.debug("Loop run finished")
+                try_login()  # the other accounts keep working
+
+
+def login() -> None:
+    """Log in, with the saved tokens if there are any; only a fresh login needs a user agent built."""
+    global tgtg_client, authenticated
+    Path(account_dir()).mkdir(parents=True, exist_ok=True)
+    if not check_existing_token_file():
+        tgtg_client = new_tgtg_client(
+            email=settings.tgtg.email if active_account is None else active_account.email,
+            user_agent=build_ua(),
+        )
+    refresh_tokens(force=True)
+    authenticated = True
+
+
+def try_login() -> bool:
+    """Log in one of several accounts; on failure it is retried with the account's next poll."""
+    global login_failures
+    try:
+        login()
+    except Exception:
+        login_failures += 1
+        logger.exception(f"Login{account_label()} failed, retrying with the next poll")
+        if login_failures == MAX_LOGIN_FAILURES:
+            logger.warning(f"Login{account_label()} failed {login_failures} times in a row, removing stores goes on")
+        return False
+    login_failures = 0
+    return True
+
+
+def lookup_session() -> tuple[Account | None, Any] | None:
+    """An account for item lookups outside of a poll, with its client; ``None`` if none is logged in.
+
+    Lookups don't depend on the account, so the first logged-in one is used.
+    """
+    with check_lock:
+        if not accounts:
+            return None, tgtg_client  # logged in before polling started
+        for account in accounts:
+            state = account_state(account)
+            if state["authenticated"]:
+                return account, state["tgtg_client"]
+    return None
+
+
+def account_language() -> str:
+    return str(settings.tgtg.language if active_account is None else active_account.language)
+
+
+async def logged_in() -> None:
+    """Wait for the login start() runs concurrently with connecting to the broker."""
+    if session_ready is not None:
+        await asyncio.wrap_future(session_ready)
+
+
+def after_successful_check() -> None:
+    """Bookkeeping on the event loop once a poll went through."""
+    # Start automatic intense fetch watchdog
+    if settings.get("enable_auto_intense_fetch") and "next_sales" not in scheduler:
+        scheduler.add_cron("next_sales", NEXT_SALES_SCHEDULE, next_sales_sweep, run_now=True)
+
+
+async def start_polling() -> None:
+    logger.info("Starting loop")
+    await logged_in()
+    for account in sessions():
+        name = "fetch" if account is None else f"fetch {account.name}"
+        scheduler.add(name, functools.partial(poll, account), functools.partial(calc_next_run, account))
+
+
+async def poll(account: Account | None = None) -> None:
+    logger.debug("Loop run started")
+
+    if intense_fetch_task is None or intense_fetch_targets:  # full polls go on during a targeted intense fetch
+        if not await offload(check, account):
+            logger.error("Loop was not successfully.")
         else:
-            logger.info("Skipping cron scheduled job, as intense fetch is running")
+            logger.debug("Loop run finished")
+            after_successful_check()
+    else:
+        logger.info("Skipping cron scheduled job, as intense fetch is running")
 
-        watchdog.timeout = calc_timeout()
-        watchdog.reset()
-        event.wait(calc_next_run())
+    watchdog.timeout = calc_timeout()
+    watchdog.reset()
+    WATCHDOG_RESETS.inc()
 
 
-def next_sales_loop() -> None:
-    while True:
-        if favourite_ids:
-            for fav_id in favourite_ids:
-                item = tgtg_client.get_item(item_id=fav_id)
-                if "next_sales_window_purchase_start" in item:
-                    next_sales_window = arrow.get(item["next_sales_window_purchase_start"]).to(tz=settings.timezone)
-                    if next_sales_window > arrow.now(tz=settings.timezone):
-                        schedule_time = next_sales_window.format("HH:mm")
-                        schedule_name = item["display_name"] + " " + schedule_time
-
-                        global scheduled_jobs
-                        if not any(d["name"] == schedule_name for d in scheduled_jobs):
-                            job = (
-                                schedule
-                                .every()
-                                .day.at(next_sales_window.shift(minutes=-1).format("HH:mm"))
-                                .do(trigger_intense_fetch)
-                            )
-                            scheduled_jobs.append({"name": schedule_name, "job": job})
-                            logger.info(
-                                "Added new automatic intense fetch run for "
-                                + item["display_name"]
-                                + " at "
-                                + schedule_time
-                                + " today"
-                            )
-
-        logger.debug("Scheduled automatic intense jobs: " + str(scheduled_jobs))
-
-        now = datetime.now()
-        cron = croniter("0 8,11,14,17,20 * * *", now)
-        next_run = cron.get_next(datetime)
-        sleep_seconds = (next_run - now).seconds
-        sleep(sleep_seconds)
-
-
-def trigger_intense_fetch() -> Any:
+async def fetch_item(
+    item_id: Any, slots: asyncio.Semaphore, session: tuple[Account | None, Any]
+) -> tuple[dict[str, Any] | None, float]:
+    """Look up one item with the client of ``session`` (from :func:`lookup_session`).
+
+    Goes through the shared rate limiter; returns the item (``None`` on error) and latency.
+    """
+    account, client = session
+    async with slots:
+        started = time.monotonic()
+        try:
+            item = await offload(call_with_token_retry, client.get_item, item_id=item_id, account=account)
+        except RateLimited as error:
+            logger.warning(f"Skipped looking up item {item_id}: {error}")
+            item = None
+        except Exception:
+            logger.exception(f"Error fetching item {item_id}")
+            item = None
+        latency = time.monotonic() - started
+        logger.debug(f"Fetched item {item_id} in {latency * 1000:.0f} ms")
+        return item, latency
+
+
+def publish_items(items: list[Any]) -> bool:
+    """Publish single looked-up stores, without touching the favourites list."""
+    with check_lock:
+        publish_cache.start_cycle()
+        humanizer.start_cycle()  # "in 15 minutes" relative to this cycle, not the last full poll
+        published = publish_stores_page(items, [])
+        flush_history()
+        return published
+
+
+async def check_targets() -> bool:
+    """One cycle of a targeted intense fetch: look up and publish only its stores."""
+    session = await offload(lookup_session)  # waits for a running poll to finish swapping sessions
+    if session is None:
+        logger.warning("Intense fetch skipped, no account is logged in")
+        return False
+    slots = asyncio.Semaphore(int((settings.get("tgtg") or {}).get("max_concurrent_requests", 4)))
+    results = await asyncio.gather(*(fetch_item(item_id, slots, session) for item_id in list(intense_fetch_targets)))
+    items = [item for item, _ in results if item is not None]
+    return await offload(publish_items, items) and len(items) == len(results)
+
+
+async def next_sales_sweep() -> None:
+    # Look up all favourites concurrently, bounded by max_concurrent_requests and the rate limiter.
+    # Cancelling the sweep (it is a scheduler job) cancels every pending lookup.
+    session = await offload(lookup_session)
+    if session is None:
+        logger.warning("Looking up the next sales windows skipped, no account is logged in")
+        return
+    slots = asyncio.Semaphore(int((settings.get("tgtg") or {}).get("max_concurrent_requests", 4)))
+    started = time.monotonic()
+    # snapshot the ids, a poll may rebuild the list meanwhile
+    item_ids = dict.fromkeys(item_id for ids in account_values("favourite_ids") for item_id in ids)
+    results = await asyncio.gather(*(fetch_item(fav_id, slots, session) for fav_id in item_ids))
+    if results:
+        latencies = [latency for _, latency in results]
+        logger.info(
+            f"Looked up {len(results)} item(s) in {time.monotonic() - started:.1f}s "
+            f"(avg {sum(latencies) / len(latencies) * 1000:.0f} ms, max {max(latencies) * 1000:.0f} ms per call)"
+        )
+
+    for item, _ in results:
+        if item is not None and "next_sales_window_purchase_start" in item:
+            next_sales_window = localize(item["next_sales_window_purchase_start"], settings.timezone)
+            if next_sales_window > arrow.now(tz=settings.timezone):
+                schedule_time = next_sales_window.format("HH:mm")
+                schedule_name = item["display_name"] + " " + schedule_time
+
+                if schedule_name not in scheduler:
+                    scheduler.call_at(
+                        schedule_name,
+                        next_sales_window.shift(minutes=-1).datetime,
+                        functools.partial(trigger_intense_fetch, str(item["item"]["item_id"])),
+                    )
+                    logger.info(
+                        "Added new automatic intense fetch run for " + item["display_name"] + " at " + schedule_time
+                    )
+
+    logger.debug("Scheduled jobs: " + str(scheduler.jobs()))
+
+
+async def trigger_intense_fetch(item_id: str) -> None:
+    if settings.tgtg.intense_fetch.get("targeted"):
+        logger.info(f"Running automatic intense fetch for item {item_id}!")
+        start_targeted_intense_fetch(item_id)
+        return
     logger.info("Running automatic intense fetch!")
     mqtt_client.publish(
         f"{discovery_prefix()}/switch/toogoodtogo_intense_fetch/set",
         "ON",
     )
-    return schedule.CancelJob
 
 
-def ua_check_loop() -> None:
-    while True:
-        now = datetime.now()
-        cron = croniter("0 0,12 * * *", now)
-        next_run = cron.get_next(datetime)
-        sleep_seconds = (next_run - now).seconds
-        sleep(sleep_seconds)
-        if tokens and not is_latest_version():
-            logger.info("Token for old TGTG version found, updating useragent.")
-            update_ua()
+def check_ua() -> None:
+    if tokens and not is_latest_version():
+        logger.info("Token for old TGTG version found, updating useragent.")
+        update_ua()
 
 
-def calc_next_run() -> Any:
-    cron_schedule = get_cron_schedule()
-    now = datetime.now()
+def on_app_version(latest_version: str) -> None:
+    """A background refresh found a new app version; called on the refresh thread."""
+    logger.info(f"TGTG app version {latest_version} is available")
+    for account in sessions():
+        with account_session(account):
+            check_ua()
 
-    if croniter.is_valid(cron_schedule):
-        cron = croniter(cron_schedule, now)
-        next_run = cron.get_next(datetime)
-        sleep_seconds = (next_run - now).seconds
-
-        if sleep_seconds >= 30:
-            if settings.get("randomize_calls"):
-                jitter = random.randint(1, 20)  # noqa: S311 # pseudo is fine here
-                sleep_seconds += jitter
-                next_run = next_run + timedelta(seconds=jitter)
-        elif sleep_seconds < 30:
-            # if sleep seconds < 30 skip next runtime
-            next_run = cron.get_next(datetime)
-            sleep_seconds = (next_run - now).seconds
-
-        logger.info("Next run at " + str(next_run))
-        return sleep_seconds + 1
-    else:
+
+async def ua_check() -> None:
+    # Never waits for the Play Store: a refresh runs in the background and calls
+    # on_app_version() once it finds a new version.
+    app_versions.refresh()
+
+
+def polling_cron() -> CronSchedule:
+    """The compiled polling schedule; exits if the configured cron expression is invalid."""
+    try:
+        return compile_cron(get_cron_schedule())
+    except ValueError:
         exit_from_thread("Invalid cron schedule", 1)
-        return  # might never be returned
+        raise  # never reached, exit_from_thread exits the process
+
+
+def adaptive_delay() -> float | None:
+    """Seconds until the next poll as predicted from the drop times, if adaptive polling is on."""
+    adaptive = settings.get("adaptive_polling") or {}
+    if not adaptive.get("enabled"):
+        return None
+    return drop_times.next_delay(
+        local_now(),
+        fast=max(30.0, float(adaptive.get("fast_interval", ADAPTIVE_FAST_INTERVAL))),
+        slow=float(adaptive.get("slow_interval", ADAPTIVE_SLOW_INTERVAL)),
+    )
+
+
+def calc_next_run(account: Account | None = None) -> float:
+    now = datetime.now()
+    # accounts poll one after the other, so they don't hit the API at the same time
+    stagger = 0.0 if account is None else account.index * float(settings.get("account_stagger", ACCOUNT_STAGGER))
+    delay = adaptive_delay()
+    if delay is not None:  # until drop windows could be learned, the polling schedule is used
+        logger.info(f"Next run at {now + timedelta(seconds=delay + stagger)} (adaptive polling)")
+        return delay + stagger
+    jitter = CALL_JITTER if settings.get("randomize_calls") else 0
+    # runs less than 30 seconds away are skipped in favour of the following one
+    sleep_seconds = cron_delay(polling_cron(), now, jitter=jitter, min_delay=30) + stagger
+
+    logger.info("Next run at " + str(now + timedelta(seconds=sleep_seconds)))
+    return sleep_seconds + 1
 
 
 def get_fallback_cron(tgtg: Any) -> str:
@@ -803,6 +1450,18 @@ def watchdog_handler() -> None:
 
 def on_connect(client, userdata, flags, reason_code, properties) -> None:  # type: ignore[no-untyped-def]
     logger.debug(f"MQTT seems connected. (reason_code: {reason_code})")
+    # A (re)connect may have landed on a fresh broker, so publish everything again next cycle.
+    publish_cache.clear()
+
+    # Subscribe here rather than once in start(), so subscriptions survive a reconnect.
+    client.subscribe(store_index.subscription(data_base()))  # retained messages are replayed on subscribe
+    if "intense_fetch" in settings.tgtg:
+        # The /set topic is the command channel for both the HA switch and auto intense-fetch,
+        # so subscribe regardless of HA; only the discovery switch entity itself is HA-gated.
+        client.subscribe(f"{discovery_prefix()}/switch/toogoodtogo_intense_fetch/set")
+    if homeassistant_enabled():
+        client.subscribe(f"{discovery_prefix()}/status")  # HA's birth/last-will message
+        discovery.republish()
 
 
 def on_disconnect(client, userdata, flags, reason_code, properties) -> None:  # type: ignore[no-untyped-def]
@@ -811,106 +1470,163 @@ def on_disconnect(client, userdata, flags, reason_code, properties) -> None:  #
         logger.debug(f"reason_code: {reason_code}")
         sleep(30)
         logger.debug("Trying to reconnect")
+        MQTT_RECONNECTS.inc()
         client.reconnect()
 
 
-def calc_timeout() -> Any:
+def calc_timeout() -> float:
     global watchdog_timeout
     now = datetime.now()
-    cron_schedule = get_cron_schedule()
-
-    if croniter.is_valid(cron_schedule):
-        # Get next run as base
-        base = croniter(cron_schedule, now).get_next(datetime)
-        # Get next two runs and calculate watchdog timeout
-        itr = croniter(cron_schedule, base)
-        for _ in range(2):
-            next_run = itr.get_next(datetime)
-        watchdog_timeout = (next_run - now).seconds + tgtg_client.timeout
-        return watchdog_timeout
-    else:
-        exit_from_thread("Invalid cron schedule", 1)
-        return  # might never be returned
+    cron = polling_cron()
+
+    # Get next run as base, then allow for the two runs after it
+    next_run = cron.next_after(now)
+    for _ in range(2):
+        next_run = cron.next_after(next_run)
+    watchdog_timeout = (next_run - now).total_seconds() + float(TGTG_TIMEOUT)
+    adaptive = settings.get("adaptive_polling") or {}
+    if adaptive.get("enabled"):  # polls may be further apart than the polling schedule's
+        slow = float(adaptive.get("slow_interval", ADAPTIVE_SLOW_INTERVAL))
+        watchdog_timeout = max(watchdog_timeout, 3 * slow + float(TGTG_TIMEOUT))
+    return watchdog_timeout
 
 
-def intense_fetch() -> None:
+def intense_fetch_settings_valid() -> bool:
     if (
         "intense_fetch" not in settings.tgtg
         or "period_of_time" not in settings.tgtg.intense_fetch
         or "interval" not in settings.tgtg.intense_fetch
     ):
         logger.error("Incomplete settings file. Please check the sample!")
-        return
+        return False
 
     if settings.tgtg.intense_fetch.period_of_time > 60:
         logger.warning("Stopped intense fetch. Maximal intense fetch period time are 60 minutes. Reduce your setting!")
-        return
+        return False
 
     if settings.tgtg.intense_fetch.interval < 10:
         logger.warning("Stopped intense fetch. Minimal intense fetch interval are 10 seconds. Increase your setting!")
-        return
+        return False
+
+    return True
 
+
+async def intense_fetch() -> None:
+    global intense_fetch_task, intense_fetch_end
+
+    await logged_in()
+    INTENSE_FETCH_RUNS.inc()
     mqtt_client.publish(
         f"{discovery_prefix()}/switch/toogoodtogo_intense_fetch/state",
         "ON",
     )
 
-    t = threading.current_thread()
-    t_end = time.time() + 60 * settings.tgtg.intense_fetch.period_of_time
+    intense_fetch_end = time.monotonic() + 60 * settings.tgtg.intense_fetch.period_of_time
+    try:
+        while intense_fetch_due():
+            if intense_fetch_targets:
+                logger.info(f"Intense fetch started for {len(intense_fetch_targets)} store(s)")
+                successful = await check_targets()
+            else:
+                logger.info("Intense fetch started")
+                successful = await offload(check_all)
+            if not successful:
+                logger.error("Intense fetch was not successfully")
+            else:
+                logger.info("Intense fetch finished")
+                after_successful_check()
+            await asyncio.sleep(settings.tgtg.intense_fetch.interval)
+    finally:
+        # also reached when the switch is turned off, which cancels this task
+        intense_fetch_task = None
+        intense_fetch_targets.clear()
+
+        mqtt_client.publish(
+            f"{discovery_prefix()}/switch/toogoodtogo_intense_fetch/state",
+            "OFF",
+        )
 
-    while time.time() < t_end and getattr(t, "do_run", True):
-        logger.info("Intense fetch started")
-        if not check():
-            logger.error("Intense fetch was not successfully")
-        else:
-            logger.info("Intense fetch finished")
-            sleep(settings.tgtg.intense_fetch.interval)
+        logger.info("Intense fetch stopped")
 
-    global intense_fetch_thread
-    intense_fetch_thread = None
 
-    mqtt_client.publish(
-        f"{discovery_prefix()}/switch/toogoodtogo_intense_fetch/state",
-        "OFF",
-    )
+def intense_fetch_due() -> bool:
+    """Whether to run another intense fetch cycle; a targeted one runs until all its stores' periods are over."""
+    now = time.monotonic()
+    if not intense_fetch_targets:
+        return now < intense_fetch_end
+    for item_id, end in list(intense_fetch_targets.items()):
+        if end <= now:
+            del intense_fetch_targets[item_id]
+    return bool(intense_fetch_targets)
+
+
+def start_targeted_intense_fetch(item_id: str) -> None:
+    """Poll just this store closely, joining a running targeted intense fetch if there is one."""
+    global intense_fetch_task
+    if intense_fetch_task is not None and not intense_fetch_targets:
+        logger.info("Full intense fetch already running. Doing nothing.")
+        return
+    if not intense_fetch_settings_valid():
+        return
+    intense_fetch_targets[item_id] = time.monotonic() + 60 * settings.tgtg.intense_fetch.period_of_time
+    if intense_fetch_task is None:
+        intense_fetch_task = spawn(intense_fetch(), "intense_fetch")
+
+
+def start_intense_fetch() -> None:
+    global intense_fetch_task, intense_fetch_end
+    if intense_fetch_task is not None and intense_fetch_targets:
+        # the switch shows ON during a targeted intense fetch too; turning it on makes it a full one
+        logger.info("Switching the running targeted intense fetch to a full one.")
+        intense_fetch_targets.clear()
+        intense_fetch_end = time.monotonic() + 60 * settings.tgtg.intense_fetch.period_of_time
+        return
+    if intense_fetch_task is not None:
+        logger.error("Intense fetch already running. Doing nothing.")
+        return
+    if intense_fetch_settings_valid():
+        intense_fetch_task = spawn(intense_fetch(), "intense_fetch")
+
 
-    logger.info("Intense fetch stopped")
+def stop_intense_fetch() -> None:
+    if intense_fetch_task is not None:
+        intense_fetch_task.cancel()
+        logger.info("Intense fetch is being stopped.")
+    else:
+        logger.info("No running intense fetch found. Doing nothing.")
 
 
 def on_message(client: Any, userdata: Any, message: Any) -> None:
-    global intense_fetch_thread
-    if message.topic.endswith("toogoodtogo_intense_fetch/set"):
-        if message.payload.decode("utf-8") == "ON":
-            if intense_fetch_thread:
-                logger.error("Intense fetch thread already running. Doing nothing.")
-                return
-
-            thread = threading.Thread(target=intense_fetch)
-            intense_fetch_thread = thread
-            thread.start()
-        elif message.payload.decode("utf-8") == "OFF":
-            if intense_fetch_thread:
-                intense_fetch_thread.do_run = False  # type: ignore[attr-defined]
-                logger.info("Intense fetch is stopped in the next cycle.")
-                mqtt_client.publish(
-                    f"{discovery_prefix()}/switch/toogoodtogo_intense_fetch/state",
-                    "OFF",
-                )
-            else:
-                logger.info("No running thread found. Doing nothing.")
+    if store_index.feed(message.topic, message.payload):
+        return
+    if message.topic == f"{discovery_prefix()}/status":
+        # Home Assistant restarted and forgot every (non-retained) discovery config.
+        if message.payload.decode("utf-8") == "online":
+            logger.info(f"Home Assistant is online, republished {discovery.republish()} discovery config(s)")
+    elif message.topic.endswith("toogoodtogo_intense_fetch/set"):
+        command = message.payload.decode("utf-8")
+        if event_loop is None:
+            logger.warning(f"Event loop not running yet, ignoring intense fetch command {command}")
+        elif command == "ON":
+            # paho calls this from its network thread; intense fetch state lives on the event loop
+            event_loop.call_soon_threadsafe(start_intense_fetch)
+        elif command == "OFF":
+            event_loop.call_soon_threadsafe(stop_intense_fetch)
 
 
 def register_fetch_sensor() -> None:
-    mqtt_client.publish(
+    publish_config(
         f"{discovery_prefix()}/switch/toogoodtogo_bridge/intense_fetch/config",
-        json.dumps({
-            **entity_naming("switch.toogoodtogo_intense_fetch_switch", "Intense fetch"),
-            "icon": "mdi:fast-forward",
-            "state_topic": f"{discovery_prefix()}/switch/toogoodtogo_intense_fetch/state",
-            "command_topic": f"{discovery_prefix()}/switch/toogoodtogo_intense_fetch/set",
-            "device": DEVICE_INFO,
-            "unique_id": "toogoodtogo_intense_fetch_switch",
-        }),
+        dumps_with(
+            {
+                **entity_naming("switch.toogoodtogo_intense_fetch_switch", "Intense fetch"),
+                "icon": "mdi:fast-forward",
+                "state_topic": f"{discovery_prefix()}/switch/toogoodtogo_intense_fetch/state",
+                "command_topic": f"{discovery_prefix()}/switch/toogoodtogo_intense_fetch/set",
+                "unique_id": "toogoodtogo_intense_fetch_switch",
+            },
+            DEVICE_FRAGMENT,
+        ),
     )
 
     mqtt_client.publish(
@@ -919,55 +1635,118 @@ def register_fetch_sensor() -> None:
     )
 
 
-def run_pending_schedules() -> None:
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
+async def run() -> None:
+    """Run all loops as tasks on one event loop until SIGINT/SIGTERM, then shut down cleanly."""
+    global event_loop
+    event_loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        event_loop.add_signal_handler(signum, stop.set)
+
+    spawn(scheduler.run(), "scheduler")
+    spawn(start_polling(), "start_polling")
+    scheduler.add_cron("ua_check", UA_CHECK_SCHEDULE, ua_check)
+    scheduler.add_cron("history_compact", HISTORY_COMPACT_SCHEDULE, compact_history)
+
+    await stop.wait()
+    logger.info("Shutting down")
+    await shutdown()
+
+
+async def shutdown() -> None:
+    tasks = list(background_tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    watchdog.stop()
+    mqtt_client.disconnect()
+    mqtt_client.loop_stop()
+    executor.shutdown(wait=False, cancel_futures=True)
+    http_pool.close()  # the sessions only hold cookies besides it
+    if history is not None:
+        history.close()
+
+
+def start_metrics_server() -> None:
+    host = str(settings.metrics.get("host", "0.0.0.0"))  # noqa: S104 # reachable from outside the container
+    port = int(settings.metrics.port)
+    metrics.serve(host, port)
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+
+
+def setup_profiler(every: int | None, slower_than: float | None, memory: bool | None) -> None:
+    """Profile poll cycles as configured in ``profiling``; the command line options take precedence."""
+    global profiler
+    config = settings.get("profiling") or {}
+    every = int(every if every is not None else config.get("every", 0))
+    threshold = slower_than if slower_than is not None else config.get("slower_than")
+    if not every and threshold is None:
+        return
+    from toogoodtogo_ha_mqtt_bridge.profiling import CycleProfiler  # cProfile & co. only when profiling
+
+    candidate = CycleProfiler(
+        Path(settings.get("data_dir")) / "profiles",
+        every=every,
+        slower_than=None if threshold is None else float(threshold),
+        cpu=bool(config.get("cpu", True)),
+        memory=bool(memory if memory is not None else config.get("memory", False)),
+        keep=int(config.get("keep", 10)),
+        logger=logger,
+    )
+    if candidate.enabled:
+        profiler = candidate
+        logger.info(f"Profiling poll cycles into {candidate.directory}")
 
 
 @click.command()
 @click.version_option(package_name="toogoodtogo_ha_mqtt_bridge")
-def start() -> None:
-    global tgtg_client, watchdog, mqtt_client
-    tgtg_client = TgtgClient(
-        email=settings.tgtg.email, language=settings.tgtg.language, timeout=30, user_agent=build_ua()
-    )
+@click.option("--profile-every", type=click.IntRange(min=1), help="Profile every Nth poll cycle.")
+@click.option(
+    "--profile-slower-than",
+    type=click.FloatRange(min=0),
+    metavar="SECONDS",
+    help="Keep profiles of cycles taking at least SECONDS.",
+)
+@click.option("--profile-memory/--no-profile-memory", default=None, help="Also trace allocations with tracemalloc.")
+def start(profile_every: int | None, profile_slower_than: float | None, profile_memory: bool | None) -> None:
+    global session_ready, watchdog
+    polling_cron()  # compile (and validate) the polling schedule once at config load
+    setup_accounts()
+    if (settings.get("metrics") or {}).get("port"):
+        start_metrics_server()
+    setup_profiler(profile_every, profile_slower_than, profile_memory)
+
+    # Logging in (maybe with a slow Play Store lookup first) and connecting to the broker don't
+    # depend on each other, so the login runs on the executor meanwhile; polling waits for it.
+    session_ready = executor.submit(prepare_session)
 
     watchdog = Watchdog(
         timeout=calc_timeout(),
         user_handler=watchdog_handler,
     )
 
+    connect_mqtt()
+    if "intense_fetch" in settings.tgtg and homeassistant_enabled():
+        register_fetch_sensor()
+
+    mqtt_client.loop_start()
+    asyncio.run(run())
+
+
+def connect_mqtt() -> None:
+    global mqtt_client
     logger.info("Connecting mqtt")
     mqtt_client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id="toogoodtogo-ha-mqtt-bridge")
     if settings.mqtt.username:
         mqtt_client.username_pw_set(username=settings.mqtt.username, password=settings.mqtt.password)
+    # paho defaults: 20 unacknowledged QoS 1/2 messages in flight, an unbounded outgoing queue
+    mqtt_client.max_inflight_messages_set(int(settings.mqtt.get("max_inflight_messages", 20)))
+    mqtt_client.max_queued_messages_set(int(settings.mqtt.get("max_queued_messages", 0)))
+    mqtt_client.on_publish = delivery.on_publish
     mqtt_client.connect(host=settings.mqtt.host, port=int(settings.mqtt.port))
     mqtt_client.on_disconnect = on_disconnect
     mqtt_client.on_connect = on_connect
-
-    if "intense_fetch" in settings.tgtg:
-        # The /set topic is the command channel for both the HA switch and auto intense-fetch,
-        # so subscribe regardless of HA; only the discovery switch entity itself is HA-gated.
-        mqtt_client.subscribe(f"{discovery_prefix()}/switch/toogoodtogo_intense_fetch/set")
-        mqtt_client.on_message = on_message
-        if homeassistant_enabled():
-            register_fetch_sensor()
-
-    mqtt_client.loop_start()
-    event = threading.Event()
-    thread = threading.Thread(target=fetch_loop, args=(event,))
-    thread.start()
-
-    thread = threading.Thread(target=run_pending_schedules)
-    thread.start()
-
-    thread = threading.Thread(target=ua_check_loop)
-    thread.start()
-
-    if settings.get("full_cleanup", True):  # on by default; set full_cleanup: false to disable
-        thread = threading.Thread(target=cleanup_loop)
-        thread.start()
+    mqtt_client.on_message = on_message
 
 
 if __name__ == "__main__":
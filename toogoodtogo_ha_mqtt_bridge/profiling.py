@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import contextlib
+import cProfile
+import io
+import logging
+import pstats
+import time
+import tracemalloc
+from collections.abc import Iterator
+from datetime import datetime
+from pathlib import Path
+
+TRACEMALLOC_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+)
+
+
+class CycleProfiler:
+    """Profiles selected poll cycles with cProfile and/or tracemalloc and writes the results to ``directory``.
+
+    Every ``every``-th cycle is profiled; with ``slower_than`` set every cycle is profiled, but only
+    kept if it took at least that many seconds (so expect the profiler's overhead on all cycles).
+    Per profiled cycle ``cycle-<time>-<n>.prof`` (for ``pstats``/snakeviz) and ``.txt`` (top
+    functions by cumulative time) are written, with ``memory`` also ``.alloc.txt`` (peak and the
+    allocations still alive at the end of the cycle, by line). Only the newest ``keep`` are kept.
+    """
+
+    def __init__(
+        self,
+        directory: Path | str,
+        every: int = 0,
+        slower_than: float | None = None,
+        cpu: bool = True,
+        memory: bool = False,
+        keep: int = 10,
+        top: int = 30,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        self.directory = Path(directory)
+        self.every = every
+        self.slower_than = slower_than
+        self.cpu = cpu
+        self.memory = memory
+        self.keep = keep
+        self.top = top
+        self.logger = logger or logging.getLogger(__name__)
+        self.cycles = 0
+
+    @property
+    def enabled(self) -> bool:
+        return (self.cpu or self.memory) and (self.every > 0 or self.slower_than is not None)
+
+    @contextlib.contextmanager
+    def cycle(self) -> Iterator[None]:
+        """Profile the ``with`` block if this cycle is selected."""
+        self.cycles += 1
+        due = self.every > 0 and self.cycles % self.every == 0
+        if not self.enabled or not (due or self.slower_than is not None):
+            yield
+            return
+
+        profile = cProfile.Profile() if self.cpu else None
+        trace_memory = self.memory and not tracemalloc.is_tracing()  # don't stop a PYTHONTRACEMALLOC session
+        if trace_memory:
+            tracemalloc.start()
+        elif self.memory:
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            elapsed = time.perf_counter() - started
+            snapshot, peak = None, 0
+            if self.memory:
+                snapshot, (_, peak) = tracemalloc.take_snapshot(), tracemalloc.get_traced_memory()
+            if trace_memory:
+                tracemalloc.stop()
+            if due or elapsed >= (self.slower_than or 0.0):
+                self._write(elapsed, profile, snapshot, peak)
+
+    def _write(
+        self, elapsed: float, profile: cProfile.Profile | None, snapshot: tracemalloc.Snapshot | None, peak: int
+    ) -> None:
+        stem = f"cycle-{datetime.now():%Y%m%d-%H%M%S}-{self.cycles}"
+        header = f"Cycle {self.cycles} took {elapsed:.3f}s\n\n"
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if profile is not None:
+                profile.dump_stats(self.directory / f"{stem}.prof")
+                summary = io.StringIO()
+                pstats.Stats(profile, stream=summary).sort_stats("cumulative").print_stats(self.top)
+                (self.directory / f"{stem}.txt").write_text(header + summary.getvalue())
+            if snapshot is not None:
+                statistics = snapshot.filter_traces(TRACEMALLOC_FILTERS).statistics("lineno")
+                lines = [f"peak {peak / 1024:.1f} KiB, still allocated at the end of the cycle:", *map(str, statistics)]
+                (self.directory / f"{stem}.alloc.txt").write_text(header + "\n".join(lines[: self.top + 1]) + "\n")
+            self._rotate()
+        except OSError:
+            self.logger.exception(f"Could not write the profile of cycle {self.cycles}")
+            return
+        self.logger.info(f"Profiled cycle {self.cycles} ({elapsed:.2f}s): {self.directory / stem}.*")
+
+    def _rotate(self) -> None:
+        stems = sorted({path.name.split(".")[0] for path in self.directory.glob("cycle-*")})
+        for stem in stems[: max(0, len(stems) - self.keep)]:
+            for path in self.directory.glob(f"{stem}.*"):
+                path.unlink(missing_ok=True)
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import hashlib
+
+import paho.mqtt.client as mqtt
+
+
+class Unchanged:
+    """Result stand-in for a publish skipped by :class:`PublishCache`.
+
+    Quacks like the ``MQTTMessageInfo`` returned by ``mqtt.Client.publish`` so callers can keep
+    checking ``result.rc`` without caring whether the message actually went out.
+    """
+
+    rc = mqtt.MQTT_ERR_SUCCESS
+
+    def wait_for_publish(self, timeout: float | None = None) -> None:
+        pass
+
+    def is_published(self) -> bool:
+        return True
+
+
+UNCHANGED = Unchanged()
+
+
+class PublishCache:
+    """Remembers a digest of the last successfully published payload per topic.
+
+    Retained messages only need to be sent again when their payload changes, so unchanged
+    state/attr/config messages can be skipped. ``refresh_every`` is a safety valve: every N
+    cycles the cache is dropped and everything is published again, in case the broker or Home
+    Assistant lost something behind our back. ``0`` disables the valve.
+    """
+
+    def __init__(self, refresh_every: int = 0) -> None:
+        self.refresh_every = refresh_every
+        self.cycle = 0
+        self.skipped = 0
+        self._digests: dict[str, bytes] = {}
+
+    @staticmethod
+    def _digest(payload: str | bytes) -> bytes:
+        data = payload.encode() if isinstance(payload, str) else payload
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def start_cycle(self) -> None:
+        """Count a poll cycle and force a full republish every ``refresh_every`` cycles."""
+        self.cycle += 1
+        self.skipped = 0
+        if self.refresh_every and self.cycle % self.refresh_every == 0:
+            self.clear()
+
+    def is_unchanged(self, topic: str, payload: str | bytes | None) -> bool:
+        if payload is None:
+            return False
+        unchanged = self._digests.get(topic) == self._digest(payload)
+        if unchanged:
+            self.skipped += 1
+        return unchanged
+
+    def record(self, topic: str, payload: str | bytes | None) -> None:
+        if payload is None:
+            # an empty payload clears the retained message, so the next real one must go out
+            self._digests.pop(topic, None)
+        else:
+            self._digests[topic] = self._digest(payload)
+
+    def forget(self, topic: str) -> None:
+        self._digests.pop(topic, None)
+
+    def clear(self) -> None:
+        self._digests.clear()
+
+    def __len__(self) -> int:
+        return len(self._digests)
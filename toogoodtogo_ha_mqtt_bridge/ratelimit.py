@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from typing import Any, Callable
+
+
+class RateLimited(Exception):
+    """The limiter holds calls back longer than the caller is willing to wait."""
+
+    def __init__(self, wait: float) -> None:
+        super().__init__(f"TGTG API calls are paused for another {wait:.0f}s")
+        self.wait = wait
+
+
+class RateLimiter:
+    """Token bucket shared by concurrent TGTG API calls.
+
+    Up to ``burst`` calls go through at once, after that calls are spaced to ``rate`` per second.
+    :meth:`reserve` hands out a slot without blocking and returns how long the caller has to wait
+    for it, so asyncio code can ``await asyncio.sleep()`` instead of tying up an executor thread;
+    :meth:`acquire` is the blocking variant for code already running on a worker thread.
+
+    When the API pushes back (429 or a captcha), :meth:`penalize` pauses all calls, for as long
+    as its ``Retry-After`` asks or with jittered exponential backoff from ``min_backoff`` up to
+    ``max_backoff`` seconds, and halves the rate. :meth:`succeeded` resets the backoff and lets
+    the rate grow back towards the configured one by a twentieth of it per call, so throughput
+    settles just below the point where the API starts refusing.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+        min_backoff: float = 5,
+        max_backoff: float = 900,
+    ) -> None:
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")  # noqa: TRY003
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.strikes = 0  # consecutive pushbacks
+        self._tokens = float(burst)
+        self._updated = clock()  # in the future while paused: no tokens are added before then
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a slot and return the seconds to wait before using it."""
+        with self._lock:
+            now = self.clock()
+            if now > self._updated:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+            self._tokens -= 1  # may go negative: later callers queue up behind earlier ones
+            return max(0.0, self._updated - now) + max(0.0, -self._tokens / self.rate)
+
+    def acquire(self, max_wait: float | None = None) -> float:
+        """Block until a slot is available; returns the seconds waited.
+
+        Raises :class:`RateLimited` instead of waiting longer than ``max_wait`` seconds.
+        """
+        wait = self.reserve()
+        if max_wait is not None and wait > max_wait:
+            with self._lock:
+                self._tokens += 1  # hand the slot back
+            raise RateLimited(wait)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def penalize(self, retry_after: float | None = None) -> float:
+        """Pause all calls after the API refused one; returns the pause in seconds."""
+        with self._lock:
+            self.strikes += 1
+            if retry_after is None:
+                ceiling = min(self.max_backoff, self.min_backoff * 2 ** (self.strikes - 1))
+                pause = random.uniform(ceiling / 2, ceiling)  # noqa: S311 # jitter, so callers don't retry in step
+            else:
+                pause = min(self.max_backoff, max(0.0, retry_after))
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+            resume = self.clock() + pause
+            if resume > self._updated:
+                self._updated = resume
+                self._tokens = min(self._tokens, 1.0)  # one call when the pause ends, no burst
+            return pause
+
+    def succeeded(self) -> None:
+        """An API call went through."""
+        with self._lock:
+            self.strikes = 0
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+    def state(self) -> dict[str, Any]:
+        with self._lock:
+            now = self.clock()
+            return {
+                "rate": self.rate,
+                "tokens": self._tokens,
+                "paused_for": max(0.0, self._updated - now),
+                "strikes": self.strikes,
+            }
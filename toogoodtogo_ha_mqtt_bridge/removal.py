@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import logging
+import time
+from collections import deque
+from collections.abc import Collection, Iterable
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+
+@dataclass
+class RemovalReport:
+    removed: list[str] = field(default_factory=list)
+    failed: list[str] = field(default_factory=list)
+
+
+class BulkRemover:
+    """Deletes the retained topics of many stores with QoS 1 and waits for the broker's PUBACKs.
+
+    ``publish`` sends an empty retained QoS 1 message to a topic and returns paho's
+    ``MQTTMessageInfo``; ``topics`` lists the topics that make up one store entity. At most
+    ``window`` deletions are unacknowledged at a time, so a purge of hundreds of stores streams
+    through the client instead of piling up in its outgoing queue. A store only counts as removed
+    once every one of its topics was acknowledged; otherwise it is kept and retried on the next
+    :meth:`remove`, so no entity is left half-deleted. Once the broker stalls for ``timeout``
+    seconds, the remaining stores of the batch fail fast and wait for the next cycle.
+    """
+
+    def __init__(
+        self,
+        publish: Callable[[str], Any],
+        topics: Callable[[str], list[str]],
+        window: int = 20,
+        timeout: float = 10.0,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        if window < 1:
+            raise ValueError("window must be at least 1")  # noqa: TRY003
+        self.publish = publish
+        self.topics = topics
+        self.window = window
+        self.timeout = timeout
+        self.logger = logger or logging.getLogger(__name__)
+        self.pending: set[str] = set()  # failed in an earlier cycle, retried with the next batch
+
+    def remove(self, item_ids: Iterable[str], keep: Collection[str] = ()) -> RemovalReport:
+        """Remove ``item_ids`` plus earlier failures, except stores in ``keep`` (favourites again)."""
+        batch = sorted((self.pending | set(item_ids)) - set(keep))
+        report = RemovalReport()
+        if not batch:
+            self.pending = set()
+            return report
+
+        started = time.monotonic()
+        failed: set[str] = set()
+        inflight: deque[tuple[str, Any]] = deque()
+        for item_id in batch:
+            for topic in self.topics(item_id):
+                if len(inflight) >= self.window:
+                    self._settle(inflight.popleft(), failed)
+                inflight.append((item_id, self.publish(topic)))
+        while inflight:
+            self._settle(inflight.popleft(), failed)
+
+        for item_id in batch:
+            if item_id in failed:
+                report.failed.append(item_id)
+                self.logger.warning(f"Removal of store {item_id} was not acknowledged, retrying next cycle")
+            else:
+                report.removed.append(item_id)
+                self.logger.debug(f"Removal of store {item_id} acknowledged")
+        self.pending = set(report.failed)
+        self.logger.info(
+            f"Removed {len(report.removed)} store(s), {len(report.failed)} failed in {time.monotonic() - started:.2f}s"
+        )
+        return report
+
+    def _settle(self, entry: tuple[str, Any], failed: set[str]) -> None:
+        """Wait for the oldest deletion's PUBACK; once the broker stalled, don't wait any longer."""
+        item_id, info = entry
+        try:
+            info.wait_for_publish(0 if failed else self.timeout)
+            acked = info.is_published()
+        except (ValueError, RuntimeError):  # not queued / connection lost
+            acked = False
+        if not acked:
+            failed.add(item_id)
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import functools
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from collections.abc import Awaitable
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+from croniter import croniter
+
+
+class CronSchedule:
+    """A cron expression parsed once and reused for every next-run computation."""
+
+    def __init__(self, expression: str) -> None:
+        if not croniter.is_valid(expression):
+            raise ValueError(f"Invalid cron schedule: {expression!r}")  # noqa: TRY003
+        self.expression = expression
+        self._cron = croniter(expression)
+        self._lock = threading.Lock()  # the croniter instance is stateful
+
+    def next_after(self, moment: datetime) -> datetime:
+        with self._lock:
+            self._cron.set_current(moment)
+            next_run: datetime = self._cron.get_next(datetime)
+            return next_run
+
+    def __repr__(self) -> str:
+        return f"CronSchedule({self.expression!r})"
+
+
+@functools.lru_cache(maxsize=32)
+def compile_cron(expression: str) -> CronSchedule:
+    """Compile a cron expression; every distinct expression is only parsed once."""
+    return CronSchedule(expression)
+
+
+def cron_delay(schedule: CronSchedule, now: datetime, jitter: int = 0, min_delay: float = 0) -> float:
+    """Exact seconds from ``now`` until the next run of ``schedule``.
+
+    Runs closer than ``min_delay`` are skipped in favour of the one after. Otherwise up to
+    ``jitter`` seconds are added, so not every bridge hits the API in the very same second.
+    """
+    next_run = schedule.next_after(now)
+    delay = (next_run - now).total_seconds()
+    if delay < min_delay:
+        delay = (schedule.next_after(next_run) - now).total_seconds()
+    elif jitter:
+        delay += random.randint(1, jitter)  # noqa: S311 # pseudo is fine here
+    return delay
+
+
+@dataclass(eq=False)
+class Job:
+    name: str
+    callback: Callable[[], Awaitable[None]]
+    next_delay: Callable[[], float] | None  # None for one-shot jobs
+    due: float = 0.0  # on the scheduler's monotonic clock
+    due_at: datetime = field(default_factory=datetime.now)  # wall clock, for display only
+    cancelled: bool = False
+    task: asyncio.Task[None] | None = field(default=None, repr=False)  # set while running
+
+
+class Scheduler:
+    """All timed work of the bridge, backed by one min-heap of due times.
+
+    A single task sleeps until the earliest job is due (or until a job is added), so idle time
+    costs no wakeups. Due times use the monotonic clock and exact durations; recurring jobs are
+    rescheduled via their ``next_delay`` only after their callback finished, so a job never
+    overlaps itself; cancelling a job also cancels its running callback. :meth:`jobs` exposes
+    the upcoming job table.
+    """
+
+    def __init__(self, logger: logging.Logger | None = None, clock: Callable[[], float] = time.monotonic) -> None:
+        self.logger = logger or logging.getLogger(__name__)
+        self.clock = clock
+        self._heap: list[tuple[float, int, Job]] = []
+        self._jobs: dict[str, Job] = {}
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._running: set[asyncio.Task[None]] = set()
+
+    def add(
+        self,
+        name: str,
+        callback: Callable[[], Awaitable[None]],
+        next_delay: Callable[[], float] | None,
+        first_delay: float | None = None,
+    ) -> Job:
+        """Schedule ``callback``; the first run is after ``first_delay`` or ``next_delay()``."""
+        self.cancel(name)
+        job = Job(name=name, callback=callback, next_delay=next_delay)
+        self._jobs[name] = job
+        delay = first_delay if first_delay is not None else next_delay() if next_delay else 0.0
+        self._push(job, delay)
+        return job
+
+    def add_cron(
+        self,
+        name: str,
+        schedule: CronSchedule,
+        callback: Callable[[], Awaitable[None]],
+        jitter: int = 0,
+        run_now: bool = False,
+    ) -> Job:
+        next_delay = lambda: cron_delay(schedule, datetime.now(), jitter=jitter)
+        return self.add(name, callback, next_delay, first_delay=0.0 if run_now else None)
+
+    def call_at(self, name: str, when: datetime, callback: Callable[[], Awaitable[None]]) -> Job:
+        """Run ``callback`` once at the (possibly timezone-aware) wall clock time ``when``."""
+        delay = (when - datetime.now(tz=when.tzinfo)).total_seconds()
+        return self.add(name, callback, None, first_delay=max(delay, 0.0))
+
+    def cancel(self, name: str) -> bool:
+        job = self._jobs.pop(name, None)
+        if job is None:
+            return False
+        job.cancelled = True  # its heap entry is dropped lazily
+        if job.task is not None:
+            job.task.cancel()
+        return True
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._jobs
+
+    def jobs(self) -> list[dict[str, Any]]:
+        """The upcoming job table, soonest first."""
+        now = self.clock()
+        return [
+            {"name": job.name, "due_at": job.due_at.isoformat(timespec="seconds"), "in_seconds": round(job.due - now)}
+            for job in sorted(self._jobs.values(), key=lambda job: job.due)
+        ]
+
+    def _push(self, job: Job, delay: float) -> None:
+        job.due = self.clock() + delay
+        job.due_at = datetime.now() + timedelta(seconds=delay)
+        heapq.heappush(self._heap, (job.due, next(self._sequence), job))
+        self._wakeup.set()
+
+    def _is_current(self, due: float, job: Job) -> bool:
+        return not job.cancelled and job.due == due and self._jobs.get(job.name) is job
+
+    async def run(self) -> None:
+        try:
+            while True:
+                self._wakeup.clear()
+                while self._heap and not self._is_current(self._heap[0][0], self._heap[0][2]):
+                    heapq.heappop(self._heap)  # stale entry of a cancelled or rescheduled job
+                timeout = None
+                if self._heap:
+                    due, _, job = self._heap[0]
+                    timeout = due - self.clock()
+                    if timeout <= 0:
+                        heapq.heappop(self._heap)
+                        self._start(job)
+                        continue
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+        finally:
+            running = list(self._running)
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+
+    def _start(self, job: Job) -> None:
+        task = asyncio.get_running_loop().create_task(self._run_job(job), name=job.name)
+        job.task = task
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run_job(self, job: Job) -> None:
+        try:
+            await job.callback()
+        except Exception:
+            self.logger.exception(f"Scheduled job {job.name} failed")
+        finally:
+            job.task = None
+            if not job.cancelled and self._jobs.get(job.name) is job:
+                if job.next_delay is None:
+                    del self._jobs[job.name]  # one-shot job is done
+                else:
+                    self._push(job, job.next_delay())
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import re
+import threading
+
+
+class StoreIndex:
+    """Item ids of the store entities the broker currently holds a retained state for.
+
+    Fed by the bridge's own wildcard subscription to ``<base>/+/state``: retained messages are
+    replayed on subscribe and every later publish (including our own) is echoed back, so the
+    index stays current without a second connection or a fixed scan window. A numeric id means a
+    store sensor; this structurally excludes the fixed diagnostic sensors (next_collection /
+    upcoming_orders / last_updated) and the switch.
+    """
+
+    def __init__(self) -> None:
+        self._ids: set[str] = set()
+        self._lock = threading.Lock()  # fed from the MQTT network thread
+        self._pattern: re.Pattern[str] | None = None
+
+    def subscription(self, base: str) -> str:
+        """Start (or restart, after a reconnect) indexing ``base``; returns the topic to subscribe to."""
+        with self._lock:
+            self._pattern = re.compile(rf"^{re.escape(base)}/toogoodtogo_(\d+)/state$")
+            self._ids.clear()  # the broker replays everything it still holds
+        return f"{base}/+/state"
+
+    def feed(self, topic: str, payload: bytes) -> bool:
+        """Account for a received message; returns whether it was a store state topic."""
+        match = self._pattern.match(topic) if self._pattern else None
+        if match is None:
+            return False
+        with self._lock:
+            if payload:  # retained and non-empty => a live store entity
+                self._ids.add(match.group(1))
+            else:  # an empty retained payload deleted it
+                self._ids.discard(match.group(1))
+        return True
+
+    def ids(self) -> set[str]:
+        with self._lock:
+            return set(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
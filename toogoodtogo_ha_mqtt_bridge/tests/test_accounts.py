@@ -0,0 +1,190 @@
+from pathlib import Path
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+from freezegun import freeze_time
+from tgtg.exceptions import TgtgAPIError
+
+from toogoodtogo_ha_mqtt_bridge import main
+from toogoodtogo_ha_mqtt_bridge.accounts import Account, parse_accounts
+from toogoodtogo_ha_mqtt_bridge.config import settings
+
+
+def test_accounts_are_validated() -> None:
+    accounts = parse_accounts(
+        [{"name": "alice", "email": "a@example.com"}, {"name": "bob", "email": "b@example.com"}], "en-US"
+    )
+    assert [(account.name, account.language, account.index) for account in accounts] == [
+        ("alice", "en-US", 0),
+        ("bob", "en-US", 1),
+    ]
+    assert parse_accounts(None, "en-US") == []
+    for broken in ([{"name": "Alice Smith", "email": "a@example.com"}], [{"name": "alice"}]):
+        with pytest.raises(ValueError, match=r"alice|Alice"):
+            parse_accounts(broken, "en-US")
+    with pytest.raises(ValueError, match="twice"):
+        parse_accounts([{"name": "alice", "email": "a@example.com"}] * 2, "en-US")
+
+
+@pytest.fixture
+def _two_accounts(monkeypatch: pytest.MonkeyPatch) -> list[Account]:
+    for name in main.ACCOUNT_GLOBALS:
+        monkeypatch.setattr(main, name, getattr(main, name))  # restored after the swaps of a test
+    monkeypatch.setattr(main, "active_account", None)
+    monkeypatch.setattr(
+        main, "accounts", parse_accounts([{"name": "alice", "email": "a"}, {"name": "bob", "email": "b"}], "en")
+    )
+    for account in main.accounts:
+        account.state = dict.fromkeys(main.ACCOUNT_GLOBALS)
+        account.state.update(tgtg_client=f"client of {account.name}", authenticated=True, login_failures=0)
+    return main.accounts
+
+
+def test_each_account_polls_with_its_own_session(_two_accounts: list[Account], monkeypatch: pytest.MonkeyPatch) -> None:
+    favourites = {"alice": ["1", "2"], "bob": ["2", "3"]}
+    seen: list[tuple[Any, str, str]] = []
+
+    def run_check() -> bool:
+        assert main.active_account is not None
+        seen.append((main.tgtg_client, main.account_dir(), main.account_suffix()))
+        main.commit_favourites(favourites[main.active_account.name])
+        return True
+
+    monkeypatch.setattr(main, "run_check", run_check)
+    alice = _two_accounts[0]
+
+    assert main.check(alice)
+    assert main.all_favourite_ids() is None  # bob was never polled, so nothing is safe to clean up
+    assert main.check_all()
+    data_dir = settings.get("data_dir")
+    assert seen == [
+        ("client of alice", f"{data_dir}/accounts/alice", "_alice"),
+        ("client of alice", f"{data_dir}/accounts/alice", "_alice"),
+        ("client of bob", f"{data_dir}/accounts/bob", "_bob"),
+    ]
+    assert main.favourite_ids == ["2", "3"]
+    assert alice.state["favourite_ids"] == ["1", "2"]
+    assert main.all_favourite_ids() == {"1", "2", "3"}
+
+    favourites["bob"] = []
+    assert main.check(_two_accounts[1])
+    assert main.all_favourite_ids() == {"1", "2"}  # an account without favourites still counts
+
+
+def test_an_account_failing_to_log_in_does_not_stop_the_others(
+    _two_accounts: list[Account], tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    bob = _two_accounts[1]
+    for account in _two_accounts:
+        account.state["authenticated"] = False
+    failing = {"alice"}
+    logins: list[str] = []
+    polled: list[str] = []
+
+    def login() -> None:
+        assert main.active_account is not None
+        logins.append(main.active_account.name)
+        if main.active_account.name in failing:
+            raise RuntimeError("needs a new login by email")  # noqa: TRY003
+        main.authenticated = True
+
+    def run_check() -> bool:
+        assert main.active_account is not None
+        polled.append(main.active_account.name)
+        return True
+
+    monkeypatch.setattr(main, "login", login)
+    monkeypatch.setattr(main, "run_check", run_check)
+    original = settings.get("data_dir")
+    settings["data_dir"] = str(tmp_path)
+    try:
+        main.prepare_session()
+    finally:
+        settings["data_dir"] = original
+
+    assert logins == ["alice", "bob"]
+    assert main.lookup_session() == (bob, "client of bob")
+    assert not main.check_all()
+    assert polled == ["bob"]
+    failing.clear()
+    assert main.check_all()  # retried with alice's next poll
+    assert logins == ["alice", "bob", "alice", "alice"]
+    assert polled == ["bob", "alice", "bob"]
+
+
+def test_an_account_that_never_logs_in_holds_removals_back_only_for_a_while(
+    _two_accounts: list[Account], tmp_path: Path, monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+    alice, bob = _two_accounts
+    bob.state["authenticated"] = False
+
+    def login() -> None:
+        raise RuntimeError("waiting for the email confirmation")  # noqa: TRY003
+
+    def run_check() -> bool:
+        main.commit_favourites(["1"])
+        main.warn_about_awaited_accounts()  # in the cleanup stage of a poll
+        return True
+
+    monkeypatch.setattr(main, "login", login)
+    monkeypatch.setattr(main, "run_check", run_check)
+    for _ in range(main.MAX_LOGIN_FAILURES - 1):
+        main.check_all()
+    assert main.all_favourite_ids() is None
+    assert "Stores are not removed until bob had a successful poll" in caplog.text
+
+    main.check_all()  # bob's last chance
+    assert "Login (bob) failed 3 times in a row" in caplog.text
+    assert main.all_favourite_ids() == {"1"}
+    caplog.clear()
+    main.check(alice)
+    assert "Stores are not removed" not in caplog.text
+
+    (tmp_path / "accounts" / "alice").mkdir(parents=True)
+    (tmp_path / "accounts" / "alice" / "known_shops.json").write_text('["1", "2"]')
+    monkeypatch.setattr(main.store_remover, "pending", set())
+    main.mqtt_client = MagicMock()
+    original = settings.get("data_dir")
+    settings["data_dir"] = str(tmp_path)
+    try:
+        main.check_for_removed_stores(["1"])
+    finally:
+        settings["data_dir"] = original
+    removed = {call.args[0] for call in main.mqtt_client.publish.call_args_list}
+    assert "homeassistant/sensor/toogoodtogo_2/state" in removed
+    assert not any("toogoodtogo_1/" in topic for topic in removed)
+
+
+def test_a_lookup_refreshes_the_token_of_its_own_account(
+    _two_accounts: list[Account], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    alice, bob = _two_accounts
+    alice.state["tgtg_client"] = MagicMock(get_item=MagicMock(side_effect=[TgtgAPIError(401, b"expired"), {"ok": 1}]))
+    refreshed: list[tuple[str, Any]] = []
+
+    def refresh_tokens(force: bool = False) -> None:
+        assert main.active_account is not None
+        refreshed.append((main.active_account.name, main.tgtg_client))
+
+    monkeypatch.setattr(main, "refresh_tokens", refresh_tokens)
+    main.use_account(bob)  # a poll of bob is swapping the session meanwhile
+    session = main.lookup_session()
+    assert session is not None
+    account, client = session
+    assert account is alice
+
+    assert main.call_with_token_retry(client.get_item, item_id="1", account=account) == {"ok": 1}
+    assert refreshed == [("alice", client)]  # the client that got rejected, not bob's
+    assert client.get_item.call_count == 2
+
+
+def test_account_polls_are_staggered() -> None:
+    original = settings.get("tgtg")
+    settings["tgtg"] = {"polling_schedule": "*/10 * * * *"}
+    try:
+        first, second = Account("alice", "a", "en", 0), Account("bob", "b", "en", 1)
+        with freeze_time("2022-01-01 17:00:00"):
+            assert main.calc_next_run(second) - main.calc_next_run(first) == 30
+    finally:
+        settings["tgtg"] = original
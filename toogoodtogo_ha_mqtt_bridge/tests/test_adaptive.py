@@ -0,0 +1,73 @@
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from toogoodtogo_ha_mqtt_bridge import main
+from toogoodtogo_ha_mqtt_bridge.adaptive import DropTimes
+from toogoodtogo_ha_mqtt_bridge.config import settings
+
+MONDAY = datetime(2024, 1, 1)
+
+
+def _drop_times(*drops: tuple[str, int, str]) -> DropTimes:
+    drop_times = DropTimes(clock=lambda: MONDAY, margin=10, min_samples=2)
+    for item_id, day, time in drops:
+        hour, minute = time.split(":")
+        drop_times.record(item_id, MONDAY.replace(day=MONDAY.day + day, hour=int(hour), minute=int(minute)))
+    return drop_times
+
+
+def test_windows_are_learned_per_store_and_weekday() -> None:
+    drop_times = _drop_times(
+        ("bakery", 0, "17:00"),
+        ("bakery", 7, "17:20"),
+        ("bakery", 1, "09:00"),  # only once on tuesdays
+        ("deli", 0, "17:25"),
+        ("deli", 7, "17:35"),
+        ("erratic", 0, "08:00"),
+        ("erratic", 7, "20:00"),
+    )
+    assert drop_times.windows(0) == [(16 * 60 + 50, 17 * 60 + 45)]  # bakery and deli merged
+    # too few tuesday drops: all of a store's drops count, the bakery spreads too wide then
+    assert drop_times.windows(1) == [(17 * 60 + 15, 17 * 60 + 45)]
+
+    delay = drop_times.next_delay(MONDAY.replace(hour=12), fast=60, slow=1800)
+    assert delay == 1800
+    assert drop_times.next_delay(MONDAY.replace(hour=16, minute=40), fast=60, slow=1800) == 600
+    assert drop_times.next_delay(MONDAY.replace(hour=17, minute=30), fast=60, slow=1800) == 60
+    assert _drop_times(("bakery", 0, "17:00")).next_delay(MONDAY, fast=60, slow=1800) is None
+
+
+def test_drops_are_observed_and_saved_for_favourites_only(tmp_path: Path) -> None:
+    drop_times = _drop_times(("gone", 0, "12:00"))
+    drop_times.observe("bakery", 0)
+    drop_times.observe("bakery", 3)  # restocked at the clock's time
+    drop_times.observe("bakery", 2)
+    drop_times.save(tmp_path / "drop_times.json", keep={"bakery"})
+
+    restored = DropTimes(clock=lambda: MONDAY, min_samples=1)
+    restored.load(tmp_path / "drop_times.json")
+    assert restored.windows(0) == [(0, 10)]
+
+
+def test_next_run_follows_the_drop_windows_when_enabled(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(main, "drop_times", DropTimes(clock=main.local_now))
+    original = {key: settings.get(key) for key in ("adaptive_polling", "data_dir", "tgtg")}
+    settings["tgtg"] = {"polling_schedule": "*/10 * * * *"}
+    settings["data_dir"] = str(tmp_path)
+    now = datetime.now().replace(second=0, microsecond=0)
+    main.drop_times.record("bakery", now)
+    main.drop_times.record("bakery", now)
+    monkeypatch.setattr(main, "last_successful_favourite_ids", {"bakery"})
+    try:
+        settings["adaptive_polling"] = {"enabled": False}
+        assert main.calc_next_run() <= 600 + 30 + 1  # a slot less than 30s away is skipped
+        settings["adaptive_polling"] = {"enabled": True, "fast_interval": 45}
+        assert main.calc_next_run() == 45
+        assert main.calc_timeout() >= 3 * 1800
+        main.save_drop_times()
+        assert "bakery" in (tmp_path / "drop_times.json").read_text()
+    finally:
+        for key, value in original.items():
+            settings[key] = value
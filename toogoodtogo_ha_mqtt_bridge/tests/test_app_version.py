@@ -0,0 +1,81 @@
+import threading
+from pathlib import Path
+
+import pytest
+
+from toogoodtogo_ha_mqtt_bridge import main
+from toogoodtogo_ha_mqtt_bridge.app_version import AppVersionService, AppVersionUnavailable
+
+
+class _PlayStore:
+    def __init__(self, *versions: str) -> None:
+        self.versions = list(versions)
+        self.lookups = 0
+
+    def __call__(self) -> str:
+        self.lookups += 1
+        version = self.versions.pop(0)
+        if version == "error":
+            raise ConnectionError  # the Play Store is unreachable
+        return version
+
+
+def _service(path: Path, play_store: _PlayStore, now: list[float]) -> AppVersionService:
+    return AppVersionService(
+        lambda: path, max_age=3600, min_backoff=60, max_backoff=100, fetch=play_store, clock=lambda: now[0]
+    )
+
+
+def _join(refresh: threading.Thread | None) -> None:
+    assert refresh is not None
+    refresh.join(timeout=5)
+
+
+def test_stale_version_is_served_while_refreshing_in_the_background(tmp_path: Path) -> None:
+    now = [1000.0]
+    play_store = _PlayStore("24.11.0", "24.12.0")
+    path = tmp_path / "app_version.json"
+    assert _service(path, play_store, now).get() == "24.11.0"  # the only blocking lookup
+
+    restarted = _service(path, play_store, now)  # reads the cache file
+    updates: list[str] = []
+    restarted.listeners.append(updates.append)
+    now[0] += 3599
+    assert restarted.get() == "24.11.0"
+    assert play_store.lookups == 1
+
+    now[0] += 1
+    assert restarted.get() == "24.11.0"  # expired: still answered at once, refreshed meanwhile
+    _join(restarted._refreshing)
+    assert restarted.get() == "24.12.0"
+    assert updates == ["24.12.0"]
+    assert play_store.lookups == 2
+
+
+def test_failed_lookups_back_off(tmp_path: Path) -> None:
+    now = [1000.0]
+    play_store = _PlayStore("error", "24.11.0", "error", "error")
+    service = _service(tmp_path / "app_version.json", play_store, now)
+
+    with pytest.raises(AppVersionUnavailable):
+        service.get()
+    with pytest.raises(AppVersionUnavailable):  # backing off, no second lookup yet
+        service.get()
+    assert play_store.lookups == 1
+
+    now[0] += 60
+    assert service.get() == "24.11.0"
+
+    _join(service.refresh())  # fails, the known version stays
+    assert service.refresh() is None  # backing off for 60s
+    now[0] += 60
+    _join(service.refresh())  # fails again, now backing off for 100s (capped)
+    now[0] += 99
+    assert service.refresh() is None
+    assert service.get() == "24.11.0"
+    assert play_store.lookups == 4
+
+
+def test_token_file_records_the_version_of_the_user_agent() -> None:
+    assert main.user_agent_version("TGTG/24.11.0 Dalvik/2.1.0 (Linux; U; Android 14)") == "24.11.0"
+    assert main.user_agent_version("TGTG/Varies with device Dalvik/2.1.0 (Linux)") == "Varies with device"
@@ -0,0 +1,56 @@
+from unittest.mock import MagicMock
+
+import paho.mqtt.client as mqtt
+import pytest
+
+from toogoodtogo_ha_mqtt_bridge import main
+from toogoodtogo_ha_mqtt_bridge.delivery import DeliveryTracker, topic_class
+
+
+def test_delivery_tracker_qos_per_class_and_latency() -> None:
+    now = [0.0]
+    tracker = DeliveryTracker(qos={"state": 1}, clock=lambda: now[0])
+    assert [topic_class(topic) for topic in ("a/1/config", "a/1/state", "a/1/attr", "a/1/raw")] == [
+        "discovery",
+        "state",
+        "attr",
+        "raw",
+    ]
+    assert tracker.confirms_delivery
+    client = MagicMock()
+    client.publish.side_effect = [MagicMock(rc=mqtt.MQTT_ERR_SUCCESS, mid=mid) for mid in (1, 2)]
+
+    tracker.publish(client, "a/1/state", "3", retain=True)
+    client.publish.assert_called_with("a/1/state", "3", retain=True, qos=1)
+    now[0] = 0.25
+    tracker.on_publish(client, None, 1)
+    tracker.on_publish(client, None, 2)  # the PUBACK can beat publish() returning its mid
+    tracker.publish(client, "a/1/attr", "{}")
+    client.publish.assert_called_with("a/1/attr", "{}", retain=False, qos=0)
+
+    assert (tracker.queued, tracker.delivered) == (2, 2)
+    assert tracker.latency() == {"count": 2, "avg": 0.125, "p95": 0.25, "max": 0.25}
+    with pytest.raises(ValueError, match="QoS"):
+        DeliveryTracker(qos=3)
+
+
+def test_unacknowledged_page_is_not_successful(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Queued is not delivered: with QoS 1 a page only succeeds once the broker acknowledged it.
+    monkeypatch.setattr(main, "delivery", DeliveryTracker(qos=1))
+    unacked = MagicMock(rc=mqtt.MQTT_ERR_SUCCESS)
+    unacked.is_published.return_value = False
+    main.mqtt_client = MagicMock()
+    main.mqtt_client.publish.return_value = unacked
+    main.publish_cache.clear()
+    main.discovery.clear()
+    shop = {
+        "display_name": "Test Store",
+        "items_available": 0,
+        "item": {"item_id": "123", "price": {"minor_units": 499, "decimals": 2}},
+        "store": {},
+    }
+
+    assert main.publish_stores_page([shop], []) is False
+    unacked.is_published.return_value = True
+    main.publish_cache.clear()
+    assert main.publish_stores_page([shop], []) is True
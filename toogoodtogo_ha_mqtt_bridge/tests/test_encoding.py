@@ -0,0 +1,26 @@
+import json
+
+import pytest
+
+from toogoodtogo_ha_mqtt_bridge import encoding
+
+
+@pytest.mark.parametrize("has_orjson", [True, False])
+def test_dumps_with_splices_pre_serialized_fragment(has_orjson: bool, monkeypatch: pytest.MonkeyPatch) -> None:
+    if has_orjson and not encoding.HAS_ORJSON:
+        pytest.skip("orjson not installed")
+    monkeypatch.setattr(encoding, "HAS_ORJSON", has_orjson)
+    device = {"identifiers": ["toogoodtogo_bridge"], "name": "Too Good To Go Café"}
+    static = encoding.fragment(unit_of_measurement="portions", device=device)
+
+    payload = encoding.dumps_with({"name": "Bäckerei", "unique_id": "toogoodtogo_1"}, static)
+
+    assert json.loads(payload) == {
+        "name": "Bäckerei",
+        "unique_id": "toogoodtogo_1",
+        "unit_of_measurement": "portions",
+        "device": device,
+    }
+    assert payload.startswith('{"name":"Bäckerei",')  # compact UTF-8, whichever backend
+    assert json.loads(encoding.dumps_with({}, static)) == {"unit_of_measurement": "portions", "device": device}
+    assert encoding.dumps_with({"a": 1}, "") == '{"a":1}'
@@ -132,7 +132,6 @@ def broker(tmp_path: Path) -> Iterator[int]:
 
 
 def test_full_cleanup_removes_orphans_against_real_broker(broker: int, monkeypatch: pytest.MonkeyPatch) -> None:
-    monkeypatch.setattr(main, "CLEANUP_SCAN_SECONDS", 1)
     original_mqtt = settings.get("mqtt")
     original_client = main.mqtt_client
     settings["mqtt"] = {"host": "127.0.0.1", "port": broker, "username": "", "password": ""}
@@ -142,6 +141,7 @@ def test_full_cleanup_removes_orphans_against_real_broker(broker: int, monkeypat
     try:
         seeder = _connected_client(broker, "seeder")
         bridge = _connected_client(broker, "bridge")
+        bridge.on_message = main.on_message
         main.mqtt_client = bridge
 
         # retained state for an active favourite, two orphans, and two non-store diagnostic sensors
@@ -154,6 +154,9 @@ def test_full_cleanup_removes_orphans_against_real_broker(broker: int, monkeypat
         seeder.publish("homeassistant/sensor/toogoodtogo_bridge/222/config", '{"name": "o222"}', retain=True)
         seeder.publish("homeassistant/sensor/toogoodtogo_bridge/333/config", '{"name": "o333"}', retain=True)
         time.sleep(0.5)
+        bridge.subscribe(main.store_index.subscription(main.data_base()))
+        time.sleep(0.5)
+        assert main.store_index.ids() == {"111", "222", "333"}
 
         main.full_cleanup({"111"})  # only 111 is still a favourite
         time.sleep(0.5)
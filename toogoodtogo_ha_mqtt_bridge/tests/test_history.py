@@ -0,0 +1,50 @@
+from pathlib import Path
+
+from toogoodtogo_ha_mqtt_bridge.history import DAY, StockHistory
+
+WINDOW = ("2024-01-01T17:00:00Z", "2024-01-01T18:00:00Z")
+
+
+def test_only_changes_are_written_once_per_cycle(tmp_path: Path) -> None:
+    now = [1_700_000_000.0]
+    history = StockHistory(tmp_path / "history.sqlite3", clock=lambda: now[0])
+    for stock in (0, 0, 3, 3, 1, 0):
+        history.record("bakery", stock, 3.5, *WINDOW)
+        history.record("deli", 2, 4.0, None, None)
+        assert history.flush() <= 2
+        now[0] += 60
+
+    samples = history.samples("bakery")
+    assert [sample.stock for sample in samples] == [0, 3, 1, 0]
+    assert samples[1].price == 3.5
+    assert samples[1].pickup_start == 1704128400
+    assert len(history.samples("deli")) == 1
+    assert history.drops() == {"bakery": [1_700_000_120]}
+    history.close()
+
+    reopened = StockHistory(tmp_path / "history.sqlite3", clock=lambda: now[0])
+    reopened.record("bakery", 0, 3.5, *WINDOW)  # unchanged since the last row
+    assert reopened.flush() == 0
+
+
+def test_old_rows_are_downsampled_and_expired(tmp_path: Path) -> None:
+    now = [0.0]
+    history = StockHistory(
+        tmp_path / "history.sqlite3",
+        retention_days=30,
+        downsample_after_days=7,
+        downsample_bucket=3600,
+        clock=lambda: now[0],
+    )
+    for minute, stock in enumerate([5, 4, 3, 0, 0, 2, 1]):
+        now[0] = 10 * DAY + minute * 60
+        history.record("bakery", stock, 3.5, None, None)
+        history.flush()
+    now[0] = DAY
+    history.record("bakery", 9, 3.5, None, None)
+    history.flush()
+
+    now[0] = 40 * DAY
+    assert history.compact() == 3  # the expired row, and 4 and 3 (still available within the same hour)
+    assert [sample.stock for sample in history.samples("bakery")] == [5, 0, 2, 1]
+    assert history.compact() == 0
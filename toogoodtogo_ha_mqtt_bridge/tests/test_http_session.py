@@ -0,0 +1,104 @@
+import threading
+from collections.abc import Generator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import ClassVar
+
+import pytest
+
+from toogoodtogo_ha_mqtt_bridge import main
+from toogoodtogo_ha_mqtt_bridge.config import settings
+from toogoodtogo_ha_mqtt_bridge.http_session import PooledSession, connection_pool, endpoint_name
+from toogoodtogo_ha_mqtt_bridge.ratelimit import RateLimited, RateLimiter
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    cookies: ClassVar[list[str | None]] = []  # the Cookie header of every request
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        _Handler.cookies.append(self.headers.get("Cookie"))
+        self.send_response(429 if self.path.endswith("/throttled") else 200)
+        self.send_header("Retry-After", "7")
+        if self.path.endswith("/login"):
+            self.send_header("Set-Cookie", "datadome=alice; Path=/")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def _server() -> Generator[str, None, None]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_connections_are_reused_and_timed(_server: str) -> None:
+    timings: list[tuple[str, float, float, float]] = []
+    session = PooledSession(observer=lambda *timing: timings.append(timing))
+    for url in ("/api/item/v8/", "/api/item/v8/123", "/api/order/v8/active"):
+        session.post(_server + url, json={}).raise_for_status()
+    session.close()
+
+    assert [endpoint for endpoint, *_ in timings] == ["/api/item/v8", "/api/item/v8/{id}", "/api/order/v8/active"]
+    assert [connect > 0 for _, connect, _, _ in timings] == [True, False, False]  # one handshake only
+    assert all(0 < headers <= total for _, _, headers, total in timings)
+
+
+def test_sessions_share_the_pool_but_not_their_cookies(_server: str) -> None:
+    pool = connection_pool()
+    timings: list[tuple[str, float, float, float]] = []
+    alice = PooledSession(adapter=pool, observer=lambda *timing: timings.append(timing))
+    bob = PooledSession(adapter=pool, observer=lambda *timing: timings.append(timing))
+    alice.post(_server + "/api/auth/v5/login", json={})
+    alice.post(_server + "/api/item/v8/", json={})
+    bob.post(_server + "/api/item/v8/", json={})
+
+    assert _Handler.cookies[-2:] == ["datadome=alice", None]  # alice's cookie never reaches bob's request
+    assert [connect > 0 for _, connect, _, _ in timings] == [True, False, False]  # bob reuses alice's connection
+    bob.cookies.clear()  # what TgtgClient does on a captcha
+    assert "datadome" in alice.cookies
+    pool.close()
+
+
+def test_refused_requests_pause_all_requests(_server: str) -> None:
+    limiter = RateLimiter(rate=100, burst=5)
+    session = PooledSession(limiter=limiter, max_wait=1)
+    session.post(_server + "/api/item/v8/")
+    assert session.post(_server + "/api/item/v8/throttled").status_code == 429
+    assert 6 < limiter.state()["paused_for"] <= 7
+    with pytest.raises(RateLimited):  # not even sent
+        session.post(_server + "/api/item/v8/")
+    session.close()
+
+
+def test_rebuilt_clients_share_the_session_of_their_account(monkeypatch: pytest.MonkeyPatch) -> None:
+    assert endpoint_name("https://apptoogoodtogo.com/api/item/v8/1234/") == "/api/item/v8/{id}"
+    tokens = {"access_token": "access", "refresh_token": "refresh", "cookie": "cookie", "user_agent": "TGTG/24.11.0"}
+    original = settings.get("tgtg")
+    settings["tgtg"] = {"language": "en-US"}
+    try:
+        first, second = main.new_tgtg_client(**tokens), main.new_tgtg_client(**tokens)
+    finally:
+        settings["tgtg"] = original
+    assert first.session is second.session is main.http_session
+    assert "authorization" not in main.http_session.headers  # only sent with each client's own requests
+
+    monkeypatch.setattr(main, "accounts", [])
+    settings["tgtg"] = {
+        "language": "en-US",
+        "accounts": [{"name": "alice", "email": "a"}, {"name": "bob", "email": "b"}],
+    }
+    try:
+        main.setup_accounts()
+    finally:
+        settings["tgtg"] = original
+    alice, bob = (account.state["http_session"] for account in main.accounts)
+    assert alice is not bob  # a cookie jar per account
+    assert alice.get_adapter("https://") is bob.get_adapter("https://") is main.http_pool
@@ -0,0 +1,51 @@
+import urllib.request
+
+import pytest
+
+from toogoodtogo_ha_mqtt_bridge import main
+from toogoodtogo_ha_mqtt_bridge.metrics import Registry
+
+
+def test_registry_renders_prometheus_text_over_http() -> None:
+    registry = Registry()
+    checks = registry.histogram("checks_seconds", "Check duration", ["result"], buckets=(0.1, 1.0))
+    errors = registry.counter("errors_total", "Errors", ["endpoint"])
+    checks.observe(0.05, result="success")
+    checks.observe(0.5, result="success")
+    errors.inc(endpoint='get_"items"')
+
+    server = registry.serve("127.0.0.1", 0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            body = response.read().decode()
+    finally:
+        server.shutdown()
+
+    assert body.splitlines() == [
+        "# HELP checks_seconds Check duration",
+        "# TYPE checks_seconds histogram",
+        'checks_seconds_bucket{result="success",le="0.1"} 1',
+        'checks_seconds_bucket{result="success",le="1"} 2',
+        'checks_seconds_bucket{result="success",le="+Inf"} 2',
+        'checks_seconds_sum{result="success"} 0.55',
+        'checks_seconds_count{result="success"} 2',
+        "# HELP errors_total Errors",
+        "# TYPE errors_total counter",
+        'errors_total{endpoint="get_\\"items\\""} 1',
+    ]
+    with pytest.raises(ValueError, match="expects labels"):
+        errors.inc()
+
+
+def test_api_calls_are_timed_and_errors_counted() -> None:
+    def get_active() -> dict:
+        raise RuntimeError("boom")
+
+    before = main.API_ERRORS.value(endpoint="get_active")
+    observed = main.API_DURATION.count(endpoint="get_active")
+    with pytest.raises(RuntimeError):
+        main.call_with_token_retry(get_active)
+    assert main.API_ERRORS.value(endpoint="get_active") == before + 1
+    assert main.API_DURATION.count(endpoint="get_active") == observed + 1
@@ -0,0 +1,61 @@
+from pathlib import Path
+
+import pytest
+
+from toogoodtogo_ha_mqtt_bridge import main
+from toogoodtogo_ha_mqtt_bridge.config import settings
+from toogoodtogo_ha_mqtt_bridge.profiling import CycleProfiler
+
+
+def _work() -> list[str]:
+    return [str(number) for number in range(2000)]
+
+
+def _stems(directory: Path) -> list[str]:
+    return sorted({path.name.split(".")[0] for path in directory.glob("cycle-*")})
+
+
+def test_every_nth_cycle_is_profiled_and_old_profiles_are_rotated(tmp_path: Path) -> None:
+    profiler = CycleProfiler(tmp_path, every=2, memory=True, keep=2)
+    for _ in range(7):
+        with profiler.cycle():
+            _work()
+
+    stems = _stems(tmp_path)
+    assert [stem.rsplit("-", 1)[1] for stem in stems] == ["4", "6"]
+    newest = stems[-1]
+    assert {path.name for path in tmp_path.glob(f"{newest}.*")} == {
+        f"{newest}.prof",
+        f"{newest}.txt",
+        f"{newest}.alloc.txt",
+    }
+    assert "_work" in (tmp_path / f"{newest}.txt").read_text()
+    assert "still allocated at the end of the cycle" in (tmp_path / f"{newest}.alloc.txt").read_text()
+
+
+def test_only_slow_cycles_are_kept(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    durations = iter([0.0, 0.1, 10.0, 10.5])  # a fast cycle, then a slow one
+    monkeypatch.setattr("toogoodtogo_ha_mqtt_bridge.profiling.time.perf_counter", lambda: next(durations))
+    profiler = CycleProfiler(tmp_path, slower_than=0.3)
+    for _ in range(2):
+        with profiler.cycle():
+            pass
+
+    assert [stem.rsplit("-", 1)[1] for stem in _stems(tmp_path)] == ["2"]
+    assert (tmp_path / f"{_stems(tmp_path)[0]}.txt").read_text().startswith("Cycle 2 took 0.500s")
+
+
+def test_check_profiles_cycles_from_the_command_line_options(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    original_data_dir = settings.get("data_dir")
+    settings["data_dir"] = str(tmp_path)
+    monkeypatch.setattr(main, "profiler", None)
+    monkeypatch.setattr(main, "run_check", lambda: True)
+    try:
+        main.setup_profiler(every=None, slower_than=None, memory=None)
+        assert main.profiler is None  # nothing configured, nothing profiled
+
+        main.setup_profiler(every=1, slower_than=None, memory=None)
+        assert main.check()
+        assert len(_stems(tmp_path / "profiles")) == 1
+    finally:
+        settings["data_dir"] = original_data_dir
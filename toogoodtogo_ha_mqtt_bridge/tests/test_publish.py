@@ -8,6 +8,7 @@ import pytest
 
 from toogoodtogo_ha_mqtt_bridge import main
 from toogoodtogo_ha_mqtt_bridge.config import settings
+from toogoodtogo_ha_mqtt_bridge.publish_cache import PublishCache
 
 
 def _fake_shop(stock: int) -> dict:
@@ -20,6 +21,16 @@ def _fake_shop(stock: int) -> dict:
     }
 
 
+@pytest.fixture(autouse=True)
+def _empty_publish_cache() -> None:
+    # The publish cache and discovery manager are module state; start every test from a clean
+    # slate so earlier tests publishing the same fake shop don't turn later publishes into skips.
+    main.publish_cache.clear()
+    main.discovery.clear()
+    main.store_remover.pending.clear()
+    main.topics.invalidate()
+
+
 @pytest.fixture
 def _settings_env() -> Generator[None, None, None]:
     # dynaconf's settings object has no __delitem__, so snapshot/restore the
@@ -38,7 +49,7 @@ def test_publish_stores_data_attrs(stock: int, _settings_env: None) -> None:
     published: dict[str, str] = {}
     retained: dict[str, bool] = {}
 
-    def fake_publish(topic: str, payload: str | None = None, retain: bool = False) -> MagicMock:
+    def fake_publish(topic: str, payload: str | None = None, retain: bool = False, qos: int = 0) -> MagicMock:
         published[topic] = payload  # type: ignore[assignment]
         retained[topic] = retain
         return MagicMock(rc=mqtt.MQTT_ERR_SUCCESS)
@@ -76,7 +87,7 @@ def test_register_fetch_sensor_naming() -> None:
     # switch. domain (not sensor.). Covers the distinct domain path of entity_naming.
     published: dict[str, str] = {}
 
-    def fake_publish(topic: str, payload: str | None = None) -> MagicMock:
+    def fake_publish(topic: str, payload: str | None = None, retain: bool = False, qos: int = 0) -> MagicMock:
         published[topic] = payload  # type: ignore[assignment]
         return MagicMock(rc=mqtt.MQTT_ERR_SUCCESS)
 
@@ -90,9 +101,10 @@ def test_register_fetch_sensor_naming() -> None:
     assert config["name"] == "Intense fetch"
 
 
-def test_check_for_removed_stores_clears_retained(tmp_path: Path) -> None:
+def test_check_for_removed_stores_clears_retained(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
     # A removed store must clear its retained state/attr topics (empty retained payload),
     # otherwise the retained messages orphan on the broker forever.
+    monkeypatch.setattr(main, "last_successful_favourite_ids", set())  # committed by the poll
     original_data_dir = settings.get("data_dir")
     settings["data_dir"] = str(tmp_path)
     (tmp_path / "known_shops.json").write_text(json.dumps(["999"]))
@@ -100,7 +112,7 @@ def test_check_for_removed_stores_clears_retained(tmp_path: Path) -> None:
         published: dict[str, str | None] = {}
         retained: dict[str, bool] = {}
 
-        def fake_publish(topic: str, payload: str | None = None, retain: bool = False) -> MagicMock:
+        def fake_publish(topic: str, payload: str | None = None, retain: bool = False, qos: int = 0) -> MagicMock:
             published[topic] = payload
             retained[topic] = retain
             return MagicMock(rc=mqtt.MQTT_ERR_SUCCESS)
@@ -117,19 +129,42 @@ def test_check_for_removed_stores_clears_retained(tmp_path: Path) -> None:
         settings["data_dir"] = original_data_dir
 
 
+def test_check_for_removed_stores_keeps_stores_of_every_account(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Removals still pending from an earlier cycle are dropped once any account has the store again.
+    monkeypatch.setattr(main, "all_favourite_ids", lambda: {"123", "555"})  # 555 is another account's
+    monkeypatch.setattr(main.store_remover, "pending", {"123", "555", "777"})
+    original_data_dir = settings.get("data_dir")
+    settings["data_dir"] = str(tmp_path)
+    (tmp_path / "known_shops.json").write_text(json.dumps([123, 555, 999]))  # older files hold ints
+    main.mqtt_client = MagicMock()
+    main.mqtt_client.publish.return_value = MagicMock(rc=mqtt.MQTT_ERR_SUCCESS)
+    try:
+        main.check_for_removed_stores([123])
+    finally:
+        settings["data_dir"] = original_data_dir
+
+    cleared = {call.args[0].split("/")[-2] for call in main.mqtt_client.publish.call_args_list}
+    assert cleared == {"toogoodtogo_777", "toogoodtogo_999", "777", "999"}  # state/attr, discovery config
+    assert main.store_remover.pending == set()
+
+
 @pytest.fixture
 def _topic_settings() -> Generator[None, None, None]:
+    # Tests assign the topic settings directly, which stands in for a settings reload.
     keys = ("mqtt", "homeassistant", "raw")
     original = {key: settings.get(key) for key in keys}
     yield
     for key, value in original.items():
         settings[key] = value
+    main.topics.invalidate()
 
 
 def _publish_one_store() -> dict[str, str]:
     published: dict[str, str] = {}
 
-    def fake_publish(topic: str, payload: str | None = None, retain: bool = False) -> MagicMock:
+    def fake_publish(topic: str, payload: str | None = None, retain: bool = False, qos: int = 0) -> MagicMock:
         published[topic] = payload  # type: ignore[assignment]
         return MagicMock(rc=mqtt.MQTT_ERR_SUCCESS)
 
@@ -145,6 +180,7 @@ def test_publish_stores_data_custom_topics(_settings_env: None, _topic_settings:
     settings["mqtt"] = {"base": "tgtg/data"}
     settings["homeassistant"] = {"enabled": True, "discovery_prefix": "ha"}
     settings["raw"] = True
+    main.topics.invalidate()
 
     published = _publish_one_store()
 
@@ -160,9 +196,155 @@ def test_publish_stores_data_homeassistant_disabled(_settings_env: None, _topic_
     settings["mqtt"] = {}
     settings["homeassistant"] = {"enabled": False}
     settings["raw"] = True
+    main.topics.invalidate()
 
     published = _publish_one_store()
 
     assert not any(topic.endswith("/config") for topic in published)
     assert "homeassistant/sensor/toogoodtogo_123/state" in published
     assert "homeassistant/sensor/toogoodtogo_123/raw" in published
+
+
+def test_publish_stores_data_skips_unchanged(_settings_env: None) -> None:
+    # Re-publishing an identical store is a no-op; a stock change only re-sends what changed.
+    published: list[str] = []
+
+    def fake_publish(topic: str, payload: str | None = None, retain: bool = False, qos: int = 0) -> MagicMock:
+        published.append(topic)
+        return MagicMock(rc=mqtt.MQTT_ERR_SUCCESS)
+
+    main.mqtt_client = MagicMock()
+    main.mqtt_client.publish.side_effect = fake_publish
+
+    assert main.publish_stores_data([_fake_shop(stock=3)]) is True
+    assert len(published) == 3  # config + state + attr
+
+    published.clear()
+    assert main.publish_stores_data([_fake_shop(stock=3)]) is True
+    assert published == []
+
+    published.clear()
+    assert main.publish_stores_data([_fake_shop(stock=2)]) is True
+    assert "homeassistant/sensor/toogoodtogo_123/state" in published
+    assert "homeassistant/sensor/toogoodtogo_bridge/123/config" not in published  # icon unchanged
+
+    # the refresh-every-N valve re-sends state/attr; the config stays once-per-session
+    published.clear()
+    main.publish_cache.clear()
+    assert main.publish_stores_data([_fake_shop(stock=2)]) is True
+    assert len(published) == 2
+
+
+def test_publish_cache_refresh_every() -> None:
+    cache = PublishCache(refresh_every=2)
+    cache.record("t", "x")
+    cache.start_cycle()
+    assert cache.is_unchanged("t", "x")
+    cache.start_cycle()  # every 2nd cycle drops the cache
+    assert not cache.is_unchanged("t", "x")
+    cache.record("t", "x")
+    cache.record("t", None)  # clearing a retained message forgets it
+    assert not cache.is_unchanged("t", "x")
+
+
+def test_discovery_republished_on_homeassistant_birth(_settings_env: None) -> None:
+    # Configs are sent once per session; HA's "online" birth message re-sends all of them.
+    published: list[str] = []
+
+    def fake_publish(topic: str, payload: str | None = None, retain: bool = False, qos: int = 0) -> MagicMock:
+        published.append(topic)
+        return MagicMock(rc=mqtt.MQTT_ERR_SUCCESS)
+
+    main.mqtt_client = MagicMock()
+    main.mqtt_client.publish.side_effect = fake_publish
+    config_topic = "homeassistant/sensor/toogoodtogo_bridge/123/config"
+
+    assert main.publish_stores_data([_fake_shop(stock=3)]) is True
+    main.publish_cache.clear()  # state/attr valve must not drag the config along
+    assert main.publish_stores_data([_fake_shop(stock=3)]) is True
+    assert published.count(config_topic) == 1
+
+    main.on_message(main.mqtt_client, None, MagicMock(topic="homeassistant/status", payload=b"offline"))
+    assert published.count(config_topic) == 1
+    main.on_message(main.mqtt_client, None, MagicMock(topic="homeassistant/status", payload=b"online"))
+    assert published.count(config_topic) == 2
+
+    # a removed store's config is deleted and never resurrected by a later birth message
+    main.delete_retained(config_topic)
+    main.on_message(main.mqtt_client, None, MagicMock(topic="homeassistant/status", payload=b"online"))
+    assert published.count(config_topic) == 3  # just the deletion
+
+
+def _shop_with_id(item_id: str) -> dict:
+    shop = _fake_shop(stock=1)
+    shop["item"] = {**shop["item"], "item_id": item_id}
+    return shop
+
+
+def test_check_streams_favourite_pages(
+    _settings_env: None, _topic_settings: None, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Favourites are fetched page by page (no cap at one page) and published as they arrive;
+    # the favourites snapshot is only committed once the last page went through.
+    settings["homeassistant"] = {"enabled": False}
+    main.topics.invalidate()
+    monkeypatch.setattr(main, "refresh_tokens", lambda: None)
+    monkeypatch.setattr(main, "FAVOURITES_PAGE_SIZE", 2)
+    monkeypatch.setattr(main, "last_successful_favourite_ids", {"old"})
+    pages = {1: [_shop_with_id("1"), _shop_with_id("2")], 2: [_shop_with_id("3")]}
+    failing_page: list[int] = [2]
+
+    def fake_get_items(page_size: int, page: int) -> list[dict]:
+        if page in failing_page:
+            raise RuntimeError("boom")
+        return pages[page]
+
+    main.tgtg_client = MagicMock()
+    main.tgtg_client.get_items.side_effect = fake_get_items
+    main.mqtt_client = MagicMock()
+    main.mqtt_client.publish.return_value = MagicMock(rc=mqtt.MQTT_ERR_SUCCESS)
+
+    assert main.check() is False
+    assert main.last_successful_favourite_ids == {"old"}  # nothing committed
+
+    failing_page.clear()
+    assert main.check() is True
+    assert main.last_successful_favourite_ids == {"1", "2", "3"}
+    assert main.tgtg_client.get_items.call_count == 4  # 2 pages per run, the short one ends it
+
+
+def test_full_cleanup_uses_live_store_index() -> None:
+    # The index follows the bridge's own <base>/+/state subscription; only numeric store ids count.
+    main.mqtt_client = MagicMock()
+    base = main.data_base()
+    assert main.store_index.subscription(base) == f"{base}/+/state"
+    for topic, payload in (
+        (f"{base}/toogoodtogo_111/state", b'{"stock": 3}'),
+        (f"{base}/toogoodtogo_222/state", b'{"stock": 0}'),
+        (f"{base}/toogoodtogo_333/state", b'{"stock": 1}'),
+        (f"{base}/toogoodtogo_333/state", b""),  # already deleted
+        (f"{base}/toogoodtogo_last_updated/state", b"x"),
+    ):
+        main.on_message(main.mqtt_client, None, MagicMock(topic=topic, payload=payload))
+    assert main.store_index.ids() == {"111", "222"}
+
+    main.full_cleanup({"111"})
+
+    cleared = {call.args[0] for call in main.mqtt_client.publish.call_args_list}
+    assert cleared == {
+        "homeassistant/sensor/toogoodtogo_bridge/222/config",
+        f"{base}/toogoodtogo_222/state",
+        f"{base}/toogoodtogo_222/attr",
+    }
+
+
+def test_topic_registry_caches_until_invalidated(_topic_settings: None) -> None:
+    first = main.topics.item("123")
+    assert main.topics.item(123) is first  # built once per item id
+    assert first.state == "homeassistant/sensor/toogoodtogo_123/state"
+
+    settings["mqtt"] = {"base": "tgtg"}
+    assert main.topics.item("123") is first  # cached until invalidated
+    main.topics.invalidate()
+    assert main.topics.item("123").state == "tgtg/toogoodtogo_123/state"
+    assert main.topics.item("123").config == "homeassistant/sensor/toogoodtogo_bridge/123/config"
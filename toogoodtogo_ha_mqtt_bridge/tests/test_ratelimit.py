@@ -0,0 +1,43 @@
+import pytest
+
+from toogoodtogo_ha_mqtt_bridge.ratelimit import RateLimited, RateLimiter
+
+
+def test_rate_limiter_spaces_calls_after_burst() -> None:
+    now = [0.0]
+    limiter = RateLimiter(rate=2, burst=2, clock=lambda: now[0])
+
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == 0
+    # the bucket is empty: queued callers wait 0.5s each, one behind the other
+    assert limiter.reserve() == 0.5
+    assert limiter.reserve() == 1.0
+
+    now[0] = 10.0  # an idle period refills the bucket, but never beyond the burst size
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == 0.5
+
+
+def test_refused_calls_pause_and_slow_down_all_callers() -> None:
+    now = [0.0]
+    limiter = RateLimiter(rate=4, burst=4, clock=lambda: now[0], min_backoff=10, max_backoff=60)
+
+    assert limiter.penalize(retry_after=30) == 30
+    assert limiter.rate == 2
+    assert limiter.reserve() == 30  # no burst after the pause either
+    assert limiter.reserve() == 30.5
+    with pytest.raises(RateLimited):
+        limiter.acquire(max_wait=5)
+    assert limiter.reserve() == 31  # the refused caller handed its slot back
+
+    pauses = [limiter.penalize() for _ in range(4)]  # no Retry-After: jittered backoff, doubling per strike
+    for pause, ceiling in zip(pauses, (20, 40, 60, 60)):
+        assert ceiling / 2 <= pause <= ceiling
+    assert limiter.rate == 0.25  # never below a sixteenth of the configured rate
+    assert limiter.state()["strikes"] == 5
+
+    for _ in range(30):
+        limiter.succeeded()
+    assert limiter.rate == 4
+    assert limiter.state()["strikes"] == 0
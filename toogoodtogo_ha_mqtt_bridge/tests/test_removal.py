@@ -0,0 +1,49 @@
+import paho.mqtt.client as mqtt
+
+from toogoodtogo_ha_mqtt_bridge.removal import BulkRemover
+
+
+class FakeInfo:
+    def __init__(self, topic: str, acked: bool, outstanding: list[int]) -> None:
+        self.rc = mqtt.MQTT_ERR_SUCCESS
+        self.topic = topic
+        self.acked = acked
+        self.outstanding = outstanding
+        self.waited: float | None = None
+
+    def wait_for_publish(self, timeout: float | None = None) -> None:
+        self.waited = timeout
+        self.outstanding[0] -= 1
+
+    def is_published(self) -> bool:
+        return self.acked
+
+
+def test_bulk_remover_windows_and_requeues_unacked_stores() -> None:
+    outstanding = [0, 0]  # current, peak
+    infos: list[FakeInfo] = []
+    lost = {"2/state"}  # the broker never acknowledges this deletion
+
+    def publish(topic: str) -> FakeInfo:
+        outstanding[0] += 1
+        outstanding[1] = max(outstanding)
+        info = FakeInfo(topic, topic not in lost, outstanding)
+        infos.append(info)
+        return info
+
+    remover = BulkRemover(publish, lambda item_id: [f"{item_id}/config", f"{item_id}/state"], window=3)
+    report = remover.remove(["1", "2", "3", "4"])
+
+    assert report.removed == ["1", "3", "4"]
+    assert report.failed == ["2"]  # its config went, but the entity is retried as a whole
+    assert outstanding[1] == 3  # never more than the window unacknowledged
+    assert remover.pending == {"2"}
+    # after the stall the rest of the batch no longer waits out the timeout
+    assert [info.waited for info in infos if info.topic.startswith(("3", "4"))] == [0, 0, 0, 0]
+
+    lost.clear()
+    infos.clear()
+    report = remover.remove(["5"], keep=["5"])  # "5" became a favourite again
+    assert report.removed == ["2"]
+    assert [info.topic for info in infos] == ["2/config", "2/state"]
+    assert remover.pending == set()
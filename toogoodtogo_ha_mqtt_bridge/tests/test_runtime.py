@@ -0,0 +1,171 @@
+import asyncio
+import threading
+import time
+from collections.abc import Generator
+from unittest.mock import MagicMock
+
+import arrow
+import pytest
+
+from toogoodtogo_ha_mqtt_bridge import main
+from toogoodtogo_ha_mqtt_bridge.accounts import Account
+from toogoodtogo_ha_mqtt_bridge.config import settings
+from toogoodtogo_ha_mqtt_bridge.ratelimit import RateLimiter
+
+
+@pytest.fixture
+def _intense_settings() -> Generator[None, None, None]:
+    original = settings.get("tgtg")
+    settings["tgtg"] = {"intense_fetch": {"interval": 10, "period_of_time": 5}}
+    yield
+    settings["tgtg"] = original
+
+
+def test_intense_fetch_switch_lifecycle(_intense_settings: None, monkeypatch: pytest.MonkeyPatch) -> None:
+    # ON/OFF arrive on paho's network thread; they must start/cancel one task on the event loop.
+    checks: list[int] = []
+
+    def fake_check(account: Account | None = None) -> bool:
+        checks.append(1)
+        return True
+
+    monkeypatch.setattr(main, "check", fake_check)
+    monkeypatch.setattr(main, "after_successful_check", lambda: None)
+    main.mqtt_client = MagicMock()
+    set_topic = "homeassistant/switch/toogoodtogo_intense_fetch/set"
+
+    async def scenario() -> None:
+        main.event_loop = asyncio.get_running_loop()
+        main.on_message(main.mqtt_client, None, MagicMock(topic=set_topic, payload=b"ON"))
+        main.on_message(main.mqtt_client, None, MagicMock(topic=set_topic, payload=b"ON"))  # ignored
+        await asyncio.sleep(0.1)
+        task = main.intense_fetch_task
+        assert task is not None
+        assert len(checks) == 1  # sleeping out its 10s interval
+
+        main.on_message(main.mqtt_client, None, MagicMock(topic=set_topic, payload=b"OFF"))
+        await asyncio.gather(task, return_exceptions=True)
+        assert task.cancelled()
+        assert main.intense_fetch_task is None
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        main.event_loop = None
+
+    main.mqtt_client.publish.assert_called_with("homeassistant/switch/toogoodtogo_intense_fetch/state", "OFF")
+
+
+def test_next_sales_sweep_runs_lookups_concurrently(monkeypatch: pytest.MonkeyPatch) -> None:
+    # 8 lookups of 0.1s with 4 slots finish in ~2 rounds instead of 8 serial calls.
+    in_flight: list[int] = [0, 0]  # current, peak
+    lock = threading.Lock()
+
+    def slow_get_item(item_id: str) -> dict:
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+        time.sleep(0.1)
+        with lock:
+            in_flight[0] -= 1
+        return {"display_name": f"Store {item_id}"}
+
+    main.tgtg_client = MagicMock(get_item=slow_get_item)
+    monkeypatch.setattr(main, "favourite_ids", [str(item_id) for item_id in range(8)])
+    monkeypatch.setattr(main, "api_limiter", RateLimiter(rate=1000, burst=8))
+    original = settings.get("tgtg")
+    settings["tgtg"] = {"max_concurrent_requests": 4}
+    try:
+        started = time.monotonic()
+        asyncio.run(main.next_sales_sweep())
+        elapsed = time.monotonic() - started
+    finally:
+        settings["tgtg"] = original
+
+    assert in_flight[1] == 4
+    assert elapsed < 0.5
+
+
+def test_targeted_intense_fetch_polls_only_the_triggering_stores(monkeypatch: pytest.MonkeyPatch) -> None:
+    looked_up: list[str] = []
+    published: list[list[str]] = []
+    checks: list[int] = []
+
+    def get_item(item_id: str) -> dict:
+        looked_up.append(item_id)
+        return {"item": {"item_id": item_id}}
+
+    def fake_check(account: Account | None = None) -> bool:
+        checks.append(1)
+        return True
+
+    def publish_stores_page(shops: list[dict], item_ids: list) -> bool:
+        published.append([shop["item"]["item_id"] for shop in shops])
+        return True
+
+    main.tgtg_client = MagicMock(get_item=get_item)
+    main.mqtt_client = MagicMock()
+    monkeypatch.setattr(main, "api_limiter", RateLimiter(rate=1000, burst=8))
+    monkeypatch.setattr(main, "watchdog", MagicMock())
+    monkeypatch.setattr(main, "after_successful_check", lambda: None)
+    monkeypatch.setattr(main, "check", fake_check)
+    monkeypatch.setattr(main, "publish_stores_page", publish_stores_page)
+    original = settings.get("tgtg")
+    settings["tgtg"] = {
+        "polling_schedule": "*/10 * * * *",
+        "intense_fetch": {"interval": 10, "period_of_time": 5, "targeted": True},
+    }
+
+    main.humanizer.start_cycle(arrow.get(0))  # as if the last full poll was long ago
+
+    async def scenario() -> None:
+        await main.trigger_intense_fetch("1")
+        await main.trigger_intense_fetch("2")  # joins the running one
+        task = main.intense_fetch_task
+        assert task is not None
+        await asyncio.sleep(0.1)
+        assert sorted(looked_up) == ["1", "2"]
+        assert [sorted(items) for items in published] == [["1", "2"]]
+        assert main.humanizer.now is not None
+        assert main.humanizer.now > arrow.get(0)  # pickup times humanized relative to this cycle
+
+        await main.poll()  # the full poll keeps its cadence
+        assert checks == [1]
+
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert main.intense_fetch_targets == {}
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        settings["tgtg"] = original
+
+
+def test_switch_turns_a_targeted_intense_fetch_into_a_full_one(monkeypatch: pytest.MonkeyPatch) -> None:
+    main.tgtg_client = MagicMock(get_item=lambda item_id: {"item": {"item_id": item_id}})
+    main.mqtt_client = MagicMock()
+    monkeypatch.setattr(main, "api_limiter", RateLimiter(rate=1000, burst=8))
+    monkeypatch.setattr(main, "after_successful_check", lambda: None)
+    monkeypatch.setattr(main, "publish_stores_page", lambda shops, item_ids: True)
+    original = settings.get("tgtg")
+    settings["tgtg"] = {"intense_fetch": {"interval": 10, "period_of_time": 5, "targeted": True}}
+
+    async def scenario() -> None:
+        await main.trigger_intense_fetch("1")
+        task = main.intense_fetch_task
+        assert task is not None
+        await asyncio.sleep(0.1)
+
+        main.start_intense_fetch()  # the switch turned on while the targeted fetch runs
+        assert main.intense_fetch_task is task
+        assert main.intense_fetch_targets == {}
+        assert main.intense_fetch_due()  # for a whole period from now, polling all favourites
+
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        settings["tgtg"] = original
@@ -0,0 +1,57 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timedelta
+
+import pytest
+
+from toogoodtogo_ha_mqtt_bridge.scheduler import Scheduler, compile_cron, cron_delay
+
+
+def test_compile_cron_once_and_validate() -> None:
+    assert compile_cron("*/10 * * * *") is compile_cron("*/10 * * * *")
+    with pytest.raises(ValueError, match="Invalid cron schedule"):
+        compile_cron("every ten minutes")
+
+
+def test_cron_delay_keeps_whole_days() -> None:
+    # timedelta.seconds would silently drop the days part of this delay
+    now = datetime(2022, 6, 1, 12, 0, 0)
+    delay = cron_delay(compile_cron("0 0 1 1 *"), now)
+    assert now + timedelta(seconds=delay) == datetime(2023, 1, 1)
+
+    # runs closer than min_delay are skipped in favour of the following one
+    delay = cron_delay(compile_cron("*/10 * * * *"), datetime(2022, 6, 1, 12, 9, 50), min_delay=30)
+    assert delay == 610
+
+
+def test_scheduler_runs_jobs_in_due_order() -> None:
+    ran: list[str] = []
+
+    def recorder(name: str) -> Callable[[], Awaitable[None]]:
+        async def callback() -> None:
+            ran.append(name)
+
+        return callback
+
+    async def scenario() -> None:
+        scheduler = Scheduler()
+        scheduler.add("repeat", recorder("repeat"), lambda: 0.05, first_delay=0.02)
+        scheduler.add("late", recorder("late"), None, first_delay=0.3)
+        scheduler.call_at("once", datetime.now() + timedelta(seconds=0.01), recorder("once"))
+        scheduler.add("cancelled", recorder("cancelled"), None, first_delay=0.01)
+        scheduler.cancel("cancelled")
+        assert [job["name"] for job in scheduler.jobs()] == ["once", "repeat", "late"]
+
+        runner = asyncio.create_task(scheduler.run())
+        await asyncio.sleep(0.2)
+        assert "once" not in scheduler  # one-shot jobs leave the table
+        assert "repeat" in scheduler  # recurring jobs are rescheduled
+        runner.cancel()
+        await asyncio.gather(runner, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+    assert ran[:2] == ["once", "repeat"]
+    assert ran.count("repeat") >= 3
+    assert "cancelled" not in ran
+    assert "late" not in ran
@@ -0,0 +1,22 @@
+import arrow
+
+from toogoodtogo_ha_mqtt_bridge.timestamps import Humanizer, local_isoformat, localize
+
+
+def test_localize_is_cached_per_timestamp_and_timezone() -> None:
+    localize.cache_clear()
+    first = localize("2022-01-01T17:00:00Z", "Europe/Berlin")
+    assert localize("2022-01-01T17:00:00Z", "Europe/Berlin") is first
+    assert localize.cache_info().hits == 1
+    assert local_isoformat("2022-01-01T17:00:00Z", "Europe/Berlin") == "2022-01-01T18:00:00+01:00"
+    assert local_isoformat("2022-01-01T17:00:00Z", "UTC") == "2022-01-01T17:00:00+00:00"
+
+
+def test_humanizer_uses_one_now_per_cycle() -> None:
+    humanizer = Humanizer()
+    humanizer.start_cycle(arrow.get("2022-01-01T15:00:00Z"))
+    assert humanizer.humanize("2022-01-01T17:00:00Z", "Europe/Berlin", "en_us") == "in 2 hours"
+    assert humanizer.humanize("2022-01-01T17:00:00Z", "Europe/Berlin", "de") == "in 2 Stunden"
+
+    humanizer.start_cycle(arrow.get("2022-01-01T16:00:00Z"))
+    assert humanizer.humanize("2022-01-01T17:00:00Z", "Europe/Berlin", "en_us") == "in an hour"
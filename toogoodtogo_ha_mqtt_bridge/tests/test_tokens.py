@@ -0,0 +1,72 @@
+from collections.abc import Generator
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+from tgtg.exceptions import TgtgAPIError
+
+from toogoodtogo_ha_mqtt_bridge import main
+from toogoodtogo_ha_mqtt_bridge.config import settings
+from toogoodtogo_ha_mqtt_bridge.token_manager import TokenManager
+
+
+def _fake_client(refreshed_seconds_ago: float) -> MagicMock:
+    client = MagicMock()
+    client.access_token_lifetime = 3600
+    client.last_time_token_refreshed = datetime.now() - timedelta(seconds=refreshed_seconds_ago)
+    return client
+
+
+def test_refresh_only_near_expiry() -> None:
+    manager = TokenManager(refresh_margin=300)
+
+    fresh = _fake_client(refreshed_seconds_ago=60)
+    assert manager.ensure_fresh(fresh) is False
+    fresh.login.assert_not_called()
+
+    # a lifetime spanning days must not wrap around like timedelta.seconds would
+    stale = _fake_client(refreshed_seconds_ago=3600 * 24 + 3400)
+    assert manager.ensure_fresh(stale) is True
+    stale.login.assert_called_once()
+    assert stale.last_time_token_refreshed is None  # makes TgtgClient.login() really refresh
+
+
+@pytest.fixture
+def _token_env(tmp_path: Path) -> Generator[Path, None, None]:
+    original_data_dir = settings.get("data_dir")
+    original_client, original_manager, original_tokens = main.tgtg_client, main.token_manager, main.tokens
+    settings["data_dir"] = str(tmp_path)
+    main.tgtg_client = _fake_client(refreshed_seconds_ago=60)
+    for attribute in ("access_token", "refresh_token", "cookie", "user_agent"):
+        setattr(main.tgtg_client, attribute, attribute)
+    main.token_manager = TokenManager()
+    yield tmp_path / "tokens.json"
+    settings["data_dir"] = original_data_dir
+    main.tgtg_client, main.token_manager, main.tokens = original_client, original_manager, original_tokens
+
+
+def test_token_file_only_written_on_change(_token_env: Path) -> None:
+    main.refresh_tokens()
+    assert _token_env.exists()
+    _token_env.unlink()
+
+    main.refresh_tokens()  # nothing changed -> no rewrite
+    assert not _token_env.exists()
+
+    main.tgtg_client.access_token = "rotated"  # noqa: S105
+    main.refresh_tokens()
+    assert _token_env.exists()
+
+
+def test_unauthorized_call_refreshes_and_retries(_token_env: Path) -> None:
+    api = MagicMock(side_effect=[TgtgAPIError(401, b"expired"), ["shop"]])
+
+    assert main.call_with_token_retry(api, page_size=400) == ["shop"]
+    assert api.call_count == 2
+    main.tgtg_client.login.assert_called_once()
+
+    other = MagicMock(side_effect=TgtgAPIError(500, b"boom"))
+    with pytest.raises(TgtgAPIError):
+        main.call_with_token_retry(other)
+    assert other.call_count == 1
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import functools
+
+import arrow
+
+
+@functools.lru_cache(maxsize=2048)
+def localize(raw: str, tz: str) -> arrow.Arrow:
+    """Parse an API timestamp and convert it to ``tz``; Arrow objects are immutable, so shareable.
+
+    Pickup windows mostly repeat from one poll to the next, so nearly every call is a cache hit.
+    """
+    return arrow.get(raw).to(tz=tz)
+
+
+@functools.lru_cache(maxsize=2048)
+def local_isoformat(raw: str, tz: str) -> str:
+    return localize(raw, tz).isoformat()
+
+
+class Humanizer:
+    """Humanized timestamps ("in 2 hours"), all relative to one reference "now" per cycle.
+
+    Within a cycle each (timestamp, timezone, locale) is humanized once; :meth:`start_cycle`
+    moves "now" forward and drops the strings of the previous cycle.
+    """
+
+    def __init__(self) -> None:
+        self.now: arrow.Arrow | None = None
+        self._cache: dict[tuple[str, str, str], str] = {}
+
+    def start_cycle(self, now: arrow.Arrow | None = None) -> None:
+        self.now = now or arrow.utcnow()
+        self._cache = {}
+
+    def humanize(self, raw: str, tz: str, locale: str) -> str:
+        key = (raw, tz, locale)
+        text = self._cache.get(key)
+        if text is None:
+            if self.now is None:
+                self.start_cycle()
+            text = localize(raw, tz).humanize(other=self.now, only_distance=False, locale=locale)
+            self._cache[key] = text
+        return text
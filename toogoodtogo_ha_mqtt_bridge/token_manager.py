@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+
+class TokenManager:
+    """Keeps the TGTG access token fresh without a login round trip on every poll.
+
+    The access token is refreshed proactively once it is within ``refresh_margin`` seconds of
+    its ``access_token_lifetime`` (or when forced, e.g. after a 401), and the token file is only
+    rewritten when its content actually changed.
+    """
+
+    def __init__(self, refresh_margin: float = 300) -> None:
+        self.refresh_margin = refresh_margin
+        self._persisted: dict[str, Any] | None = None
+
+    @staticmethod
+    def expires_in(client: Any) -> float | None:
+        """Seconds until the client's access token expires, ``None`` if unknown."""
+        if not client.last_time_token_refreshed:
+            return None
+        age = (datetime.now() - client.last_time_token_refreshed).total_seconds()
+        return float(client.access_token_lifetime - age)
+
+    def needs_refresh(self, client: Any) -> bool:
+        remaining = self.expires_in(client)
+        return remaining is None or remaining <= self.refresh_margin
+
+    def ensure_fresh(self, client: Any, force: bool = False) -> bool:
+        """Refresh the access token if it is (nearly) expired; returns whether it did."""
+        if not force and not self.needs_refresh(client):
+            return False
+        # TgtgClient.login() only refreshes once it considers the token expired itself.
+        client.last_time_token_refreshed = None
+        client.login()
+        return True
+
+    def is_changed(self, tokens: dict[str, Any]) -> bool:
+        return tokens != self._persisted
+
+    def mark_persisted(self, tokens: dict[str, Any]) -> None:
+        self._persisted = dict(tokens)
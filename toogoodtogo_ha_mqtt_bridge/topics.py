@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass(frozen=True)
+class Prefixes:
+    data_base: str
+    discovery_prefix: str
+    homeassistant_enabled: bool
+    raw_enabled: bool
+
+
+@dataclass(frozen=True)
+class ItemTopics:
+    config: str
+    state: str
+    attr: str
+    raw: str
+
+
+class TopicRegistry:
+    """Topic settings resolved once, and every topic of a store built once per item id.
+
+    Looking values up in the dynaconf settings is comparatively slow, and the same few
+    f-strings were rebuilt for every store on every poll. Both are cached here until
+    :meth:`invalidate` is called; the bridge reads its settings once at startup, so only
+    code changing them at runtime (tests, benchmarks) needs to.
+    """
+
+    def __init__(self, settings: Any) -> None:
+        self.settings = settings
+        self._prefixes: Prefixes | None = None
+        self._items: dict[str, ItemTopics] = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._prefixes = None
+            self._items = {}
+
+    @property
+    def prefixes(self) -> Prefixes:
+        prefixes = self._prefixes
+        if prefixes is None:
+            prefixes = self._resolve()
+            with self._lock:
+                self._prefixes = prefixes
+        return prefixes
+
+    def _resolve(self) -> Prefixes:
+        base = (self.settings.get("mqtt") or {}).get("base")
+        homeassistant = self.settings.get("homeassistant") or {}
+        prefix = homeassistant.get("discovery_prefix")
+        enabled = homeassistant.get("enabled")
+        return Prefixes(
+            data_base="homeassistant/sensor" if base is None else str(base),
+            discovery_prefix="homeassistant" if prefix is None else str(prefix),
+            homeassistant_enabled=True if enabled is None else bool(enabled),
+            raw_enabled=bool(self.settings.get("raw", False)),
+        )
+
+    def item(self, item_id: Any) -> ItemTopics:
+        key = str(item_id)
+        topics = self._items.get(key)
+        if topics is None:
+            prefixes = self.prefixes
+            data = f"{prefixes.data_base}/toogoodtogo_{key}"
+            topics = ItemTopics(
+                config=f"{prefixes.discovery_prefix}/sensor/toogoodtogo_bridge/{key}/config",
+                state=f"{data}/state",
+                attr=f"{data}/attr",
+                raw=f"{data}/raw",
+            )
+            with self._lock:
+                self._items[key] = topics
+        return topics
+
+    def __len__(self) -> int:
+        return len(self._items)